@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+# 公開しているエントリーポイント
+ENTRY_POINTS = (
+    "scripts.financial_result_reader",
+    "scripts.financial_result_to_dataframe",
+    "scripts.financial_result_batch",
+    "scripts.financial_result_pipeline",
+    "scripts.financial_result_records",
+    "scripts.financial_result_document",
+)
+# 読み込みに時間がかかり、必要になるまで読み込まないようにしているパッケージ
+HEAVY_PACKAGES = ("pandas", "numpy", "bs4", "lxml", "html5lib")
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """
+    `python -X importtime` の出力から、モジュールごとの読み込み時間を取り出す
+
+    Parameters
+    ----------
+    stderr : str
+        `python -X importtime` の標準エラー出力
+
+    Returns
+    -------
+    dict[str, int]
+        モジュール名と、そのモジュール自身の読み込み時間 [us]
+    """
+
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # 見出しの行
+            continue
+        times[fields[2].strip()] = int(fields[0])
+    return times
+
+
+def measure_import(
+    module: str, cwd: Path = ROOT_DIR, repeat: int = 5
+) -> dict[str, Any]:
+    """
+    モジュールを新しいインタプリタで読み込み、読み込み時間と読み込まれたパッケージを計測する
+
+    Parameters
+    ----------
+    module : str
+        読み込むモジュール
+    cwd : Path
+        インタプリタを起動するディレクトリ
+    repeat : int
+        計測回数(最小値を採用する)
+
+    Returns
+    -------
+    dict[str, Any]
+        読み込み時間 [ms]、読み込まれたモジュール数、読み込まれた重いパッケージ
+    """
+
+    env = dict(os.environ, PYTHONPATH=str(cwd))
+
+    def run(code: str) -> dict[str, int]:
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return parse_importtime(completed.stderr)
+
+    # インタプリタの起動時に読み込まれるモジュールは除く
+    startup = set(run("pass"))
+    elapsed = []
+    modules = {}  # type: dict[str, int]
+    for _ in range(repeat):
+        modules = {
+            name: us
+            for name, us in run(f"import {module}").items()
+            if name not in startup
+        }
+        elapsed.append(sum(modules.values()) / 1000)
+
+    return {
+        "import_ms": min(elapsed),
+        "modules": len(modules),
+        "heavy_packages": [p for p in HEAVY_PACKAGES if p in modules],
+    }
+
+
+def bench_import(
+    entry_points: tuple[str, ...] = ENTRY_POINTS, cwd: Path = ROOT_DIR, repeat: int = 5
+) -> dict[str, dict[str, Any]]:
+    """
+    エントリーポイントごとに、読み込み時間を計測する
+
+    Parameters
+    ----------
+    entry_points : tuple[str, ...]
+        計測するモジュール
+    cwd : Path
+        `scripts` を含むディレクトリ
+    repeat : int
+        計測回数(最小値を採用する)
+
+    Returns
+    -------
+    dict[str, dict[str, Any]]
+        エントリーポイントごとの計測結果
+    """
+
+    return {module: measure_import(module, cwd, repeat) for module in entry_points}
+
+
+def _checkout(revision: str, directory: Path) -> None:
+    # 作業ツリーを変更しないよう、指定したリビジョンの `scripts` のみを書き出す
+    def git(*args: str) -> bytes:
+        return subprocess.run(
+            ["git", *args], cwd=ROOT_DIR, capture_output=True, check=True
+        ).stdout
+
+    for name in git("ls-tree", "-r", "--name-only", revision, "scripts").split():
+        path = directory.joinpath(name.decode())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(git("show", f"{revision}:{name.decode()}"))
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_import",
+        description="エントリーポイントの読み込み時間 (python -X importtime) を計測する",
+    )
+    parser.add_argument("--module", action="append", dest="modules")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--revision",
+        help="比較する変更前のリビジョン。指定した場合、変更前後の読み込み時間を並べる",
+    )
+    parser.add_argument("--json", help="計測結果を出力するJSONファイル")
+    args = parser.parse_args(argv)
+
+    entry_points = tuple(args.modules or ENTRY_POINTS)
+    results = {"current": bench_import(entry_points, ROOT_DIR, args.repeat)}
+    if args.revision is not None:
+        with tempfile.TemporaryDirectory() as temporary:
+            _checkout(args.revision, Path(temporary))
+            results[args.revision] = bench_import(
+                entry_points, Path(temporary), args.repeat
+            )
+
+    for name, result in results.items():
+        print(f"[{name}]")
+        print(f"{'module':<40}{'[ms]':>8}{'modules':>9}  heavy packages")
+        for module, r in result.items():
+            print(
+                f"{module:<40}{r['import_ms']:>8.1f}{r['modules']:>9}  "
+                f"{', '.join(r['heavy_packages']) or '-'}"
+            )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as w:
+            json.dump(results, w, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import resource
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from scripts.financial_result_archive import ArchiveMember
+
+DEFAULT_DATA_DIR = Path(__file__).resolve().parents[1].joinpath("tests/data/raw")
+# 構文木を作らずに、セグメント報告のテーブルのみを取り出すエンジン
+EVENTS_ENGINE = "events"
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrssはfork元の値を引き継ぐため、Linuxではプロセス自身のVmHWMを優先する
+    status = Path("/proc/self/status")
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _bench_parser(
+    parser: str, paths: list["Path | ArchiveMember"], repeat: int
+) -> dict[str, Any]:
+    from bs4 import BeautifulSoup
+
+    import scripts.financial_result_reader as frr
+    from scripts.financial_result_events import collect_segment_grids
+
+    def parse(text: str) -> Any:
+        if parser == EVENTS_ENGINE:
+            return collect_segment_grids([text])
+        return BeautifulSoup(text, features=parser)
+
+    # ファイルの読み込みを含まない、パースのみの時間を計測する
+    texts = {}
+    for path in paths:
+        text = frr.load_financial_result_text(path)
+        assert text is not None
+        texts[path.name] = text
+
+    files = {}
+    for name, text in texts.items():
+        elapsed = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            html = parse(text)
+            elapsed.append(time.perf_counter() - start)
+            del html
+
+        tracemalloc.start()
+        html = parse(text)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del html
+
+        files[name] = {
+            "parse_seconds": min(elapsed),
+            "python_peak_mb": peak / 1024 / 1024,
+        }
+
+    return {
+        "parser": parser,
+        "total_parse_seconds": sum(f["parse_seconds"] for f in files.values()),
+        "peak_rss_mb": _max_rss_mb(),
+        "files": files,
+    }
+
+
+def bench_parsers(
+    paths: list["Path | ArchiveMember"],
+    parsers: Optional[list[str]] = None,
+    repeat: int = 3,
+) -> list[dict[str, Any]]:
+    """
+    パーサーごとに、HTMLのパース時間とピークメモリを計測する
+
+    Parameters
+    ----------
+    paths : list[Path | ArchiveMember]
+        計測に使用するHTMLファイル、またはzipアーカイブ内のファイル
+    parsers : Optional[list[str]]
+        計測するパーサー (`events` はhtml.parserのイベントから直接読み取るエンジン)。
+        Noneの場合はインストールされているすべてのパーサーと `events`
+    repeat : int
+        パース時間の計測回数(最小値を採用する)
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        パーサーごとの計測結果
+    """
+
+    from scripts.financial_result_reader import HTML_PARSERS
+
+    if parsers is None:
+        parsers = [
+            p
+            for p in HTML_PARSERS
+            if p == "html.parser" or importlib.util.find_spec(p) is not None
+        ] + [EVENTS_ENGINE]
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for parser in parsers:
+        # ピークメモリが他のパーサーの影響を受けないよう、パーサーごとにプロセスを分ける
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results.append(
+                executor.submit(_bench_parser, parser, paths, repeat).result()
+            )
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_parser",
+        description="パーサーごとのパース時間とピークメモリを計測する",
+    )
+    parser.add_argument("inputs", nargs="*", default=[str(DEFAULT_DATA_DIR)])
+    parser.add_argument("--parser", action="append", dest="parsers")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="計測結果を出力するJSONファイル")
+    args = parser.parse_args(argv)
+
+    from scripts.financial_result_batch import list_financial_result_files
+
+    paths = list_financial_result_files(args.inputs)
+    results = bench_parsers(paths, args.parsers, args.repeat)
+
+    print(f"{'parser':<12}{'parse [s]':>12}{'peak rss [MB]':>15}{'py peak [MB]':>14}")
+    for r in results:
+        py_peak = max(f["python_peak_mb"] for f in r["files"].values())
+        print(
+            f"{r['parser']:<12}{r['total_parse_seconds']:>12.3f}"
+            f"{r['peak_rss_mb']:>15.1f}{py_peak:>14.1f}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as w:
+            json.dump(results, w, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
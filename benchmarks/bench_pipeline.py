@@ -0,0 +1,341 @@
+import argparse
+import copy
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePath
+from typing import TYPE_CHECKING, Any, Optional, Sequence
+
+from benchmarks.bench_parser import DEFAULT_DATA_DIR, _max_rss_mb
+
+if TYPE_CHECKING:
+    from scripts.financial_result_archive import ArchiveMember
+
+CORPORA = ("samples", "exceptions")
+DEFAULT_THRESHOLD = 0.2
+# 計測のばらつきで失敗しないよう、これより小さい時間の増加は無視する
+MIN_DELTA_SECONDS = 0.005
+
+
+def synthesize_document(
+    text: str, tables: int = 1, segments: int = 1, rows: int = 1
+) -> str:
+    """
+    決算短信のHTMLのセグメント報告のテーブルを複製し、規模を大きくしたHTMLを作成する
+
+    Parameters
+    ----------
+    text : str
+        決算短信のHTMLのテキスト
+    tables : int
+        セグメント報告のテーブルの倍率
+    segments : int
+        セグメント(列)の倍率
+    rows : int
+        行の倍率
+
+    Returns
+    -------
+    str
+        作成したHTMLのテキスト
+    """
+
+    import scripts.financial_result_reader as frr
+
+    html = frr.parse_financial_result_html(text, "html.parser")
+    segment_tables = frr.find_segment_tables(html)
+    # 入れ子のテーブルは外側のテーブルとともに複製する
+    outermost = [
+        t
+        for t in segment_tables
+        if not any(p in segment_tables for p in t.find_parents("table"))
+    ]
+    for table in outermost:
+        for tr in table.find_all("tr"):
+            cells = tr.find_all(["td", "th"], recursive=False)
+            # 先頭の列(科目名)以外を複製し、セグメントの数を増やす
+            for _ in range(segments - 1):
+                for cell in cells[1:]:
+                    tr.append(copy.copy(cell))
+
+        trs = table.find_all("tr")
+        # 先頭の行(セグメント名)以外を複製し、行の数を増やす
+        for tr in trs[1:]:
+            for _ in range(rows - 1):
+                tr.insert_after(copy.copy(tr))
+
+        for _ in range(tables - 1):
+            table.insert_after(copy.copy(table))
+
+    return str(html)
+
+
+def synthesize_corpus(
+    paths: list["Path | ArchiveMember"], output_dir: Path, scale: int
+) -> list[Path]:
+    """
+    テーブル・セグメント・行の数をすべて `scale` 倍にしたHTMLファイルを作成する
+
+    Parameters
+    ----------
+    paths : list[Path | ArchiveMember]
+        元にするHTMLファイル、またはzipアーカイブ内のファイル
+    output_dir : Path
+        作成したHTMLファイルを出力するディレクトリ
+    scale : int
+        倍率
+
+    Returns
+    -------
+    list[Path]
+        作成したHTMLファイルのパス
+    """
+
+    import scripts.financial_result_reader as frr
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    outputs = []
+    for path in paths:
+        text = frr.load_financial_result_text(path)
+        if text is None:
+            continue
+        name = PurePath(path.name)
+        output = output_dir.joinpath(f"{name.stem}_x{scale}{name.suffix}")
+        output.write_text(synthesize_document(text, scale, scale, scale), "utf-8")
+        outputs.append(output)
+    return outputs
+
+
+def _read_all(path: "Path | ArchiveMember") -> None:
+    import scripts.financial_result_reader as frr
+
+    # パイプラインでは呼び出さない関数も含め、読み取りの関数を順に呼び出す
+    html = frr.read_financial_result_html(path)
+    if html is None:
+        return
+    for table in frr.find_segment_tables(html):
+        grid = frr.TableGrid.from_tag(table)
+        frr.read_table_period(grid)
+        segments = frr.read_table_segments(grid)
+        accounts = frr.read_table_sales_profit(grid)
+        for s in segments:
+            for a in accounts:
+                frr.read_segment_sales_profit(grid, s, a)
+            frr.read_table_values(grid, s, accounts)
+
+
+def _bench_corpus(
+    paths: Sequence["Path | ArchiveMember"], repeat: int
+) -> dict[str, Any]:
+    from scripts.financial_result_profile import file_size, profiling
+    from scripts.financial_result_to_dataframe import financial_result_to_dataframe
+
+    files = {}  # type: dict[str, dict[str, Any]]
+    for path in paths:
+        elapsed = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            financial_result_to_dataframe(path)
+            elapsed.append(time.perf_counter() - start)
+
+        with profiling() as profile:
+            financial_result_to_dataframe(path)
+            _read_all(path)
+
+        tracemalloc.start()
+        financial_result_to_dataframe(path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        files[path.name] = {
+            "bytes": file_size(path),
+            "seconds": min(elapsed),
+            "python_peak_mb": peak / 1024 / 1024,
+            "stages": {stage: stats.seconds for stage, stats in profile.stages.items()},
+        }
+
+    total = sum(f["seconds"] for f in files.values())
+    return {
+        "files": files,
+        "total_seconds": total,
+        "seconds_per_file": total / len(files) if files else 0.0,
+        "files_per_second": len(files) / total if total else 0.0,
+        "peak_rss_mb": _max_rss_mb(),
+    }
+
+
+def bench_pipeline(
+    corpora: dict[str, Sequence["Path | ArchiveMember"]], repeat: int = 3
+) -> dict[str, dict[str, Any]]:
+    """
+    コーパスごとに、決算短信の読み取り処理の時間とピークメモリを計測する
+
+    Parameters
+    ----------
+    corpora : dict[str, list[Path | ArchiveMember]]
+        コーパスの名前と、含まれるHTMLファイル(zipアーカイブ内のファイル)
+    repeat : int
+        読み取り時間の計測回数(最小値を採用する)
+
+    Returns
+    -------
+    dict[str, dict[str, Any]]
+        コーパスごとの計測結果
+    """
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name, paths in corpora.items():
+        # ピークメモリが他のコーパスの影響を受けないよう、コーパスごとにプロセスを分ける
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[name] = executor.submit(_bench_corpus, paths, repeat).result()
+    return results
+
+
+def compare_with_baseline(
+    results: dict[str, dict[str, Any]],
+    baseline: dict[str, dict[str, Any]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> list[str]:
+    """
+    計測結果をベースラインと比較し、しきい値を超えて悪化した項目を列挙する
+
+    Parameters
+    ----------
+    results : dict[str, dict[str, Any]]
+        計測結果
+    baseline : dict[str, dict[str, Any]]
+        ベースラインの計測結果
+    threshold : float
+        悪化とみなす増加率
+
+    Returns
+    -------
+    list[str]
+        悪化した項目の説明
+    """
+
+    regressions = []
+
+    def check(key: str, value: float, base: float, min_delta: float = 0.0) -> None:
+        if value > base * (1 + threshold) and value - base > min_delta:
+            regressions.append(f"{key}: {base:.4f} -> {value:.4f}")
+
+    for corpus, result in results.items():
+        base = baseline.get(corpus)
+        if base is None:
+            continue
+        check(
+            f"{corpus}/seconds_per_file",
+            result["seconds_per_file"],
+            base["seconds_per_file"],
+            MIN_DELTA_SECONDS,
+        )
+        check(f"{corpus}/peak_rss_mb", result["peak_rss_mb"], base["peak_rss_mb"])
+        for name, file in result["files"].items():
+            base_file = base["files"].get(name)
+            if base_file is not None:
+                check(
+                    f"{corpus}/{name}",
+                    file["seconds"],
+                    base_file["seconds"],
+                    MIN_DELTA_SECONDS,
+                )
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_pipeline",
+        description="決算短信の読み取り処理の時間とピークメモリを計測する",
+    )
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        choices=CORPORA,
+        dest="corpora",
+        help="計測するコーパス (既定: すべて)",
+    )
+    parser.add_argument(
+        "--scale",
+        action="append",
+        type=int,
+        default=[],
+        dest="scales",
+        help="サンプルを指定した倍率に拡大したコーパスも計測する",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="計測結果を出力するJSONファイル")
+    parser.add_argument("--baseline", help="比較するベースラインのJSONファイル")
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="計測結果をベースラインとして保存する",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="悪化とみなす増加率 (既定: 0.2)",
+    )
+    args = parser.parse_args(argv)
+
+    from scripts.financial_result_batch import list_financial_result_files
+
+    sources = {
+        "samples": list_financial_result_files([DEFAULT_DATA_DIR]),
+        "exceptions": list_financial_result_files(
+            [DEFAULT_DATA_DIR.joinpath("exceptions")]
+        ),
+    }
+    corpora = {
+        name: sources[name] for name in args.corpora or CORPORA
+    }  # type: dict[str, Sequence[Path | ArchiveMember]]
+
+    with tempfile.TemporaryDirectory() as temporary:
+        for scale in args.scales:
+            corpora[f"synthetic_x{scale}"] = synthesize_corpus(
+                sources["samples"], Path(temporary).joinpath(str(scale)), scale
+            )
+        results = bench_pipeline(corpora, args.repeat)
+
+    print(
+        f"{'corpus':<16}{'files':>6}{'[s]/file':>10}{'files/s':>10}"
+        f"{'peak rss [MB]':>15}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<16}{len(r['files']):>6}{r['seconds_per_file']:>10.3f}"
+            f"{r['files_per_second']:>10.1f}{r['peak_rss_mb']:>15.1f}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as w:
+            json.dump(results, w, ensure_ascii=False, indent=2)
+
+    if args.baseline is None:
+        return
+    baseline_path = Path(args.baseline)
+    if args.update_baseline or not baseline_path.exists():
+        with baseline_path.open("w", encoding="utf-8") as w:
+            json.dump(results, w, ensure_ascii=False, indent=2)
+        print(f"baseline saved: {baseline_path}")
+        return
+
+    with baseline_path.open(encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"regressions (> {args.threshold:.0%}):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import io
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    import zipfile
+
+ARCHIVE_SUFFIXES = (".zip",)
+# ワーカーごとに開いたままにするアーカイブの数
+ARCHIVE_CACHE_SIZE = 8
+
+# プロセスごとに開いたアーカイブ。fork したプロセスでは親のファイル位置を共有しないよう、
+# プロセスIDを含めたキーで管理する
+_archives = OrderedDict()  # type: OrderedDict[tuple[int, Path], zipfile.ZipFile]
+
+
+@dataclass(frozen=True)
+class ArchiveMember:
+    """
+    zipアーカイブ内のファイル、またはメモリ上のバイト列として受け取ったファイル。
+    プロセス間で受け渡す際は、アーカイブのパスとメンバー名のみを送り、
+    読み込むプロセスでアーカイブを開いて展開する
+    """
+
+    # アーカイブのパス。メモリ上のバイト列の場合はNone
+    archive: Optional[Path]
+    # アーカイブ内のメンバー名
+    member: str
+    # メモリ上のバイト列
+    data: Optional[bytes] = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_bytes(cls, name: str, data: bytes) -> "ArchiveMember":
+        return cls(None, name, data)
+
+    @classmethod
+    def from_path(cls, path: str | Path) -> Optional["ArchiveMember"]:
+        """
+        `<アーカイブのパス>/<メンバー名>` の形式のパスから、アーカイブ内のファイルを取得する
+
+        Parameters
+        ----------
+        path : str | Path
+            `str(ArchiveMember)` と同じ形式のパス
+
+        Returns
+        -------
+        Optional[ArchiveMember]
+            アーカイブ内のファイル。パスがアーカイブを含まない場合はNone
+        """
+
+        parts = PurePosixPath(Path(path).as_posix()).parts
+        for i in range(len(parts) - 1, 0, -1):
+            archive = Path(*parts[:i])
+            if archive.suffix.lower() in ARCHIVE_SUFFIXES and archive.is_file():
+                return cls(archive, "/".join(parts[i:]))
+        return None
+
+    @property
+    def name(self) -> str:
+        """ディレクトリを除いたファイル名 (`Path.name` に相当)"""
+
+        return PurePosixPath(self.member).name
+
+    def __str__(self) -> str:
+        # zipfile.Pathと同様に、アーカイブのパスとメンバー名を連結する
+        if self.archive is None:
+            return self.member
+        return f"{self.archive}/{self.member}"
+
+    def exists(self) -> bool:
+        if self.data is not None:
+            return True
+        if self.archive is None or not self.archive.is_file():
+            return False
+        try:
+            open_archive(self.archive).getinfo(self.member)
+        except KeyError:
+            return False
+        return True
+
+    @property
+    def size(self) -> int:
+        """展開後のバイト数"""
+
+        if self.data is not None:
+            return len(self.data)
+        assert self.archive is not None
+        return open_archive(self.archive).getinfo(self.member).file_size
+
+    def open(self) -> BinaryIO:
+        """
+        ファイルを開く。アーカイブ内のファイルは、読み込みながら展開する
+
+        Returns
+        -------
+        BinaryIO
+            ファイルのバイト列を読み込むストリーム
+        """
+
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        assert self.archive is not None
+        return open_archive(self.archive).open(self.member)  # type: ignore[return-value]
+
+    def read_bytes(self) -> bytes:
+        with self.open() as r:
+            return r.read()
+
+
+def open_archive(path: str | Path) -> "zipfile.ZipFile":
+    """
+    zipアーカイブを開く。同じプロセスでは、開いたアーカイブを再利用する
+
+    Parameters
+    ----------
+    path : str | Path
+        アーカイブのパス
+
+    Returns
+    -------
+    zipfile.ZipFile
+        開いたアーカイブ
+    """
+
+    import zipfile
+
+    key = (os.getpid(), Path(path).resolve())
+    archive = _archives.get(key)
+    if archive is not None:
+        _archives.move_to_end(key)
+        return archive
+
+    archive = zipfile.ZipFile(key[1])
+    _archives[key] = archive
+    while len(_archives) > ARCHIVE_CACHE_SIZE:
+        (pid, _), oldest = _archives.popitem(last=False)
+        if pid == os.getpid():
+            oldest.close()
+    return archive
+
+
+def close_archives() -> None:
+    """このプロセスで開いたアーカイブをすべて閉じる"""
+
+    while _archives:
+        (pid, _), archive = _archives.popitem()
+        if pid == os.getpid():
+            archive.close()
+
+
+def is_archive(path: str | Path) -> bool:
+    return Path(path).suffix.lower() in ARCHIVE_SUFFIXES
+
+
+def list_archive_members(
+    path: str | Path, suffixes: Iterable[str] = (".htm", ".html")
+) -> list[ArchiveMember]:
+    """
+    zipアーカイブ内のファイルを、展開せずに列挙する
+
+    Parameters
+    ----------
+    path : str | Path
+        アーカイブのパス
+    suffixes : Iterable[str]
+        列挙するファイルの拡張子
+
+    Returns
+    -------
+    list[ArchiveMember]
+        メンバー名の順に並べたアーカイブ内のファイル
+    """
+
+    _path = path if isinstance(path, Path) else Path(path)
+    _suffixes = tuple(suffixes)
+    names = sorted(
+        info.filename
+        for info in open_archive(_path).infolist()
+        if not info.is_dir()
+        and PurePosixPath(info.filename).suffix.lower() in _suffixes
+    )
+    return [ArchiveMember(_path, name) for name in names]
+
+
+def as_financial_result_path(
+    path: "str | Path | ArchiveMember | tuple[str, bytes]",
+) -> "Path | ArchiveMember":
+    """
+    読み取りの入力を、ファイルのパスまたはアーカイブ内のファイルにそろえる
+
+    Parameters
+    ----------
+    path : str | Path | ArchiveMember | tuple[str, bytes]
+        ファイルのパス、アーカイブ内のファイル、または `(ファイル名, バイト列)` の組
+
+    Returns
+    -------
+    Path | ArchiveMember
+        ファイルのパス、またはアーカイブ内のファイル
+    """
+
+    if isinstance(path, (Path, ArchiveMember)):
+        return path
+    if isinstance(path, tuple):
+        return ArchiveMember.from_bytes(*path)
+    return Path(path)
+
+
+def iter_bytes_members(members: Iterable[tuple[str, bytes]]) -> Iterator[ArchiveMember]:
+    """
+    `(ファイル名, バイト列)` の組を、読み取りに渡せるファイルに変換する
+
+    Parameters
+    ----------
+    members : Iterable[tuple[str, bytes]]
+        ファイル名とファイルの内容
+
+    Returns
+    -------
+    Iterator[ArchiveMember]
+        メモリ上のバイト列として受け取ったファイル
+    """
+
+    for name, data in members:
+        yield ArchiveMember.from_bytes(name, data)
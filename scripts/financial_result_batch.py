@@ -0,0 +1,702 @@
+import argparse
+import functools
+import hashlib
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional, TypeVar
+
+from scripts.financial_result_archive import (
+    ArchiveMember,
+    as_financial_result_path,
+    is_archive,
+    list_archive_members,
+)
+from scripts.financial_result_cache import content_hash, open_result_cache
+from scripts.financial_result_grids import (
+    GRID_SUFFIX,
+    extract_segment_grids,
+    segment_grids_to_dataframe,
+    write_segment_grids,
+)
+from scripts.financial_result_journal import (
+    RETRY_REASONS,
+    BatchJournal,
+    JournalEntry,
+    Progress,
+    file_signature,
+)
+from scripts.financial_result_profile import Profile, profiling
+from scripts.financial_result_reader import HTML_PARSERS
+from scripts.financial_result_shard import merge_shards, parse_shard, select_shard
+from scripts.financial_result_to_dataframe import (
+    ENGINES,
+    ReadLog,
+    ReadResult,
+    financial_result_to_dataframe,
+    read_flags_to_dataframe,
+    read_html_failed_log,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HTML_SUFFIXES = (".htm", ".html")
+# ジャーナルを使用する場合に、進捗を出力する間隔 [s]
+DEFAULT_PROGRESS_INTERVAL = 10.0
+
+T = TypeVar("T")
+
+BatchResult = tuple[Path | ArchiveMember, Optional["pd.DataFrame"], ReadLog]
+# 読み取りの入力。`(ファイル名, バイト列)` の組はメモリ上のファイルとして読み取る
+BatchInput = str | Path | ArchiveMember | tuple[str, bytes]
+
+
+def list_financial_result_files(
+    inputs: Iterable[str | Path],
+) -> list[Path | ArchiveMember]:
+    """
+    入力に指定されたファイル・ディレクトリ・zipアーカイブから、決算短信のHTMLファイルを列挙する
+
+    Parameters
+    ----------
+    inputs : Iterable[str | Path]
+        HTMLファイル、HTMLファイルを含むディレクトリ、またはzipアーカイブのパス
+
+    Returns
+    -------
+    list[Path | ArchiveMember]
+        HTMLファイルのパスとアーカイブ内のHTMLファイルのリスト
+        (ディレクトリ内のファイル・アーカイブ内のファイルは名前順)
+    """
+
+    paths = []  # type: list[Path | ArchiveMember]
+    for i in inputs:
+        _path = i if isinstance(i, Path) else Path(i)
+        if _path.is_dir():
+            for p in sorted(p for p in _path.iterdir() if p.is_file()):
+                if is_archive(p):
+                    paths += list_archive_members(p, HTML_SUFFIXES)
+                elif p.suffix.lower() in HTML_SUFFIXES:
+                    paths.append(p)
+        elif is_archive(_path) and _path.is_file():
+            # アーカイブは展開せず、読み取る際にワーカーでファイルごとに展開する
+            paths += list_archive_members(_path, HTML_SUFFIXES)
+        else:
+            paths.append(_path)
+    return paths
+
+
+def _read_financial_result(
+    path: Path | ArchiveMember,
+    parser: Optional[str],
+    partial: bool,
+    cache_dir: Optional[str],
+    profile: bool = False,
+) -> BatchResult:
+    cache = open_result_cache(cache_dir) if cache_dir is not None else None
+    try:
+        if profile:
+            # 計測結果はファイルごとに読み取りのログへ記録される
+            with profiling():
+                df, log = financial_result_to_dataframe(path, parser, partial, cache)
+        else:
+            df, log = financial_result_to_dataframe(path, parser, partial, cache)
+    except Exception as ex:
+        # ノートブックのループと同様に、想定外のエラーは記録して次のファイルへ進む。
+        # 読み取り状況の表にすべてのファイルが含まれるよう、失敗として記録する
+        logger.warning("%s: %s", path, ex)
+        log = read_html_failed_log(f"{type(ex).__name__}: {ex}")
+        log.source = str(path)
+        return path, None, log
+    return path, df, log
+
+
+def iter_financial_results(
+    paths: Iterable[BatchInput],
+    max_workers: Optional[int] = None,
+    parser: Optional[str] = None,
+    partial: bool = False,
+    cache_dir: Optional[str | Path] = None,
+    profile: bool = False,
+) -> Iterator[BatchResult]:
+    """
+    複数の決算短信HTMLをプロセスプールで並列に読み込み、読み込み終えた順に結果を返す
+
+    Parameters
+    ----------
+    paths : Iterable[str | Path | ArchiveMember | tuple[str, bytes]]
+        決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+        または `(ファイル名, バイト列)` の組
+    max_workers : Optional[int]
+        ワーカープロセス数。Noneの場合はCPU数、1の場合はプロセスプールを使用しない
+    parser : Optional[str]
+        HTMLのパーサー
+    partial : bool
+        Trueの場合、セグメント報告のテーブル周辺のみを読み込む
+    cache_dir : Optional[str | Path]
+        読み取り結果のキャッシュのディレクトリ。指定した場合、内容が変わっていない
+        ファイルはキャッシュした結果を使用する
+    profile : bool
+        Trueの場合、段階ごとの処理時間を計測し、読み取りのログの `profile` に記録する
+
+    Returns
+    -------
+    Iterator[tuple[Path | ArchiveMember, Optional[pd.DataFrame], ReadLog]]
+        ファイルのパス(アーカイブ内のファイル)、読み取ったデータ、読み取りのログ
+    """
+
+    _paths = (as_financial_result_path(p) for p in paths)
+    _cache_dir = str(cache_dir) if cache_dir is not None else None
+    yield from _map_bounded(
+        functools.partial(
+            _read_financial_result,
+            parser=parser,
+            partial=partial,
+            cache_dir=_cache_dir,
+            profile=profile,
+        ),
+        _paths,
+        max_workers,
+    )
+
+
+def _map_bounded(
+    func: Callable[[Path | ArchiveMember], T],
+    paths: Iterable[Path | ArchiveMember],
+    max_workers: Optional[int],
+) -> Iterator[T]:
+    # max_workersが1の場合は、プロセスプールを使用せずに順に呼び出す
+    if max_workers == 1:
+        for path in paths:
+            yield func(path)
+        return
+
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 未処理の結果がメモリに溜まらないよう、投入するタスクの数を制限する
+        limit = workers * 2
+        running: set[Future[T]] = set()
+        for path in paths:
+            running.add(executor.submit(func, path))
+            if len(running) >= limit:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                yield from (future.result() for future in done)
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            yield from (future.result() for future in done)
+
+
+def read_financial_results(
+    paths: Iterable[BatchInput],
+    max_workers: Optional[int] = None,
+    parser: Optional[str] = None,
+    partial: bool = False,
+    cache_dir: Optional[str | Path] = None,
+    profile: Optional[Profile] = None,
+) -> tuple["pd.DataFrame", "pd.DataFrame"]:
+    """
+    複数の決算短信HTMLを並列に読み込み、セグメント情報と読み取り状況の表にまとめる
+
+    Parameters
+    ----------
+    paths : Iterable[str | Path | ArchiveMember | tuple[str, bytes]]
+        決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+        または `(ファイル名, バイト列)` の組
+    max_workers : Optional[int]
+        ワーカープロセス数
+    parser : Optional[str]
+        HTMLのパーサー
+    partial : bool
+        Trueの場合、セグメント報告のテーブル周辺のみを読み込む
+    cache_dir : Optional[str | Path]
+        読み取り結果のキャッシュのディレクトリ。指定した場合、内容が変わっていない
+        ファイルはキャッシュした結果を使用する
+    profile : Optional[Profile]
+        指定した場合、段階ごとの処理時間を計測し、全ファイルの合計を記録する
+
+    Returns
+    -------
+    tuple[pd.DataFrame, pd.DataFrame]
+        全ファイルのセグメント情報(列 `path` に読み込んだファイル)と、
+        ファイルごとの読み取り状況(ReadResultの各項目を0/1で表したもの)
+    """
+
+    return _collect_results(
+        iter_financial_results(
+            paths, max_workers, parser, partial, cache_dir, profile is not None
+        ),
+        profile,
+    )
+
+
+def _collect_results(
+    results: Iterable[tuple[object, Optional["pd.DataFrame"], ReadLog]],
+    profile: Optional[Profile] = None,
+) -> tuple["pd.DataFrame", "pd.DataFrame"]:
+    import pandas as pd
+
+    dfs = []
+    flags = []
+    sources = []
+    for path, df, log in results:
+        if profile is not None and log.profile is not None:
+            profile.merge(log.profile)
+        if df is not None and len(df) > 0:
+            dfs.append(df.assign(path=str(path)))
+        flags.append(log.status.flags)
+        sources.append(str(path))
+
+    data = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+    if len(data) > 0:
+        data = data.sort_values("path", kind="stable", ignore_index=True)
+    return data, _read_results_to_dataframe(flags, sources)
+
+
+def _read_results_to_dataframe(
+    flags: Iterable[int], sources: list[str]
+) -> "pd.DataFrame":
+    read_result_df = read_flags_to_dataframe(flags, sources)
+    read_result_df.index.name = "path"
+    return read_result_df.sort_index()
+
+
+def _output_path(
+    output_dir: str, path: Path | ArchiveMember, suffix: str = ".csv"
+) -> Path:
+    # 異なるディレクトリの同名のファイルが衝突しないよう、パスのハッシュ値を名前にする
+    name = hashlib.sha256(str(path).encode()).hexdigest()[:16]
+    return Path(output_dir).joinpath(f"{name}{suffix}")
+
+
+def _journal_financial_result(
+    path: Path | ArchiveMember,
+    parser: Optional[str],
+    partial: bool,
+    cache_dir: Optional[str],
+    output_dir: str,
+) -> JournalEntry:
+    start = time.perf_counter()
+    # 内容を読み込む前に記録し、読み取り中に変更された場合は再開時に読み取り直す
+    signature = file_signature(path)
+    digest = content_hash(path)
+    try:
+        cache = open_result_cache(cache_dir) if cache_dir is not None else None
+        # ジャーナルに記録するハッシュ値をキャッシュでも使用し、ファイルを1回だけハッシュする
+        df, log = financial_result_to_dataframe(
+            path, parser, partial, cache, digest=digest
+        )
+    except Exception as ex:
+        logger.warning("%s: %s", path, ex)
+        # 読み取り状況の表では、読み込めなかったファイルと同様に扱う
+        return JournalEntry(
+            str(path),
+            digest,
+            int(ReadResult(read_html_failed=True).flags),
+            error=f"{type(ex).__name__}: {ex}",
+            seconds=time.perf_counter() - start,
+            signature=signature,
+        )
+
+    output = None
+    rows = 0
+    if df is not None and len(df) > 0:
+        output = _output_path(output_dir, path)
+        # 異常終了した場合に、書きかけのファイルを結果として扱わないようにする
+        temporary = output.with_suffix(f".{os.getpid()}.tmp")
+        df.assign(path=str(path)).to_csv(temporary, index=False)
+        os.replace(temporary, output)
+        rows = len(df)
+    return JournalEntry(
+        str(path),
+        digest,
+        int(log.status.flags),
+        str(output) if output is not None else None,
+        rows,
+        seconds=time.perf_counter() - start,
+        signature=signature,
+    )
+
+
+def run_journaled_batch(
+    paths: Iterable[BatchInput],
+    journal: BatchJournal,
+    output_dir: str | Path,
+    max_workers: Optional[int] = None,
+    parser: Optional[str] = None,
+    partial: bool = False,
+    cache_dir: Optional[str | Path] = None,
+    retry: Iterable[str] = (),
+    progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+) -> Progress:
+    """
+    ジャーナルに記録されていないファイルのみを読み取り、ファイルごとに結果を書き出して記録する。
+    途中で異常終了した場合も、同じジャーナルを指定して実行すると続きから再開できる
+
+    Parameters
+    ----------
+    paths : Iterable[str | Path | ArchiveMember | tuple[str, bytes]]
+        決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+        または `(ファイル名, バイト列)` の組
+    journal : BatchJournal
+        読み取り終えたファイルを記録するジャーナル
+    output_dir : str | Path
+        ファイルごとの読み取り結果を書き出すディレクトリ
+    max_workers : Optional[int]
+        ワーカープロセス数
+    parser : Optional[str]
+        HTMLのパーサー
+    partial : bool
+        Trueの場合、セグメント報告のテーブル周辺のみを読み込む
+    cache_dir : Optional[str | Path]
+        読み取り結果のキャッシュのディレクトリ
+    retry : Iterable[str]
+        再試行する失敗理由 (`RETRY_REASONS`)
+    progress_interval : float
+        進捗とスループットをログに出力する間隔 [s]
+
+    Returns
+    -------
+    Progress
+        今回の実行の進捗
+    """
+
+    _paths = [as_financial_result_path(p) for p in paths]
+    pending = journal.pending(_paths, retry)
+    progress = Progress(len(pending), skipped=len(_paths) - len(pending))
+    _output_dir = Path(output_dir)
+    _output_dir.mkdir(parents=True, exist_ok=True)
+
+    logged = time.perf_counter()
+    for entry in _map_bounded(
+        functools.partial(
+            _journal_financial_result,
+            parser=parser,
+            partial=partial,
+            cache_dir=str(cache_dir) if cache_dir is not None else None,
+            output_dir=str(_output_dir),
+        ),
+        pending,
+        max_workers,
+    ):
+        # 書き出しを終えたファイルのみを記録するため、異常終了しても記録と出力は一致する
+        journal.record(entry)
+        progress.update(entry)
+        if time.perf_counter() - logged >= progress_interval:
+            logger.info("%s", progress.format())
+            logged = time.perf_counter()
+    logger.info("%s", progress.format())
+    return progress
+
+
+def write_journaled_results(
+    journal: BatchJournal,
+    paths: Iterable[str | Path | ArchiveMember],
+    output: str | Path,
+) -> "pd.DataFrame":
+    """
+    ジャーナルに記録された結果を結合し、`read_financial_results` と同じ形式で出力する
+
+    Parameters
+    ----------
+    journal : BatchJournal
+        読み取り終えたファイルを記録したジャーナル
+    paths : Iterable[str | Path | ArchiveMember]
+        出力に含める決算短信のHTMLファイルのパス、またはzipアーカイブ内のファイル
+    output : str | Path
+        `segments.csv` と `read_results.csv` を出力するディレクトリ
+
+    Returns
+    -------
+    pd.DataFrame
+        ファイルごとの読み取り状況(ReadResultの各項目を0/1で表したもの)
+    """
+
+    latest = journal.latest()
+    entries = sorted(
+        (latest[str(p)] for p in paths if str(p) in latest), key=lambda e: e.path
+    )
+    _output = Path(output)
+    # ファイルごとの結果はヘッダーを除いてそのまま連結し、DataFrameに読み込まない
+    with _output.joinpath("segments.csv").open("w", encoding="utf-8", newline="") as w:
+        header = False
+        for entry in entries:
+            if entry.output is None:
+                continue
+            with open(entry.output, encoding="utf-8", newline="") as r:
+                line = r.readline()
+                if not header:
+                    w.write(line)
+                    header = True
+                shutil.copyfileobj(r, w)
+
+    read_result_df = _read_results_to_dataframe(
+        [e.flags for e in entries], [e.path for e in entries]
+    )
+    read_result_df.to_csv(_output.joinpath("read_results.csv"))
+    return read_result_df
+
+
+def _dump_financial_result(
+    path: Path | ArchiveMember, output_dir: str, engine: str, parser: Optional[str]
+) -> Optional[Path]:
+    try:
+        grids = extract_segment_grids(path, engine, parser)
+    except Exception as ex:
+        logger.warning("%s: %s", path, ex)
+        return None
+    if grids is None:
+        logger.warning("%s: read_html_failed", path)
+        return None
+    output = _output_path(output_dir, path, GRID_SUFFIX)
+    write_segment_grids(grids, output)
+    return output
+
+
+def dump_financial_results(
+    paths: Iterable[BatchInput],
+    output_dir: str | Path,
+    max_workers: Optional[int] = None,
+    engine: str = "events",
+    parser: Optional[str] = None,
+) -> list[Path]:
+    """
+    複数の決算短信HTMLから、セグメント報告のテーブルの行・セルのみを取り出して保存する。
+    保存したファイルは `rerun_financial_results` で、HTMLを読み込まずに読み取り直せる
+
+    Parameters
+    ----------
+    paths : Iterable[str | Path | ArchiveMember | tuple[str, bytes]]
+        決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+        または `(ファイル名, バイト列)` の組
+    output_dir : str | Path
+        ファイルごとに `GRID_SUFFIX` のファイルを保存するディレクトリ
+    max_workers : Optional[int]
+        ワーカープロセス数
+    engine : str
+        テーブルを取り出す方式 (`ENGINES`)
+    parser : Optional[str]
+        `engine` が `bs4` の場合に使用するHTMLのパーサー
+
+    Returns
+    -------
+    list[Path]
+        保存したファイルのパス(名前順)。読み込めなかったファイルは含まない
+    """
+
+    if engine not in ENGINES:
+        raise ValueError(f"Unsupported engine: {engine}")
+
+    _output_dir = Path(output_dir)
+    _output_dir.mkdir(parents=True, exist_ok=True)
+    outputs = _map_bounded(
+        functools.partial(
+            _dump_financial_result,
+            output_dir=str(_output_dir),
+            engine=engine,
+            parser=parser,
+        ),
+        (as_financial_result_path(p) for p in paths),
+        max_workers,
+    )
+    return sorted(o for o in outputs if o is not None)
+
+
+def _rerun_financial_result(
+    path: Path | ArchiveMember,
+) -> tuple[str, Optional["pd.DataFrame"], ReadLog]:
+    try:
+        df, log = segment_grids_to_dataframe(str(path))
+    except (OSError, EOFError, ValueError, KeyError, TypeError) as ex:
+        # 形式のバージョンが異なるファイルや壊れたファイルは、失敗として記録して次へ進む
+        logger.warning("%s: %s", path, ex)
+        return str(path), None, read_html_failed_log(f"{type(ex).__name__}: {ex}")
+    # 読み取り結果は、保存したファイルではなく取り出し元のファイルのパスで記録する
+    return log.source or str(path), df, log
+
+
+def rerun_financial_results(
+    paths: Iterable[str | Path], max_workers: Optional[int] = 1
+) -> tuple["pd.DataFrame", "pd.DataFrame"]:
+    """
+    `dump_financial_results` で保存したテーブルの行・セルから、セグメント情報を読み取り直す。
+    HTMLの読み込みと構文解析を行わないため、読み取りの規則を調整しながら繰り返し実行できる
+
+    Parameters
+    ----------
+    paths : Iterable[str | Path]
+        保存したファイル、またはそれを含むディレクトリのパス
+    max_workers : Optional[int]
+        ワーカープロセス数。ファイルが小さいため、既定ではプロセスプールを使用しない
+
+    Returns
+    -------
+    tuple[pd.DataFrame, pd.DataFrame]
+        `read_financial_results` と同じ形式の、セグメント情報と読み取り状況の表
+    """
+
+    dumps = []  # type: list[Path | ArchiveMember]
+    for i in paths:
+        _path = i if isinstance(i, Path) else Path(i)
+        if _path.is_dir():
+            dumps += sorted(p for p in _path.iterdir() if p.name.endswith(GRID_SUFFIX))
+        else:
+            dumps.append(_path)
+    return _collect_results(_map_bounded(_rerun_financial_result, dumps, max_workers))
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.financial_result_batch",
+        description="決算短信HTMLからセグメント情報を一括で読み取る",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="HTMLファイルを読み取りCSVに出力する")
+    run.add_argument("inputs", nargs="+", help="HTMLファイル、それを含むディレクトリ、またはzipアーカイブ")
+    run.add_argument("-o", "--output", required=True, help="結果を出力するディレクトリ")
+    run.add_argument(
+        "-j", "--workers", type=int, default=None, help="ワーカープロセス数 (既定: CPU数)"
+    )
+    run.add_argument("--parser", choices=HTML_PARSERS, default=None, help="HTMLのパーサー")
+    run.add_argument(
+        "--partial",
+        action="store_true",
+        help="セグメント報告のテーブル周辺のみを読み込む (読み取れない場合は全体を読み込む)",
+    )
+    run.add_argument("--cache-dir", help="読み取り結果をキャッシュするディレクトリ")
+    run.add_argument(
+        "--profile",
+        action="store_true",
+        help="段階ごとの処理時間を計測し、出力先に profile.json として出力する",
+    )
+    run.add_argument(
+        "--journal",
+        help="読み取り終えたファイルを記録するジャーナル。記録済みのファイルは読み取らない",
+    )
+    run.add_argument(
+        "--shard",
+        help="i/N: 入力をファイルの内容のハッシュ値で N 個に分割し、i 番目 (0から始まる) のみを読み取る",
+    )
+    run.add_argument(
+        "--retry",
+        action="append",
+        choices=RETRY_REASONS,
+        default=[],
+        help="ジャーナルに記録済みでも、指定した理由で失敗したファイルは読み取り直す",
+    )
+
+    dump = subparsers.add_parser("dump", help="セグメント報告のテーブルの行・セルのみを取り出して保存する")
+    dump.add_argument("inputs", nargs="+", help="HTMLファイル、それを含むディレクトリ、またはzipアーカイブ")
+    dump.add_argument("-o", "--output", required=True, help="取り出した結果を保存するディレクトリ")
+    dump.add_argument(
+        "-j", "--workers", type=int, default=None, help="ワーカープロセス数 (既定: CPU数)"
+    )
+    dump.add_argument("--engine", choices=ENGINES, default="events", help="テーブルを取り出す方式")
+    dump.add_argument("--parser", choices=HTML_PARSERS, default=None, help="HTMLのパーサー")
+
+    rerun = subparsers.add_parser("rerun", help="dumpで保存した行・セルから、HTMLを読み込まずに読み取り直す")
+    rerun.add_argument("inputs", nargs="+", help="dumpの出力先のディレクトリ")
+    rerun.add_argument("-o", "--output", required=True, help="結果を出力するディレクトリ")
+    rerun.add_argument("-j", "--workers", type=int, default=1, help="ワーカープロセス数 (既定: 1)")
+
+    merge = subparsers.add_parser("merge", help="--shard で分割して実行した出力を結合する")
+    merge.add_argument("inputs", nargs="+", help="シャードごとの出力のディレクトリ")
+    merge.add_argument("-o", "--output", required=True, help="結果を出力するディレクトリ")
+
+    status = subparsers.add_parser("status", help="ジャーナルの読み取り状況を集計する")
+    status.add_argument("journal", help="ジャーナルのファイル")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    if args.command == "status":
+        if not Path(args.journal).exists():
+            parser.error(f"journal not found: {args.journal}")
+        with BatchJournal(args.journal) as journal:
+            print(f"{'files':<26}{len(journal):>8}")
+            for reason, count in journal.counts().items():
+                print(f"{reason:<26}{count:>8}")
+        return
+    if args.command == "dump":
+        outputs = dump_financial_results(
+            list_financial_result_files(args.inputs),
+            args.output,
+            args.workers,
+            args.engine,
+            args.parser,
+        )
+        logger.info("%d files dumped", len(outputs))
+        return
+
+    if args.command == "merge":
+        try:
+            read_result_df = merge_shards(args.inputs, args.output)
+        except ValueError as ex:
+            parser.error(str(ex))
+        completed = read_result_df["completed"].sum() if len(read_result_df) > 0 else 0
+        logger.info("%d files, %d completed", len(read_result_df), completed)
+        return
+
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    if args.command == "rerun":
+        data, read_result_df = rerun_financial_results(args.inputs, args.workers)
+        data.to_csv(output.joinpath("segments.csv"), index=False)
+        read_result_df.to_csv(output.joinpath("read_results.csv"))
+        completed = read_result_df["completed"].sum() if len(read_result_df) > 0 else 0
+        logger.info("%d files, %d completed", len(read_result_df), completed)
+        return
+
+    if args.journal is None and args.retry:
+        parser.error("--retry requires --journal")
+    if args.journal is not None and args.profile:
+        parser.error("--profile cannot be used with --journal")
+
+    paths = list_financial_result_files(args.inputs)
+    manifest = None
+    if args.shard is not None:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as ex:
+            parser.error(str(ex))
+        paths, manifest = select_shard(paths, *shard)
+        logger.info("shard %s: %d files", args.shard, len(paths))
+    profile = Profile() if args.profile else None
+    if args.journal is not None:
+        with BatchJournal(args.journal) as journal:
+            run_journaled_batch(
+                paths,
+                journal,
+                output.joinpath("files"),
+                args.workers,
+                args.parser,
+                args.partial,
+                args.cache_dir,
+                args.retry,
+            )
+            read_result_df = write_journaled_results(journal, paths, output)
+    else:
+        data, read_result_df = read_financial_results(
+            paths, args.workers, args.parser, args.partial, args.cache_dir, profile
+        )
+        data.to_csv(output.joinpath("segments.csv"), index=False)
+        read_result_df.to_csv(output.joinpath("read_results.csv"))
+
+    completed = read_result_df["completed"].sum() if len(read_result_df) > 0 else 0
+    logger.info("%d files, %d completed", len(read_result_df), completed)
+    if profile is not None:
+        output.joinpath("profile.json").write_text(profile.to_json())
+        logger.info("profile:\n%s", profile.report())
+    # 結合時にシャードの欠落・重複を確認できるよう、出力を終えてから記録する
+    if manifest is not None:
+        manifest.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+import functools
+import hashlib
+import importlib.metadata
+import os
+import pickle
+import sqlite3
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from scripts.financial_result_archive import ArchiveMember
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from scripts.financial_result_to_dataframe import ReadLog
+
+# キャッシュの保存形式を変更した場合に更新する
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 1 << 30
+
+CachedResult = tuple[Optional["pd.DataFrame"], "ReadLog"]
+
+
+@functools.cache
+def extraction_fingerprint() -> str:
+    """
+    読み取り処理のバージョンを表すフィンガープリントを取得する。
+    `scripts` 配下のソースコードやpandasのバージョンが変わると値が変わる
+
+    Returns
+    -------
+    str
+        フィンガープリント
+    """
+
+    # pandasを読み込まずにバージョンを取得する
+    pandas_version = importlib.metadata.version("pandas")
+    digest = hashlib.sha256(f"{CACHE_VERSION}:{pandas_version}".encode())
+    for source in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(source.name.encode())
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+def content_hash(path: str | Path | ArchiveMember) -> Optional[str]:
+    """
+    ファイルの内容のハッシュ値を取得する
+
+    Parameters
+    ----------
+    path : str | Path | ArchiveMember
+        ファイルのパス、またはzipアーカイブ内のファイル
+
+    Returns
+    -------
+    Optional[str]
+        SHA-256のハッシュ値。ファイルが存在しない場合はNone
+    """
+
+    if isinstance(path, ArchiveMember):
+        if not path.exists():
+            return None
+        opened = path.open()
+    else:
+        _path = path if isinstance(path, Path) else Path(path)
+        if not _path.is_file():
+            return None
+        opened = _path.open("rb")
+
+    digest = hashlib.sha256()
+    with opened as r:
+        for chunk in iter(lambda: r.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    決算短信の読み取り結果を、ファイルの内容と読み取り処理のフィンガープリントをキーに
+    ディスクへ保存するキャッシュ。合計サイズが上限を超えると、最も古く参照された結果から削除する
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        self.directory = directory if isinstance(directory, Path) else Path(directory)
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint or extraction_fingerprint()
+
+        self.directory.joinpath("entries").mkdir(parents=True, exist_ok=True)
+        # 複数のワーカープロセスから同時に参照されるため、WALモードで開く
+        self.connection = sqlite3.connect(
+            self.directory.joinpath("index.sqlite3"), timeout=60, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+        )
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _key(self, digest: str) -> str:
+        return hashlib.sha256(f"{digest}:{self.fingerprint}".encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory.joinpath("entries", key[:2], f"{key}.pkl")
+
+    def get(
+        self, path: str | Path | ArchiveMember, digest: Optional[str] = None
+    ) -> Optional[CachedResult]:
+        """
+        ファイルの読み取り結果をキャッシュから取得する
+
+        Parameters
+        ----------
+        path : str | Path | ArchiveMember
+            決算短信のHTMLファイルのパス、またはzipアーカイブ内のファイル
+        digest : Optional[str]
+            `content_hash` で計算済みのハッシュ値。Noneの場合はファイルから計算する
+
+        Returns
+        -------
+        Optional[tuple[Optional[pd.DataFrame], ReadLog]]
+            キャッシュされた読み取り結果。キャッシュがない場合はNone
+        """
+
+        if digest is None:
+            digest = content_hash(path)
+        if digest is None:
+            return None
+
+        key = self._key(digest)
+        try:
+            with self._entry_path(key).open("rb") as r:
+                result = pickle.load(r)  # type: CachedResult
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        self.connection.execute(
+            "UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key)
+        )
+        return result
+
+    def put(
+        self,
+        path: str | Path | ArchiveMember,
+        df: Optional["pd.DataFrame"],
+        log: "ReadLog",
+        digest: Optional[str] = None,
+    ) -> None:
+        """
+        ファイルの読み取り結果をキャッシュに保存する
+
+        Parameters
+        ----------
+        path : str | Path | ArchiveMember
+            決算短信のHTMLファイルのパス、またはzipアーカイブ内のファイル
+        df : Optional[pd.DataFrame]
+            読み取ったデータ
+        log : ReadLog
+            読み取りのログ
+        digest : Optional[str]
+            `content_hash` で計算済みのハッシュ値。Noneの場合はファイルから計算する
+        """
+
+        if digest is None:
+            digest = content_hash(path)
+        if digest is None:
+            return
+
+        key = self._key(digest)
+        entry = self._entry_path(key)
+        entry.parent.mkdir(exist_ok=True)
+        # 読み込み中のプロセスが不完全なファイルを参照しないよう、書き込み後に置き換える
+        temporary = entry.with_suffix(f".{os.getpid()}.tmp")
+        with temporary.open("wb") as w:
+            pickle.dump((df, log), w, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, entry)
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+            (key, digest, self.fingerprint, entry.stat().st_size, time.time()),
+        )
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        合計サイズが上限以下になるまで、最も古く参照された結果から削除する
+        """
+
+        (total,) = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        for key, size in self.connection.execute(
+            "SELECT key, size FROM entries ORDER BY accessed"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append(key)
+            total -= size
+        self._remove(evicted)
+
+    def invalidate(self, path: Optional[str | Path | ArchiveMember] = None) -> int:
+        """
+        キャッシュを削除する
+
+        Parameters
+        ----------
+        path : Optional[str | Path | ArchiveMember]
+            削除する結果のファイルのパス。Noneの場合は、
+            現在のフィンガープリントと異なる(古い読み取り処理の)結果をすべて削除する
+
+        Returns
+        -------
+        int
+            削除した結果の数
+        """
+
+        if path is None:
+            rows = self.connection.execute(
+                "SELECT key FROM entries WHERE fingerprint != ?", (self.fingerprint,)
+            ).fetchall()
+        else:
+            digest = content_hash(path)
+            if digest is None:
+                return 0
+            rows = self.connection.execute(
+                "SELECT key FROM entries WHERE content_hash = ?", (digest,)
+            ).fetchall()
+
+        keys = [key for (key,) in rows]
+        self._remove(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        """
+        キャッシュをすべて削除する
+        """
+
+        keys = [key for (key,) in self.connection.execute("SELECT key FROM entries")]
+        self._remove(keys)
+
+    def _remove(self, keys: list[str]) -> None:
+        for key in keys:
+            self._entry_path(key).unlink(missing_ok=True)
+        self.connection.executemany(
+            "DELETE FROM entries WHERE key = ?", [(key,) for key in keys]
+        )
+
+    def __len__(self) -> int:
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return count
+
+
+def open_result_cache(
+    directory: str, max_bytes: int = DEFAULT_MAX_BYTES
+) -> ResultCache:
+    """
+    プロセスごとに1つのキャッシュを開く。ワーカープロセスからの利用を想定する
+
+    Parameters
+    ----------
+    directory : str
+        キャッシュのディレクトリ
+    max_bytes : int
+        キャッシュの合計サイズの上限
+
+    Returns
+    -------
+    ResultCache
+        キャッシュ
+    """
+
+    # fork元のプロセスで開いたSQLiteの接続は使用できないため、プロセスIDごとに開く
+    return _open_result_cache(directory, max_bytes, os.getpid())
+
+
+@functools.cache
+def _open_result_cache(directory: str, max_bytes: int, pid: int) -> ResultCache:
+    return ResultCache(directory, max_bytes)
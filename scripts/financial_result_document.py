@@ -0,0 +1,311 @@
+import dataclasses
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Iterable, Optional
+
+import scripts.financial_result_reader as frr
+from scripts.financial_result_archive import ArchiveMember
+from scripts.financial_result_profile import profiled
+from scripts.financial_result_to_dataframe import html_to_dataframe
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from bs4 import BeautifulSoup
+
+    from scripts.financial_result_to_dataframe import ReadLog
+
+
+class FinancialResultDocument:
+    """
+    一度だけ読み込んだ決算短信HTML。
+    登録した抽出器 (`EXTRACTORS`) はテーブルの索引を共有するため、
+    抽出器を追加しても構文解析は繰り返さず、増えるのはその抽出器のテーブルの走査のみとなる
+    """
+
+    def __init__(
+        self,
+        html: "BeautifulSoup",
+        source: Optional[str] = None,
+        encoding: Optional[str] = None,
+    ) -> None:
+        self.html = html
+        self.index = frr.TableIndex(html)
+        # 読み込んだファイルのパス
+        self.source = source
+        # 読み込んだファイルの文字コード
+        self.encoding = encoding if encoding is not None else html.original_encoding
+
+    @classmethod
+    def read(
+        cls,
+        path: str | Path | ArchiveMember | BinaryIO,
+        parser: Optional[str] = None,
+        encoding: Optional[str] = None,
+    ) -> Optional["FinancialResultDocument"]:
+        """
+        決算短信HTMLを読み込む
+
+        Parameters
+        ----------
+        path : str | Path | ArchiveMember | BinaryIO
+            決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+            またはバイナリのストリーム
+        parser : Optional[str]
+            HTMLのパーサー
+        encoding : Optional[str]
+            文字コード。Noneの場合はBOMや文字コードの宣言から判定する
+
+        Returns
+        -------
+        Optional[FinancialResultDocument]
+            読み込んだ決算短信。読み込めなかった場合はNone
+        """
+
+        html = frr.read_financial_result_html(path, parser, encoding=encoding)
+        if html is None:
+            return None
+        source = str(path) if isinstance(path, (str, Path, ArchiveMember)) else None
+        return cls(html, source)
+
+    def extract(self, names: Optional[Iterable[str]] = None) -> dict[str, Any]:
+        """
+        登録した抽出器で情報を読み取る
+
+        Parameters
+        ----------
+        names : Optional[Iterable[str]]
+            使用する抽出器の名前。Noneの場合は登録したすべての抽出器
+
+        Returns
+        -------
+        dict[str, Any]
+            抽出器の名前と、読み取った結果
+        """
+
+        _names = list(EXTRACTORS) if names is None else list(names)
+        unknown = [name for name in _names if name not in EXTRACTORS]
+        if unknown:
+            raise ValueError(f"Unsupported extractors: {unknown}")
+        return {name: EXTRACTORS[name](self) for name in _names}
+
+
+Extractor = Callable[[FinancialResultDocument], Any]
+
+# 名前と、決算短信から情報を読み取る抽出器
+EXTRACTORS = {}  # type: dict[str, Extractor]
+
+
+def register_extractor(name: str) -> Callable[[Extractor], Extractor]:
+    """
+    決算短信から情報を読み取る抽出器を登録する
+
+    Parameters
+    ----------
+    name : str
+        抽出器の名前。`FinancialResultDocument.extract` の結果のキーとなる
+
+    Returns
+    -------
+    Callable[[Extractor], Extractor]
+        抽出器を登録するデコレータ
+    """
+
+    def decorator(extractor: Extractor) -> Extractor:
+        if name in EXTRACTORS:
+            raise ValueError(f"Extractor already registered: {name}")
+        EXTRACTORS[name] = extractor
+        return extractor
+
+    return decorator
+
+
+def extract_financial_result(
+    path: str | Path | ArchiveMember | BinaryIO,
+    names: Optional[Iterable[str]] = None,
+    parser: Optional[str] = None,
+) -> Optional[dict[str, Any]]:
+    """
+    決算短信HTMLを一度だけ読み込み、登録した抽出器で情報を読み取る
+
+    Parameters
+    ----------
+    path : str | Path | ArchiveMember | BinaryIO
+        決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+        またはバイナリのストリーム
+    names : Optional[Iterable[str]]
+        使用する抽出器の名前。Noneの場合は登録したすべての抽出器
+    parser : Optional[str]
+        HTMLのパーサー
+
+    Returns
+    -------
+    Optional[dict[str, Any]]
+        抽出器の名前と、読み取った結果。HTMLを読み込めなかった場合はNone
+    """
+
+    document = FinancialResultDocument.read(path, parser)
+    if document is None:
+        return None
+    return document.extract(names)
+
+
+@register_extractor("segments")
+def extract_segments(
+    document: FinancialResultDocument,
+) -> tuple[Optional["pd.DataFrame"], "ReadLog"]:
+    """
+    セグメント情報を読み取る (`financial_result_to_dataframe` と同じ結果)
+
+    Parameters
+    ----------
+    document : FinancialResultDocument
+        読み込んだ決算短信
+
+    Returns
+    -------
+    tuple[Optional[pd.DataFrame], ReadLog]
+        セグメント情報と読み取りのログ
+    """
+
+    df, log = html_to_dataframe(document.index)
+    log.source = document.source
+    log.encoding = document.encoding
+    for ex in log.logs:
+        ex.source = document.source
+    return df, log
+
+
+# 損益計算書の主要な勘定の種類と、勘定科目の表現
+HEADLINE_ACCOUNTS = {
+    "Sales": re.compile(r"(売上高|売上収益|営業収益)(合計)?"),
+    "OperatingProfit": re.compile(r"営業(利益|損失)(又は営業(利益|損失)\(△\))?"),
+    "OrdinaryProfit": re.compile(r"経常(利益|損失)(又は経常(利益|損失)\(△\))?"),
+    "NetProfit": re.compile(r"(親会社株主|親会社の所有者)に帰属する(当期|四半期|中間)(純利益|純損失|利益|損失)(又は.*)?"),
+}
+# 損益計算書のテーブルを絞り込むテキスト
+INCOME_STATEMENT_TEXTS = ("営業利益", "営業損失")
+# 前期・当期の列の見出しの先頭
+HEADLINE_PERIOD_PREFIXES = {"previous": "前", "current": "当"}
+
+
+@dataclass(frozen=True, slots=True)
+class HeadlineFigure(frr.Record):
+    period_kind: str
+    account_kind: str
+    account_name: str
+    account_unit: int
+    value: float
+
+
+HEADLINE_COLUMNS = [f.name for f in dataclasses.fields(HeadlineFigure)]
+
+
+def find_period_columns(grid: frr.TableGrid) -> Optional[tuple[int, dict[str, int]]]:
+    """
+    前期・当期の見出しが並ぶ行と、それぞれの表示上の列を検索する
+
+    Parameters
+    ----------
+    grid : TableGrid
+        テーブルの行・セル
+
+    Returns
+    -------
+    Optional[tuple[int, dict[str, int]]]
+        見出しの行の位置と、期間の種類 (`previous`, `current`) ごとの列の位置。
+        見つからない場合はNone
+    """
+
+    for row, line in enumerate(grid.logical_rows):
+        columns = {}  # type: dict[str, int]
+        for column, i in enumerate(line):
+            # 他の行から続くセルや、colspanで続く列は見出しとして扱わない
+            if i is None or grid.cells[i].row != row:
+                continue
+            if column > 0 and line[column - 1] == i:
+                continue
+            for kind, prefix in HEADLINE_PERIOD_PREFIXES.items():
+                if grid.cells[i].compact.startswith(prefix):
+                    columns.setdefault(kind, column)
+        if len(columns) == len(HEADLINE_PERIOD_PREFIXES):
+            return row, columns
+    return None
+
+
+def read_headline_figures(grid: frr.TableGrid) -> list[HeadlineFigure]:
+    """
+    損益計算書のテーブルから、主要な勘定の前期・当期の値を読み取る
+
+    Parameters
+    ----------
+    grid : TableGrid
+        テーブルの行・セル
+
+    Returns
+    -------
+    list[HeadlineFigure]
+        勘定の種類ごとに最初に見つかった行の値
+    """
+
+    header = find_period_columns(grid)
+    if header is None:
+        return []
+    header_row, columns = header
+    unit = frr.DEFAULT_EXTRACTOR.read_table_unit(grid)
+
+    figures = []
+    found = set()  # type: set[str]
+    for row in range(header_row + 1, len(grid.rows)):
+        # 字下げのための空のセルを除いた、行の最初のセルを勘定科目とする
+        labels = [c for c in grid.row_cells(row) if c.row == row and c.compact]
+        if not labels:
+            continue
+        for kind, pattern in HEADLINE_ACCOUNTS.items():
+            if kind in found or not pattern.fullmatch(labels[0].compact):
+                continue
+            found.add(kind)
+            for period_kind, column in columns.items():
+                cell = grid.cell_at(row, column)
+                value = frr.parse_values([cell.text])[0] if cell is not None else None
+                if value is not None:
+                    figures.append(
+                        HeadlineFigure(
+                            period_kind, kind, labels[0].compact, unit, value
+                        )
+                    )
+    return figures
+
+
+@register_extractor("income_statement")
+@profiled("extract_income_statement")
+def extract_income_statement(
+    document: FinancialResultDocument,
+) -> Optional["pd.DataFrame"]:
+    """
+    連結損益計算書から、売上高・営業利益・経常利益・親会社株主に帰属する純利益の
+    前期・当期の値を読み取る
+
+    Parameters
+    ----------
+    document : FinancialResultDocument
+        読み込んだ決算短信
+
+    Returns
+    -------
+    Optional[pd.DataFrame]
+        期間・勘定ごとの値。`value` はテーブルに記載された値で、単位は `account_unit`。
+        損益計算書のテーブルが見つからない場合はNone
+    """
+
+    for table in document.index.find_tables(*INCOME_STATEMENT_TEXTS):
+        figures = read_headline_figures(document.index.grid(table))
+        # 売上高と営業利益の両方を読み取れた最初のテーブルを損益計算書とする
+        kinds = {f.account_kind for f in figures}
+        if {"Sales", "OperatingProfit"} <= kinds:
+            import pandas as pd
+
+            return pd.DataFrame(
+                [f.astuple() for f in figures], columns=HEADLINE_COLUMNS
+            )
+    return None
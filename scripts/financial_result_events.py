@@ -0,0 +1,326 @@
+import html
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from html.entities import html5
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional
+
+import scripts.financial_result_reader as frr
+from scripts.financial_result_archive import ArchiveMember
+from scripts.financial_result_profile import file_size, profiled
+
+# 終了タグを持たない要素。開始タグの時点で閉じたものとして扱う
+VOID_ELEMENTS = frozenset(
+    [
+        "area",
+        "base",
+        "basefont",
+        "bgsound",
+        "br",
+        "col",
+        "command",
+        "embed",
+        "frame",
+        "hr",
+        "image",
+        "img",
+        "input",
+        "isindex",
+        "keygen",
+        "link",
+        "menuitem",
+        "meta",
+        "nextid",
+        "param",
+        "source",
+        "spacer",
+        "track",
+        "wbr",
+    ]
+)
+# 内部のテキストが `get_text` の対象とならない要素
+STRING_CONTAINERS = frozenset(["rt", "rp", "style", "script", "template"])
+# 空白のみのテキストを1文字にまとめない要素
+PRESERVE_WHITESPACE = frozenset(["pre", "textarea"])
+ASCII_SPACES = " \n\t\x0c\r"
+CHARREF = re.compile(r"(x[0-9a-f]+|[0-9]+)(.*)", re.IGNORECASE | re.DOTALL)
+
+
+@dataclass(eq=False)
+class _TableCapture:
+    """読み取り中のテーブルの行・セルと、テーブル前方の<p>要素のテキスト"""
+
+    grid: frr.TableGrid
+    paragraphs: list[list[str]]
+    open_rows: list[int] = field(default_factory=list)
+    # 「報告セグメント」のテキストで、セグメント報告のテーブルか判定済み
+    checked: bool = False
+
+
+@dataclass(eq=False)
+class _OpenElement:
+    name: str
+    # <td>・<p>要素: 要素内のテキスト
+    texts: Optional[list[str]] = None
+    # <td>要素: 読み取り中のテーブルに追加したセル
+    cells: list[frr.GridCell] = field(default_factory=list)
+    # <tr>要素: 行を追加したテーブル
+    rows: list[_TableCapture] = field(default_factory=list)
+    # <table>要素
+    table: Optional[_TableCapture] = None
+
+
+class SegmentTableParser(HTMLParser):
+    """
+    構文木を作らずに、html.parserのイベントからセグメント報告のテーブルを読み取る。
+
+    Beautiful Soup (html.parser) が作る構文木と同じ入れ子・テキストになるよう、
+    開いている要素のスタックのみを保持する。直近の<p>要素のテキストを追跡し、
+    テーブルは「報告セグメント」のテキストで判定されるまでの間のみ行・セルを記録するため、
+    使用するメモリは文書の大きさではなく、テーブルの大きさに比例する
+    """
+
+    def __init__(self) -> None:
+        # 文字参照はBeautiful Soupと同様に、テキストとは別に受け取って変換する
+        super().__init__(convert_charrefs=False)
+        # 文書の順に見つかったセグメント報告のテーブル
+        self.segment_tables = []  # type: list[_TableCapture]
+        self._stack = []  # type: list[_OpenElement]
+        self._open = {}  # type: dict[str, int]
+        self._data = []  # type: list[str]
+        # 開いている<td>・<p>要素のテキスト
+        self._texts = []  # type: list[list[str]]
+        self._paragraphs = deque(maxlen=frr.PERIOD_FIND_LIMIT)  # type: deque[list[str]]
+        # 開いているテーブル(外側から順)と、行・セルを記録しているテーブル
+        self._tables = []  # type: list[_TableCapture]
+        self._captures = []  # type: list[_TableCapture]
+        # 直前の<td>要素がcolspanを持つか
+        self._last_td_colspan = False
+        self._closed_void = []  # type: list[str]
+        self._containers = 0
+        self._preserve = 0
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        self._start(tag, attrs)
+        if tag in VOID_ELEMENTS:
+            self._end(tag)
+            # 続けて終了タグが記載されている場合は無視する
+            self._closed_void.append(tag)
+
+    def handle_startendtag(
+        self, tag: str, attrs: list[tuple[str, Optional[str]]]
+    ) -> None:
+        self._start(tag, attrs)
+        self._end(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._closed_void:
+            self._closed_void.remove(tag)
+        else:
+            self._end(tag)
+
+    def handle_data(self, data: str) -> None:
+        self._data.append(data)
+
+    def handle_charref(self, name: str) -> None:
+        match = CHARREF.match(name)
+        if match is None:
+            self._data.append(name)
+        else:
+            self._data.append(html.unescape(f"&#{match.group(1)};") + match.group(2))
+
+    def handle_entityref(self, name: str) -> None:
+        self._data.append(html5.get(f"{name};", f"&{name}"))
+
+    # コメントや宣言も文字列として扱うが、<td>・<p>要素のテキストには含めない
+    def handle_comment(self, data: str) -> None:
+        self._flush()
+        self._string(data, False)
+
+    def handle_decl(self, decl: str) -> None:
+        self._flush()
+        self._string(decl[len("DOCTYPE ") :], False)
+
+    def handle_pi(self, data: str) -> None:
+        self._flush()
+        self._string(data, False)
+
+    def unknown_decl(self, data: str) -> None:
+        self._flush()
+        if data.upper().startswith("CDATA["):
+            self._string(data[len("CDATA[") :], True)
+        else:
+            self._string(data, False)
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+        while self._stack:
+            self._pop()
+        # 祖先の<p>要素はテーブルより後のテキストも含むため、最後にテキストを確定する
+        for capture in self.segment_tables:
+            capture.grid.paragraphs = [
+                "".join(texts).strip() for texts in capture.paragraphs
+            ]
+
+    @property
+    def grids(self) -> list[frr.TableGrid]:
+        return [capture.grid for capture in self.segment_tables]
+
+    def _start(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        self._flush()
+        element = _OpenElement(tag)
+        if tag == "table":
+            grid = frr.TableGrid(position=self.getpos())
+            element.table = _TableCapture(grid, list(reversed(self._paragraphs)))
+            self._tables.append(element.table)
+            self._captures.append(element.table)
+        elif tag == "tr":
+            for capture in self._captures:
+                capture.open_rows.append(capture.grid.open_row())
+            element.rows = list(self._captures)
+        elif tag == "td":
+            # 同じ属性が複数ある場合は後の値を使用する
+            attributes = {key: value or "" for key, value in attrs}
+            self._last_td_colspan = "colspan" in attributes
+            element.texts = []
+            element.cells = [
+                capture.grid.add_cell(
+                    capture.open_rows,
+                    "",
+                    attributes.get("rowspan"),
+                    attributes.get("colspan"),
+                )
+                for capture in self._captures
+            ]
+            self._texts.append(element.texts)
+        elif tag == "p":
+            element.texts = []
+            self._texts.append(element.texts)
+            self._paragraphs.append(element.texts)
+
+        if tag in STRING_CONTAINERS:
+            self._containers += 1
+        if tag in PRESERVE_WHITESPACE:
+            self._preserve += 1
+        self._stack.append(element)
+        self._open[tag] = self._open.get(tag, 0) + 1
+
+    def _end(self, tag: str) -> None:
+        self._flush()
+        # 開いていない要素の終了タグは無視し、開いている場合は内側の要素もまとめて閉じる
+        if not self._open.get(tag):
+            return
+        while self._stack:
+            if self._pop().name == tag:
+                break
+
+    def _pop(self) -> _OpenElement:
+        element = self._stack.pop()
+        self._open[element.name] -= 1
+        if element.texts is not None:
+            self._texts.pop()
+        if element.cells:
+            text = "".join(element.texts or []).strip()
+            compact = frr.NORMALIZER.sub("", text)
+            for cell in element.cells:
+                cell.text = text
+                cell.compact = compact
+        for capture in element.rows:
+            capture.open_rows.pop()
+        if element.table is not None:
+            self._tables.pop()
+            if element.table in self._captures:
+                self._captures.remove(element.table)
+
+        if element.name in STRING_CONTAINERS:
+            self._containers -= 1
+        if element.name in PRESERVE_WHITESPACE:
+            self._preserve -= 1
+        return element
+
+    def _flush(self) -> None:
+        # タグの間のテキストを、Beautiful Soupの1つの文字列と同じ単位にまとめる
+        if not self._data:
+            return
+        data = "".join(self._data)
+        self._data = []
+        if not self._preserve and not data.strip(ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        self._string(data, not self._containers)
+
+    def _string(self, data: str, text: bool) -> None:
+        if text:
+            for texts in self._texts:
+                texts.append(data)
+        # `find_segment_tables` は、<script>要素内やコメントの文字列も検索する
+        if data == frr.SEGMENT_TEXT:
+            self._check_tables()
+
+    def _check_tables(self) -> None:
+        # `find_segment_tables` と同様に、各テーブルで最初に見つかったテキストの
+        # 直前の<td>要素がcolspanを持つ場合に、セグメント報告のテーブルとする
+        for capture in self._tables:
+            if capture.checked:
+                continue
+            capture.checked = True
+            if self._last_td_colspan:
+                self.segment_tables.append(capture)
+            elif capture in self._captures:
+                self._captures.remove(capture)
+
+
+@profiled("collect_segment_grids")
+def collect_segment_grids(chunks: Iterable[str]) -> list[frr.TableGrid]:
+    """
+    HTMLのテキストを順にhtml.parserへ渡し、セグメント報告のテーブルの行・セルを取り出す
+
+    Parameters
+    ----------
+    chunks : Iterable[str]
+        HTMLのテキスト。分割されたテキストは結合せずに順に読み込む
+
+    Returns
+    -------
+    list[TableGrid]
+        `find_segment_tables` と同じ順に並べたテーブルの行・セル
+    """
+
+    parser = SegmentTableParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return parser.grids
+
+
+@profiled("read_segment_grids", file_size)
+def read_segment_grids(
+    path: str | Path | ArchiveMember | BinaryIO, encoding: Optional[str] = None
+) -> Optional[tuple[list[frr.TableGrid], str]]:
+    """
+    決算短信のHTMLを構文木を作らずに読み込み、セグメント報告のテーブルの行・セルを取り出す
+
+    Parameters
+    ----------
+    path : str | Path | ArchiveMember | BinaryIO
+        決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+        またはHTMLのバイト列を読み込むストリーム
+    encoding : Optional[str]
+        文字コード。Noneの場合はHTMLの先頭から判定する
+
+    Returns
+    -------
+    Optional[tuple[list[TableGrid], str]]
+        テーブルの行・セルと文字コード。ファイルが存在しない場合はNone
+    """
+
+    opened = frr.open_financial_result(path)
+    if opened is None:
+        return None
+
+    with opened as r:
+        _encoding, chunks = frr.decode_normalized_text(r, encoding)
+        grids = collect_segment_grids(chunks)
+    return grids, _encoding
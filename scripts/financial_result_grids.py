@@ -0,0 +1,217 @@
+import gzip
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Optional
+
+import scripts.financial_result_reader as frr
+from scripts.financial_result_archive import ArchiveMember
+from scripts.financial_result_cache import content_hash
+from scripts.financial_result_events import read_segment_grids
+from scripts.financial_result_profile import file_size, profiled
+from scripts.financial_result_to_dataframe import (
+    ENGINES,
+    ReadException,
+    ReadLog,
+    ReadResult,
+    grids_to_dataframe,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 保存形式を変更した場合に更新する
+GRID_FORMAT_VERSION = 1
+GRID_SUFFIX = ".grids.json.gz"
+# セルの項目ごとに列として保存する。`compact` はテキストから復元する
+CELL_COLUMNS = ("text", "rowspan", "colspan", "row", "next_row")
+
+
+@dataclass
+class SegmentGrids:
+    """
+    1つの決算短信から取り出したセグメント報告のテーブルの行・セル。
+    読み取りの規則を調整する際に、HTMLを読み込み直さずに読み取りを再実行するために保存する
+    """
+
+    grids: list[frr.TableGrid] = field(default_factory=list)
+    encoding: Optional[str] = None
+    # 取り出し元のファイルのパスと、その内容のハッシュ値
+    source: Optional[str] = None
+    content_hash: Optional[str] = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "version": GRID_FORMAT_VERSION,
+            "source": self.source,
+            "content_hash": self.content_hash,
+            "encoding": self.encoding,
+            "tables": [_grid_to_dict(grid) for grid in self.grids],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "SegmentGrids":
+        if data.get("version") != GRID_FORMAT_VERSION:
+            raise ValueError(f"Unsupported grid format version: {data.get('version')}")
+        return cls(
+            [_grid_from_dict(table) for table in data["tables"]],
+            data["encoding"],
+            data["source"],
+            data["content_hash"],
+        )
+
+
+def _grid_to_dict(grid: frr.TableGrid) -> dict[str, Any]:
+    table = {
+        column: [getattr(cell, column) for cell in grid.cells]
+        for column in CELL_COLUMNS
+    }  # type: dict[str, Any]
+    table["rows"] = grid.rows
+    table["row_first_cells"] = grid.row_first_cells
+    table["paragraphs"] = grid.paragraphs
+    table["position"] = grid.position
+    return table
+
+
+def _grid_from_dict(table: dict[str, Any]) -> frr.TableGrid:
+    cells = [
+        frr.GridCell(
+            text, frr.NORMALIZER.sub("", text), rowspan, colspan, row, next_row
+        )
+        for text, rowspan, colspan, row, next_row in zip(
+            *(table[column] for column in CELL_COLUMNS)
+        )
+    ]
+    position = table["position"]
+    return frr.TableGrid(
+        cells,
+        table["rows"],
+        table["row_first_cells"],
+        table["paragraphs"],
+        None if position is None else (position[0], position[1]),
+    )
+
+
+@profiled("extract_segment_grids", file_size)
+def extract_segment_grids(
+    path: str | Path | ArchiveMember | BinaryIO,
+    engine: str = "events",
+    parser: Optional[str] = None,
+) -> Optional[SegmentGrids]:
+    """
+    決算短信のHTMLから、セグメント報告のテーブルの行・セルと前方の<p>要素のテキストを取り出す
+
+    Parameters
+    ----------
+    path : str | Path | ArchiveMember | BinaryIO
+        決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+        またはHTMLのバイト列を読み込むストリーム
+    engine : str
+        テーブルを取り出す方式 (`ENGINES`)
+    parser : Optional[str]
+        `engine` が `bs4` の場合に使用するHTMLのパーサー
+
+    Returns
+    -------
+    Optional[SegmentGrids]
+        テーブルの行・セル。ファイルが存在しない場合はNone
+    """
+
+    if engine not in ENGINES:
+        raise ValueError(f"Unsupported engine: {engine}")
+
+    encoding = None  # type: Optional[str]
+    if engine == "events":
+        read = read_segment_grids(path)
+        if read is None:
+            return None
+        grids, encoding = read
+    else:
+        html = frr.read_financial_result_html(path, parser)
+        if html is None:
+            return None
+        grids = [frr.TableGrid.from_tag(t) for t in frr.find_segment_tables(html)]
+        encoding = html.original_encoding
+
+    if isinstance(path, (str, Path, ArchiveMember)):
+        return SegmentGrids(grids, encoding, str(path), content_hash(path))
+    return SegmentGrids(grids, encoding)
+
+
+def write_segment_grids(grids: SegmentGrids, output: str | Path) -> None:
+    """
+    テーブルの行・セルを、gzipで圧縮したJSONに保存する
+
+    Parameters
+    ----------
+    grids : SegmentGrids
+        テーブルの行・セル
+    output : str | Path
+        保存するファイルのパス
+    """
+
+    _output = output if isinstance(output, Path) else Path(output)
+    # 異常終了した場合に、書きかけのファイルを読み込まないようにする
+    temporary = _output.with_name(f"{_output.name}.{os.getpid()}.tmp")
+    data = json.dumps(grids.to_dict(), ensure_ascii=False, separators=(",", ":"))
+    # 同じ内容からは同じファイルになるよう、更新日時を記録しない
+    with open(temporary, "wb") as f:
+        with gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as w:
+            w.write(data.encode("utf-8"))
+    os.replace(temporary, _output)
+
+
+@profiled("load_segment_grids", file_size)
+def load_segment_grids(path: str | Path) -> Optional[SegmentGrids]:
+    """
+    `write_segment_grids` で保存したテーブルの行・セルを読み込む
+
+    Parameters
+    ----------
+    path : str | Path
+        保存したファイルのパス
+
+    Returns
+    -------
+    Optional[SegmentGrids]
+        テーブルの行・セル。ファイルが存在しない場合はNone
+    """
+
+    _path = path if isinstance(path, Path) else Path(path)
+    if not _path.is_file():
+        return None
+    with gzip.open(_path, "rt", encoding="utf-8") as r:
+        return SegmentGrids.from_dict(json.load(r))
+
+
+def segment_grids_to_dataframe(
+    path: str | Path,
+) -> tuple[Optional["pd.DataFrame"], ReadLog]:
+    """
+    保存したテーブルの行・セルから、HTMLを読み込まずにセグメント情報を読み取る。
+    結果は `financial_result_to_dataframe` で取り出し元のファイルを読み取った場合と同じ
+
+    Parameters
+    ----------
+    path : str | Path
+        `write_segment_grids` で保存したファイルのパス
+
+    Returns
+    -------
+    tuple[Optional[pd.DataFrame], ReadLog]
+        読み取ったデータと読み取りのログ。`source` に取り出し元のファイルのパスを記録する
+    """
+
+    grids = load_segment_grids(path)
+    if grids is None:
+        result = ReadResult(read_html_failed=True)
+        return None, ReadLog(result, [ReadException(-1, "read_html_failed", None)])
+
+    df, log = grids_to_dataframe(grids.grids)
+    log.encoding = grids.encoding
+    log.source = grids.source
+    for ex in log.logs:
+        # 失敗したテーブルは、取り出し元のファイルから読み込み直せる
+        ex.source = log.source
+    return df, log
@@ -0,0 +1,290 @@
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from scripts.financial_result_archive import ArchiveMember, open_archive
+from scripts.financial_result_cache import content_hash
+from scripts.financial_result_to_dataframe import READ_FLAGS, ReadResult
+
+# 読み取り中に想定外のエラーが発生したファイルの失敗理由
+ERROR_REASON = "error"
+# 再試行の対象として指定できる失敗理由
+RETRY_REASONS = [name for name in READ_FLAGS if name != "completed"] + [ERROR_REASON]
+
+
+def file_signature(path: Path | ArchiveMember) -> Optional[str]:
+    """
+    内容を読み込まずに取得できる、ファイルが変更されたかの目安を取得する。
+    ファイルはサイズと更新日時、zipアーカイブ内のファイルはサイズとCRC-32を使用する
+
+    Parameters
+    ----------
+    path : Path | ArchiveMember
+        決算短信のHTMLファイルのパス、またはzipアーカイブ内のファイル
+
+    Returns
+    -------
+    Optional[str]
+        ファイルの情報を連結した文字列。ファイルが存在しない場合や、
+        メモリ上のバイト列の場合はNone
+    """
+
+    if isinstance(path, ArchiveMember):
+        if path.archive is None or not path.exists():
+            return None
+        info = open_archive(path.archive).getinfo(path.member)
+        return f"zip:{info.file_size}:{info.CRC:08x}"
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return f"file:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _changed(entry: "JournalEntry", path: Path | ArchiveMember) -> bool:
+    # サイズと更新日時が記録時と同じ場合は、内容をハッシュしない
+    if entry.signature is not None and entry.signature == file_signature(path):
+        return False
+    return entry.content_hash != content_hash(path)
+
+
+@dataclass
+class JournalEntry:
+    """
+    バッチ処理で読み取り終えた1ファイルの記録
+    """
+
+    path: str
+    content_hash: Optional[str]
+    flags: int
+    output: Optional[str] = None
+    rows: int = 0
+    error: Optional[str] = None
+    seconds: float = 0.0
+    recorded: float = 0.0
+    # 記録時のファイルのサイズと更新日時など (`file_signature`)。再開時のハッシュの計算を省く
+    signature: Optional[str] = None
+
+    @property
+    def read_result(self) -> ReadResult:
+        return ReadResult.from_flags(self.flags)
+
+    def reasons(self) -> list[str]:
+        """
+        失敗理由を取得する
+
+        Returns
+        -------
+        list[str]
+            ReadResultのうち、`completed` 以外で該当する項目の名前。
+            想定外のエラーが発生した場合は `error`
+        """
+
+        if self.error is not None:
+            return [ERROR_REASON]
+        return [
+            name
+            for name, flag in READ_FLAGS.items()
+            if name != "completed" and self.flags & flag
+        ]
+
+
+class BatchJournal:
+    """
+    バッチ処理で読み取り終えたファイルを、追記のみのSQLiteのジャーナルに記録する。
+    同じファイルを複数回記録した場合は、最後の記録をそのファイルの結果とする
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = path if isinstance(path, Path) else Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 処理中に異常終了しても記録済みの内容が失われないよう、WALモードで1件ずつ確定する
+        self.connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL,
+                content_hash TEXT,
+                flags INTEGER NOT NULL,
+                output TEXT,
+                rows INTEGER NOT NULL,
+                error TEXT,
+                seconds REAL NOT NULL,
+                recorded REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS journal_path ON journal (path, seq)"
+        )
+        # ファイルの情報を記録する前に作成したジャーナルには、列を追加する
+        columns = [
+            row[1] for row in self.connection.execute("PRAGMA table_info(journal)")
+        ]
+        if "signature" not in columns:
+            self.connection.execute("ALTER TABLE journal ADD COLUMN signature TEXT")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "BatchJournal":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def record(self, entry: JournalEntry) -> None:
+        """
+        読み取り終えたファイルを記録する
+
+        Parameters
+        ----------
+        entry : JournalEntry
+            記録するファイルの結果。`recorded` が0の場合は現在時刻を記録する
+        """
+
+        if not entry.recorded:
+            entry.recorded = time.time()
+        self.connection.execute(
+            "INSERT INTO journal (path, content_hash, flags, output, rows, error, "
+            "seconds, recorded, signature) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry.path,
+                entry.content_hash,
+                entry.flags,
+                entry.output,
+                entry.rows,
+                entry.error,
+                entry.seconds,
+                entry.recorded,
+                entry.signature,
+            ),
+        )
+
+    def latest(self) -> dict[str, JournalEntry]:
+        """
+        ファイルごとに最後の記録を取得する
+
+        Returns
+        -------
+        dict[str, JournalEntry]
+            ファイルのパスと、最後の記録
+        """
+
+        rows = self.connection.execute(
+            "SELECT path, content_hash, flags, output, rows, error, seconds, recorded, "
+            "signature FROM journal WHERE seq IN (SELECT MAX(seq) FROM journal GROUP BY path) "
+            "ORDER BY path"
+        )
+        return {row[0]: JournalEntry(*row) for row in rows}
+
+    def pending(
+        self, paths: Iterable[str | Path | ArchiveMember], retry: Iterable[str] = ()
+    ) -> list[Path | ArchiveMember]:
+        """
+        まだ読み取っていないファイルを取得する
+
+        Parameters
+        ----------
+        paths : Iterable[str | Path | ArchiveMember]
+            決算短信のHTMLファイルのパス、またはzipアーカイブ内のファイル
+        retry : Iterable[str]
+            再試行する失敗理由 (`RETRY_REASONS`)。最後の記録がいずれかの理由で
+            失敗しているファイルは、読み取り済みでも対象とする
+
+        Returns
+        -------
+        list[Path | ArchiveMember]
+            未記録のファイル、記録後に内容が変わったファイル、書き出した結果がないファイル、
+            再試行するファイルのパス。サイズと更新日時(アーカイブ内のファイルはCRC-32)が
+            記録時と同じファイルは、内容をハッシュせずに変わっていないものとする
+        """
+
+        _retry = set(retry)
+        unknown = _retry - set(RETRY_REASONS)
+        if unknown:
+            raise ValueError(f"Unsupported retry reasons: {sorted(unknown)}")
+
+        latest = self.latest()
+        pending = []
+        for path in paths:
+            _path = path if isinstance(path, (Path, ArchiveMember)) else Path(path)
+            entry = latest.get(str(_path))
+            if (
+                entry is None
+                or _retry.intersection(entry.reasons())
+                or (entry.output is not None and not Path(entry.output).exists())
+                or _changed(entry, _path)
+            ):
+                pending.append(_path)
+        return pending
+
+    def counts(self) -> dict[str, int]:
+        """
+        ファイルごとの最後の記録を、読み取り結果ごとに集計する
+
+        Returns
+        -------
+        dict[str, int]
+            `completed` と失敗理由ごとのファイル数
+        """
+
+        counts = {name: 0 for name in ["completed"] + RETRY_REASONS}
+        for entry in self.latest().values():
+            if entry.error is None and entry.read_result.completed:
+                counts["completed"] += 1
+            for reason in entry.reasons():
+                counts[reason] += 1
+        return counts
+
+    def __len__(self) -> int:
+        (count,) = self.connection.execute(
+            "SELECT COUNT(DISTINCT path) FROM journal"
+        ).fetchone()
+        return count
+
+
+@dataclass
+class Progress:
+    """
+    バッチ処理の進捗とスループット
+    """
+
+    total: int
+    done: int = 0
+    failed: int = 0
+    skipped: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    def update(self, entry: JournalEntry) -> None:
+        self.done += 1
+        if entry.reasons():
+            self.failed += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def files_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def remaining_seconds(self) -> Optional[float]:
+        rate = self.files_per_second
+        return (self.total - self.done) / rate if rate > 0 else None
+
+    def format(self) -> str:
+        percent = self.done / self.total * 100 if self.total else 100.0
+        remaining = self.remaining_seconds
+        eta = "-" if remaining is None else f"{remaining:.0f}s"
+        return (
+            f"{self.done}/{self.total} files ({percent:.1f}%), "
+            f"{self.files_per_second:.1f} files/s, ETA {eta}, "
+            f"{self.failed} failed, {self.skipped} skipped"
+        )
@@ -0,0 +1,164 @@
+import asyncio
+import io
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Iterable, Optional
+
+from scripts.financial_result_archive import ArchiveMember, as_financial_result_path
+from scripts.financial_result_to_dataframe import (
+    ReadLog,
+    financial_result_to_dataframe,
+    read_html_failed_log,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_READ_CONCURRENCY = 4
+
+# 読み取り結果を書き出す関数。スレッドで呼び出すため、ブロックする処理を行ってよい
+ResultSink = Callable[[Path | ArchiveMember, Optional["pd.DataFrame"], ReadLog], None]
+
+_ReadItem = tuple[Path | ArchiveMember, Optional[bytes]]
+_ExtractItem = tuple[Path | ArchiveMember, Optional["pd.DataFrame"], ReadLog]
+
+
+def _extract(
+    content: bytes, parser: Optional[str], partial: bool
+) -> tuple[Optional["pd.DataFrame"], ReadLog]:
+    return financial_result_to_dataframe(io.BytesIO(content), parser, partial)
+
+
+async def iter_financial_results_async(
+    paths: Iterable[str | Path | ArchiveMember | tuple[str, bytes]],
+    sink: Optional[ResultSink] = None,
+    max_workers: Optional[int] = None,
+    parser: Optional[str] = None,
+    partial: bool = False,
+    read_concurrency: int = DEFAULT_READ_CONCURRENCY,
+    queue_size: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> AsyncIterator[ReadLog]:
+    """
+    決算短信HTMLの読み込み・読み取り・書き出しを並行に行い、読み取り終えた順にログを返す。
+    各段階は上限のあるキューでつながり、後段が詰まると前段の処理を待たせる
+
+    Parameters
+    ----------
+    paths : Iterable[str | Path | ArchiveMember | tuple[str, bytes]]
+        決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+        または `(ファイル名, バイト列)` の組
+    sink : Optional[ResultSink]
+        読み取り結果を書き出す関数。スレッドで、1ファイルずつ順に呼び出す
+    max_workers : Optional[int]
+        読み取りを並行に行う数。Noneの場合はCPU数
+    parser : Optional[str]
+        HTMLのパーサー
+    partial : bool
+        Trueの場合、セグメント報告のテーブル周辺のみを読み込む
+    read_concurrency : int
+        ファイルの読み込みを並行に行う数
+    queue_size : Optional[int]
+        各段階の間のキューに溜める最大のファイル数。Noneの場合は `max_workers` の2倍
+    executor : Optional[Executor]
+        読み取りを行うエグゼキューター。Noneの場合はプロセスプールを作成する
+
+    Returns
+    -------
+    AsyncIterator[ReadLog]
+        ファイルごとの読み取りのログ。`source` に読み込んだファイルのパスを記録する
+    """
+
+    workers = max_workers or os.cpu_count() or 1
+    size = queue_size or workers * 2
+    read_queue: asyncio.Queue[Optional[_ReadItem]] = asyncio.Queue(size)
+    write_queue: asyncio.Queue[Optional[_ExtractItem]] = asyncio.Queue(size)
+    log_queue: asyncio.Queue[Optional[ReadLog]] = asyncio.Queue(size)
+    _paths = iter(paths)
+
+    _executor = executor or ProcessPoolExecutor(max_workers=workers)
+    loop = asyncio.get_running_loop()
+
+    async def read() -> None:
+        # 複数のコルーチンで同じイテレーターから順にパスを取り出す
+        for path in _paths:
+            _path = as_financial_result_path(path)
+            content: Optional[bytes]
+            try:
+                # アーカイブ内のファイルは、読み込みのスレッドで展開する
+                content = await asyncio.to_thread(_path.read_bytes)
+            except (OSError, KeyError):
+                content = None
+            await read_queue.put((_path, content))
+
+    async def extract() -> None:
+        while (item := await read_queue.get()) is not None:
+            path, content = item
+            if content is None:
+                df = None
+                log = read_html_failed_log()
+            else:
+                try:
+                    df, log = await loop.run_in_executor(
+                        _executor, _extract, content, parser, partial
+                    )
+                except Exception as ex:
+                    # バッチ処理と同様に、想定外のエラーは失敗として記録して次のファイルへ進む
+                    logger.warning("%s: %s", path, ex)
+                    df = None
+                    log = read_html_failed_log(f"{type(ex).__name__}: {ex}")
+            log.source = str(path)
+            # スレッドのエグゼキューターを使用した場合も、構文木を保持しないようにする
+            log.compact()
+            await write_queue.put((path, df, log))
+
+    async def write() -> None:
+        while (item := await write_queue.get()) is not None:
+            path, df, log = item
+            if sink is not None:
+                await asyncio.to_thread(sink, path, df, log)
+            await log_queue.put(log)
+        await log_queue.put(None)
+
+    async def run_readers() -> None:
+        await asyncio.gather(*(read() for _ in range(read_concurrency)))
+        for _ in range(workers):
+            await read_queue.put(None)
+
+    async def run_extractors() -> None:
+        await asyncio.gather(*(extract() for _ in range(workers)))
+        await write_queue.put(None)
+
+    tasks: set[asyncio.Task[Any]] = {
+        asyncio.create_task(run_readers()),
+        asyncio.create_task(run_extractors()),
+        asyncio.create_task(write()),
+    }
+    get: Optional[asyncio.Task[Optional[ReadLog]]] = None
+    try:
+        while True:
+            if get is None:
+                get = asyncio.create_task(log_queue.get())
+            done, _ = await asyncio.wait(
+                tasks | {get}, return_when=asyncio.FIRST_COMPLETED
+            )
+            # いずれかの段階でエラーが発生した場合は、残りの処理を中止して送出する
+            for task in done & tasks:
+                task.result()
+                tasks.discard(task)
+            if get in done:
+                log = get.result()
+                get = None
+                if log is None:
+                    break
+                yield log
+    finally:
+        for task in tasks | ({get} if get is not None else set()):
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if executor is None:
+            _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,204 @@
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Iterator, Optional, TypeVar, cast
+
+from scripts.financial_result_archive import ArchiveMember
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# 計測中のプロファイル。Noneの場合は計測を行わない
+_active_profile: ContextVar[Optional["Profile"]] = ContextVar(
+    "financial_result_profile", default=None
+)
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0
+    bytes: int = 0
+
+
+@dataclass
+class Profile:
+    """
+    読み取り処理の段階ごとの処理時間・呼び出し回数・処理したバイト数。
+    各段階の時間は、その段階から呼び出した段階の時間を含む
+    """
+
+    stages: dict[str, StageStats] = field(default_factory=dict)
+
+    def add(self, stage: str, seconds: float, nbytes: int = 0, calls: int = 1) -> None:
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats()
+        stats.calls += calls
+        stats.seconds += seconds
+        stats.bytes += nbytes
+
+    def merge(self, other: "Profile") -> None:
+        """
+        他のプロファイルの計測結果を加算する
+
+        Parameters
+        ----------
+        other : Profile
+            加算するプロファイル
+        """
+
+        for stage, stats in other.stages.items():
+            self.add(stage, stats.seconds, stats.bytes, stats.calls)
+
+    @contextmanager
+    def stage(self, stage: str, nbytes: int = 0) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, nbytes)
+
+    def to_dict(self) -> dict[str, dict[str, Any]]:
+        return {stage: asdict(stats) for stage, stats in self.stages.items()}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, dict[str, Any]]) -> "Profile":
+        return cls({stage: StageStats(**stats) for stage, stats in data.items()})
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def report(self) -> str:
+        """
+        段階ごとの計測結果を、合計時間の長い順に並べた表にする
+
+        Returns
+        -------
+        str
+            計測結果の表
+        """
+
+        lines = [
+            f"{'stage':<32}{'calls':>8}{'total[s]':>12}{'mean[ms]':>12}{'MB/s':>10}"
+        ]
+        stages = sorted(self.stages.items(), key=lambda s: s[1].seconds, reverse=True)
+        for stage, stats in stages:
+            mean = stats.seconds / stats.calls * 1000 if stats.calls else 0.0
+            throughput = ""
+            if stats.bytes and stats.seconds:
+                throughput = f"{stats.bytes / stats.seconds / (1 << 20):.1f}"
+            lines.append(
+                f"{stage:<32}{stats.calls:>8}{stats.seconds:>12.3f}{mean:>12.3f}"
+                f"{throughput:>10}"
+            )
+        return "\n".join(lines)
+
+
+def file_size(path: Any, *args: Any, **kwargs: Any) -> int:
+    """
+    ファイルのバイト数を取得する。`profiled` の `nbytes` に指定できるよう、
+    第1引数以外の引数は無視する
+
+    Parameters
+    ----------
+    path : Any
+        ファイルのパス
+
+    Returns
+    -------
+    int
+        ファイルのバイト数。ファイルが存在しない場合や、パスでない場合は0
+    """
+
+    if isinstance(path, ArchiveMember):
+        return path.size if path.exists() else 0
+    if not isinstance(path, (str, os.PathLike)):
+        return 0
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def active_profile() -> Optional[Profile]:
+    """
+    計測中のプロファイルを取得する
+
+    Returns
+    -------
+    Optional[Profile]
+        計測中のプロファイル。計測していない場合はNone
+    """
+
+    return _active_profile.get()
+
+
+@contextmanager
+def profiling(profile: Optional[Profile] = None) -> Iterator[Profile]:
+    """
+    ブロック内で呼び出した読み取り処理の計測を行う。
+    計測中に入れ子で使用した場合、終了時に内側の結果を外側のプロファイルにも加算する
+
+    Parameters
+    ----------
+    profile : Optional[Profile]
+        計測結果を記録するプロファイル。Noneの場合は新たに作成する
+
+    Returns
+    -------
+    Iterator[Profile]
+        計測結果を記録するプロファイル
+    """
+
+    parent = _active_profile.get()
+    current = profile if profile is not None else Profile()
+    token = _active_profile.set(current)
+    try:
+        yield current
+    finally:
+        _active_profile.reset(token)
+        if parent is not None:
+            parent.merge(current)
+
+
+def profiled(
+    stage: str, nbytes: Optional[Callable[..., int]] = None
+) -> Callable[[F], F]:
+    """
+    関数の処理時間と呼び出し回数を、計測中のプロファイルに記録するデコレーター。
+    計測していない場合は、関数をそのまま呼び出す
+
+    Parameters
+    ----------
+    stage : str
+        記録する段階の名前
+    nbytes : Optional[Callable[..., int]]
+        関数の引数から、処理するバイト数を求める関数
+
+    Returns
+    -------
+    Callable[[F], F]
+        デコレーター
+    """
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            profile = _active_profile.get()
+            if profile is None:
+                return func(*args, **kwargs)
+
+            size = nbytes(*args, **kwargs) if nbytes is not None else 0
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.add(stage, time.perf_counter() - start, size)
+
+        return cast(F, wrapper)
+
+    return decorator
@@ -1,33 +1,69 @@
-import dataclasses
+import bisect
+import codecs
+import contextlib
+import functools
+import io
+import os
 import re
+import time
 import unicodedata
-from dataclasses import dataclass
+import warnings
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    ContextManager,
+    Iterable,
+    Iterator,
+    Optional,
+)
 
-import pandas as pd
-from bs4 import BeautifulSoup
-from bs4.element import Tag
+from scripts.financial_result_archive import ArchiveMember
+from scripts.financial_result_profile import active_profile, file_size, profiled
 
+# pandasとBeautiful Soupは読み込みに時間がかかるため、使用する関数の中で読み込む。
+# データクラスや文字列の判定のみを使用する場合、ワーカーやCLIの起動時間を短くできる
+if TYPE_CHECKING:
+    import pandas as pd
+    from bs4 import BeautifulSoup
+    from bs4.element import Tag
 
-@dataclass
-class Period:
+
+class Record:
+    """
+    読み取り結果のレコードの基底クラス。
+    `dataclasses.asdict` のような再帰的な複製を行わずに、タプル・辞書へ変換する
+    """
+
+    __slots__: tuple[str, ...] = ()
+
+    def astuple(self) -> tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def asdict(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+@dataclass(frozen=True, slots=True)
+class Period(Record):
     kind: str = ""
     description: str = ""
     begin: Optional[datetime] = None
     end: Optional[datetime] = None
 
 
-@dataclass
-class Segment:
+@dataclass(frozen=True, slots=True)
+class Segment(Record):
     order: int = 0
     position: int = 0
     name: str = ""
 
 
-@dataclass
-class Account:
+@dataclass(frozen=True, slots=True)
+class Account(Record):
     order: int = 0
     position: int = 0
     kind: str = ""
@@ -35,37 +71,654 @@ class Account:
     unit: int = 1
 
 
-def read_financial_result_html(path: str | Path) -> Optional[BeautifulSoup]:
+# Beautiful Soupで使用できるパーサー。いずれのパーサーでも読み取り結果は同一となる
+HTML_PARSERS = ("html.parser", "lxml", "html5lib")
+HTML_PARSER_ENV = "FRR_HTML_PARSER"
+
+
+def default_html_parser() -> str:
     """
-    決算短信のHTMLをBeautiful Soupに読み込む。
+    既定のパーサーを取得する。環境変数 `FRR_HTML_PARSER` が設定されていればその値を使用する
+
+    Returns
+    -------
+    str
+        パーサーの名前
+    """
+
+    return os.environ.get(HTML_PARSER_ENV, "html.parser")
+
+
+READ_CHUNK_SIZE = 1 << 16
+# 文字コードの宣言を探す、ファイルの先頭のバイト数
+ENCODING_SNIFF_SIZE = 1 << 12
+DEFAULT_ENCODING = "utf-8"
+BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# <meta charset="..."> / <meta content="text/html; charset=...">
+META_CHARSET = re.compile(
+    rb"""<meta[^>]*?charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE
+)
+# <?xml version="1.0" encoding="..."?>
+XML_ENCODING = re.compile(rb"""<\?xml[^>]*?encoding\s*=\s*["']([\w.:-]+)""")
+# Pythonが認識しない、宣言に使われる文字コードの名前
+ENCODING_LABELS = {
+    "windows-31j": "cp932",
+    "x-sjis": "cp932",
+    "x-euc-jp": "euc_jp",
+}
+# 宣言された文字コードを、実際の文書で使われる拡張文字(①、㈱など)を含む文字コードに読み替える
+ENCODING_SUPERSETS = {
+    "shift_jis": "cp932",
+    "euc_jp": "euc_jis_2004",
+}
+
+SEGMENT_TEXT = "報告セグメント"
+# テーブルの前にある期間の記載を探す、<p>要素の数
+PERIOD_FIND_LIMIT = 3
+
+NORMALIZER = re.compile(r"\s|\r|\n")
+TABLE_TAG = re.compile(r"<(/?)table\b", re.IGNORECASE)
+P_TAG = re.compile(r"<p[\s>/]", re.IGNORECASE)
+
+
+def iter_normalized_text(
+    stream: BinaryIO,
+    encoding: str = DEFAULT_ENCODING,
+    chunk_size: int = READ_CHUNK_SIZE,
+    head: bytes = b"",
+) -> Iterator[str]:
+    """
+    バイト列を少しずつ読み込み、デコードとUnicode正規化を行ったテキストを順に返す
 
     Parameters
     ----------
-    path : str | Path
-        決算短信のHTMLファイルのパス
+    stream : BinaryIO
+        HTMLのバイト列を読み込むストリーム
+    encoding : str
+        文字コード
+    chunk_size : int
+        一度に読み込むバイト数
+    head : bytes
+        ストリームから読み込み済みの先頭のバイト列。ストリームの続きより前に処理する
 
     Returns
     -------
-    Optional[BeautifulSoup]
-        Beautiful Soupのオブジェクト
+    Iterator[str]
+        正規化したテキスト。連結するとファイル全体のテキストになる
+    """
+
+    # テキストモードでファイルを開いた場合と同様に、改行コードを\nに統一する
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder(encoding)(), translate=True
+    )
+    # 読み込みと正規化の時間は、テキストを受け取る側の処理時間を除いて計測する
+    profile = active_profile()
+    seconds = 0.0
+    nbytes = 0
+    # 最後の行の区切り以降のテキスト。改行のないファイルで連結を繰り返さないよう、リストで保持する
+    rest = []  # type: list[str]
+    while True:
+        if profile is not None:
+            start = time.perf_counter()
+        data = head or stream.read(chunk_size)
+        head = b""
+        final = not data
+        decoded = decoder.decode(data, final)
+        # 正規化の結果が行をまたいで変わらないよう、行の区切りまでを正規化する
+        split = len(decoded) if final else decoded.rfind("\n") + 1
+        if split > 0 or final:
+            text = "".join(rest) + decoded[:split]
+            rest = [decoded[split:]]
+        else:
+            text = ""
+            rest.append(decoded)
+        if text and not (text.isascii() or unicodedata.is_normalized("NFKC", text)):
+            text = unicodedata.normalize("NFKC", text)
+        if profile is not None:
+            seconds += time.perf_counter() - start
+            nbytes += len(data)
+        if text:
+            yield text
+        if final:
+            break
+
+    if profile is not None:
+        profile.add("iter_normalized_text", seconds, nbytes)
+
+
+def _lookup_encoding(name: str) -> Optional[str]:
+    _name = name.lower()
+    try:
+        encoding = codecs.lookup(ENCODING_LABELS.get(_name, _name)).name
+    except LookupError:
+        return None
+    if encoding.startswith("utf-16"):
+        # 宣言を読み取れた時点でASCII互換のため、UTF-16の宣言は誤りとして扱う
+        return DEFAULT_ENCODING
+    return ENCODING_SUPERSETS.get(encoding, encoding)
+
+
+def _declared_encoding(head: bytes) -> Optional[str]:
+    for bom, encoding in BYTE_ORDER_MARKS:
+        if head.startswith(bom):
+            return encoding
+
+    # HTMLとして読み込むため、XML宣言よりも<meta>要素を優先する
+    for pattern in (META_CHARSET, XML_ENCODING):
+        m = pattern.search(head)
+        if m is not None:
+            declared = _lookup_encoding(m.group(1).decode("ascii"))
+            if declared is not None:
+                return declared
+    return None
+
+
+def _guess_encoding(data: bytes) -> str:
+    # 最初のASCII以外の文字から、UTF-8として不正なバイト列を含むかを確認する
+    start = next((i for i, b in enumerate(data) if b >= 0x80), len(data))
+    try:
+        # 末尾で途切れた文字は不正とみなさない
+        codecs.getincrementaldecoder(DEFAULT_ENCODING)().decode(
+            data[start : start + ENCODING_SNIFF_SIZE], final=False
+        )
+    except UnicodeDecodeError:
+        return "cp932"
+    return DEFAULT_ENCODING
+
+
+def detect_encoding(head: bytes) -> str:
+    """
+    HTMLの先頭のバイト列から、文字コードを判定する。
+    BOM、<meta>要素・XML宣言の文字コードの順に参照し、いずれもない場合は、
+    UTF-8として不正なバイト列を含めばShift_JIS(cp932)、それ以外はUTF-8とする
+
+    Parameters
+    ----------
+    head : bytes
+        HTMLの先頭のバイト列 (`ENCODING_SNIFF_SIZE` バイト程度)
+
+    Returns
+    -------
+    str
+        Pythonの文字コードの名前
+    """
+
+    declared = _declared_encoding(head)
+    return declared if declared is not None else _guess_encoding(head)
+
+
+def decode_normalized_text(
+    stream: BinaryIO,
+    encoding: Optional[str] = None,
+    chunk_size: int = READ_CHUNK_SIZE,
+) -> tuple[str, Iterator[str]]:
     """
+    ストリームの先頭から文字コードを判定し、デコードとUnicode正規化を行ったテキストを返す。
+    判定に読み込んだ先頭のバイト列はそのままデコードに使用し、ストリームは1回だけ読み込む
+
+    Parameters
+    ----------
+    stream : BinaryIO
+        HTMLのバイト列を読み込むストリーム
+    encoding : Optional[str]
+        文字コード。Noneの場合は `detect_encoding` と同様に判定する
+    chunk_size : int
+        一度に読み込むバイト数
+
+    Returns
+    -------
+    tuple[str, Iterator[str]]
+        文字コードと、`iter_normalized_text` で正規化したテキスト
+    """
+
+    head = stream.read(ENCODING_SNIFF_SIZE)
+    _encoding = encoding if encoding is not None else _declared_encoding(head)
+    if _encoding is None:
+        # 宣言がない場合は、ASCII以外の文字が現れるまで読み進めてから判定する
+        chunks = [head]
+        while chunks[-1].isascii():
+            data = stream.read(chunk_size)
+            if not data:
+                break
+            chunks.append(data)
+        head = b"".join(chunks)
+        _encoding = _guess_encoding(head)
+    return _encoding, iter_normalized_text(stream, _encoding, chunk_size, head)
+
+
+def open_financial_result(
+    path: "str | Path | ArchiveMember | BinaryIO",
+) -> Optional[ContextManager[BinaryIO]]:
+    """
+    決算短信のHTMLをバイナリで開く
+
+    Parameters
+    ----------
+    path : str | Path | ArchiveMember | BinaryIO
+        決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+        またはHTMLのバイト列を読み込むストリーム
+
+    Returns
+    -------
+    Optional[ContextManager[BinaryIO]]
+        ストリームを返すコンテキストマネージャ。ファイルが存在しない場合はNone
+    """
+
+    if isinstance(path, ArchiveMember):
+        # アーカイブ内のファイルは展開せず、読み込みながら展開する
+        return path.open() if path.exists() else None
+    if not isinstance(path, (str, Path)):
+        # 読み込み済みのバイト列のストリームは、呼び出し元で閉じる
+        return contextlib.nullcontext(path)
 
     _path = path if isinstance(path, Path) else Path(path)
-    text = ""
     if not _path.exists():
+        # `<アーカイブのパス>/<メンバー名>` の形式のパスは、アーカイブ内のファイルとして開く
+        member = ArchiveMember.from_path(_path)
+        if member is None or not member.exists():
+            return None
+        return member.open()
+    return _path.open("rb")
+
+
+@profiled("load_financial_result_text", file_size)
+def read_financial_result_text(
+    path: "str | Path | ArchiveMember | BinaryIO", encoding: Optional[str] = None
+) -> Optional[tuple[str, str]]:
+    """
+    決算短信のHTMLを読み込み、Unicode正規化したテキストと文字コードを取得する
+
+    Parameters
+    ----------
+    path : str | Path | ArchiveMember | BinaryIO
+        決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+        またはHTMLのバイト列を読み込むストリーム
+    encoding : Optional[str]
+        文字コード。Noneの場合はHTMLの先頭から判定する
+
+    Returns
+    -------
+    Optional[tuple[str, str]]
+        HTMLのテキストと文字コード。ファイルが存在しない場合はNone
+    """
+
+    opened = open_financial_result(path)
+    if opened is None:
+        return None
+
+    with opened as r:
+        # 記載されたテキストの文字種を統一するため、Unicode正規化を行う
+        _encoding, chunks = decode_normalized_text(r, encoding)
+        text = "".join(chunks)
+
+    return text, _encoding
+
+
+def load_financial_result_text(
+    path: "str | Path | ArchiveMember | BinaryIO", encoding: Optional[str] = None
+) -> Optional[str]:
+    """
+    決算短信のHTMLを読み込み、Unicode正規化したテキストを取得する
+
+    Parameters
+    ----------
+    path : str | Path | ArchiveMember | BinaryIO
+        決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+        またはHTMLのバイト列を読み込むストリーム
+    encoding : Optional[str]
+        文字コード。Noneの場合はHTMLの先頭から判定する
+
+    Returns
+    -------
+    Optional[str]
+        HTMLのテキスト。ファイルが存在しない場合はNone
+    """
+
+    loaded = read_financial_result_text(path, encoding)
+    return loaded[0] if loaded is not None else None
+
+
+def find_segment_fragments(text: str) -> list[tuple[int, int]]:
+    """
+    HTMLのテキストから、「報告セグメント」を含むテーブルの範囲を検索する。
+    範囲には、期間の取得に必要なテーブル前方の<p>要素を含める
+
+    Parameters
+    ----------
+    text : str
+        HTMLのテキスト
+
+    Returns
+    -------
+    list[tuple[int, int]]
+        テキスト中の開始・終了位置のリスト。重なる範囲は結合される
+    """
+
+    if SEGMENT_TEXT not in text:
+        return []
+
+    # 入れ子のテーブルは外側のテーブルにまとめる
+    tables = []
+    depth = 0
+    begin = 0
+    for m in TABLE_TAG.finditer(text):
+        if not m.group(1):
+            if depth == 0:
+                begin = m.start()
+            depth += 1
+        elif depth > 0:
+            depth -= 1
+            if depth == 0:
+                end = text.find(">", m.end())
+                tables.append((begin, len(text) if end < 0 else end + 1))
+    if depth > 0:
+        tables.append((begin, len(text)))
+
+    paragraphs = [m.start() for m in P_TAG.finditer(text)]
+    fragments = []  # type: list[tuple[int, int]]
+    for begin, end in tables:
+        if text.find(SEGMENT_TEXT, begin, end) < 0:
+            continue
+
+        found = bisect.bisect_left(paragraphs, begin)
+        if found >= PERIOD_FIND_LIMIT:
+            begin = paragraphs[found - PERIOD_FIND_LIMIT]
+        else:
+            begin = 0
+
+        if fragments and begin <= fragments[-1][1]:
+            fragments[-1] = (fragments[-1][0], end)
+        else:
+            fragments.append((begin, end))
+
+    return fragments
+
+
+def extract_segment_fragments(text: str) -> str:
+    """
+    HTMLのテキストから、`find_segment_fragments` で検索した範囲のみを取り出す
+
+    Parameters
+    ----------
+    text : str
+        HTMLのテキスト
+
+    Returns
+    -------
+    str
+        取り出した範囲を連結したテキスト。該当するテーブルがない場合は空文字
+    """
+
+    return "".join(text[b:e] for b, e in find_segment_fragments(text))
+
+
+@profiled("parse_financial_result_html")
+def parse_financial_result_html(
+    text: str | Iterable[str], parser: Optional[str] = None, partial: bool = False
+) -> "BeautifulSoup":
+    """
+    決算短信のHTMLのテキストをBeautiful Soupに読み込む。
+
+    Parameters
+    ----------
+    text : str | Iterable[str]
+        HTMLのテキスト。分割されたテキストを渡した場合は、結合してから読み込む
+    parser : Optional[str]
+        使用するパーサー (`html.parser`, `lxml`, `html5lib`)。
+        Noneの場合は `default_html_parser` の値を使用する
+    partial : bool
+        Trueの場合、`find_segment_fragments` で検索した範囲のみを読み込む
+
+    Returns
+    -------
+    BeautifulSoup
+        Beautiful Soupのオブジェクト
+    """
+
+    _parser = parser if parser is not None else default_html_parser()
+    if _parser not in HTML_PARSERS:
+        raise ValueError(f"Unsupported parser: {_parser}")
+
+    from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+
+    if not isinstance(text, str):
+        # Beautiful Soupの公開されたAPIは、テキストを分割して渡すことに対応していない
+        text = "".join(text)
+
+    if partial:
+        text = extract_segment_fragments(text)
+
+    with warnings.catch_warnings():
+        # 決算短信はXHTMLで作成されているが、意図してHTMLのパーサーで読み込む
+        warnings.simplefilter("ignore", XMLParsedAsHTMLWarning)
+        html = BeautifulSoup(text, features=_parser)
+    return html
+
+
+@profiled("read_financial_result_html", file_size)
+def read_financial_result_html(
+    path: "str | Path | ArchiveMember | BinaryIO",
+    parser: Optional[str] = None,
+    partial: bool = False,
+    encoding: Optional[str] = None,
+) -> Optional["BeautifulSoup"]:
+    """
+    決算短信のHTMLをBeautiful Soupに読み込む。
+
+    Parameters
+    ----------
+    path : str | Path | ArchiveMember | BinaryIO
+        決算短信のHTMLファイルのパス、zipアーカイブ内のファイル、
+        またはHTMLのバイト列を読み込むストリーム
+    parser : Optional[str]
+        使用するパーサー (`html.parser`, `lxml`, `html5lib`)。
+        Noneの場合は `default_html_parser` の値を使用する
+    partial : bool
+        Trueの場合、「報告セグメント」を含むテーブルとその前方の<p>要素のみを読み込む
+    encoding : Optional[str]
+        文字コード。Noneの場合はHTMLの先頭から判定する
+
+    Returns
+    -------
+    Optional[BeautifulSoup]
+        Beautiful Soupのオブジェクト。`original_encoding` に読み込んだ文字コードを設定する
+    """
+
+    opened = open_financial_result(path)
+    if opened is None:
         return None
 
-    with _path.open(encoding="utf-8") as r:
-        lines = r.readlines()
+    with opened as r:
         # 記載されたテキストの文字種を統一するため、Unicode正規化を行う
-        lines = [unicodedata.normalize("NFKC", line) for line in lines]
-        text = "".join(lines)
+        _encoding, chunks = decode_normalized_text(r, encoding)
+        html = parse_financial_result_html(chunks, parser, partial)
 
-    html = BeautifulSoup(text, features="html.parser")
+    html.original_encoding = _encoding
     return html
 
 
-def find_segment_tables(html: BeautifulSoup) -> list[Tag]:
+@dataclass(slots=True)
+class GridCell:
+    text: str = ""
+    compact: str = ""
+    rowspan: Optional[int] = None
+    colspan: Optional[int] = None
+    row: int = -1
+    next_row: int = 0
+
+
+@dataclass
+class TableGrid:
+    """
+    セグメント報告のテーブルの行・セルを、テキストを取り出した状態で保持する。
+
+    `rows` はテーブル内の<tr>要素を文書の順に並べたもので、各行は `find_all("td")`
+    と同様に子孫のセルの位置(`cells` のインデックス)を持つ。
+    セルの `row` は直前の<tr>要素、`next_row` は直後の<tr>要素の位置を表す。
+    `paragraphs` は、期間の取得に使用するテーブル前方の<p>要素のテキスト。
+    `position` は、テーブルの開始タグの正規化したテキスト中の位置(行, 列)
+    """
+
+    cells: list[GridCell] = field(default_factory=list)
+    rows: list[list[int]] = field(default_factory=list)
+    row_first_cells: list[int] = field(default_factory=list)
+    paragraphs: list[str] = field(default_factory=list)
+    position: Optional[tuple[int, int]] = None
+
+    @classmethod
+    @profiled("build_table_grid")
+    def from_tag(cls, table: "Tag") -> "TableGrid":
+        """
+        テーブル要素から、行・セルを取り出す
+
+        Parameters
+        ----------
+        table: Tag
+            テーブル要素
+
+        Returns
+        -------
+        TableGrid
+            テーブルの行・セル
+        """
+
+        import bs4.element
+
+        grid = cls(paragraphs=find_period_paragraphs(table))
+        if table.sourceline is not None:
+            grid.position = (table.sourceline, table.sourcepos or 0)
+        open_rows = []  # type: list[int]
+
+        def visit(tag: "Tag") -> None:
+            for child in tag.children:
+                if not isinstance(child, bs4.element.Tag):
+                    continue
+                if child.name == "tr":
+                    open_rows.append(grid.open_row())
+                    visit(child)
+                    open_rows.pop()
+                elif child.name == "td":
+                    grid.add_cell(
+                        open_rows,
+                        child.get_text(),
+                        child.attrs.get("rowspan"),
+                        child.attrs.get("colspan"),
+                    )
+                    visit(child)
+                else:
+                    visit(child)
+
+        visit(table)
+        return grid
+
+    def open_row(self) -> int:
+        self.rows.append([])
+        self.row_first_cells.append(len(self.cells))
+        return len(self.rows) - 1
+
+    def add_cell(
+        self,
+        open_rows: list[int],
+        text: str,
+        rowspan: Optional[Any] = None,
+        colspan: Optional[Any] = None,
+    ) -> GridCell:
+        text = text.strip()
+        cell = GridCell(
+            text,
+            NORMALIZER.sub("", text),
+            None if rowspan is None else _span(rowspan),
+            None if colspan is None else _span(colspan),
+            len(self.rows) - 1,
+            len(self.rows),
+        )
+        for row in open_rows:
+            self.rows[row].append(len(self.cells))
+        self.cells.append(cell)
+        return cell
+
+    def row_cells(self, row: int) -> list[GridCell]:
+        """行に含まれるセルを取得する (`tr.find_all("td")` に相当)"""
+
+        if row < 0 or row >= len(self.rows):
+            return []
+        return [self.cells[i] for i in self.rows[row]]
+
+    def first_cell(self, row: int) -> Optional[GridCell]:
+        """行の開始以降で最初のセルを取得する (`tr.find_next("td")` に相当)"""
+
+        index = self.row_first_cells[row]
+        return self.cells[index] if index < len(self.cells) else None
+
+    def merged_cells(self) -> list[GridCell]:
+        """colspanを指定したセルを取得する (`find_all("td", colspan=True)` に相当)"""
+
+        return [cell for cell in self.cells if cell.colspan is not None]
+
+    @functools.cached_property
+    def logical_rows(self) -> list[list[Optional[int]]]:
+        """rowspan・colspanを展開した、表示上の行・列ごとのセルの位置"""
+
+        grid = []  # type: list[list[Optional[int]]]
+        for r in range(len(self.rows)):
+            while len(grid) <= r:
+                grid.append([])
+            column = 0
+            for i in self.rows[r]:
+                cell = self.cells[i]
+                if cell.row != r:
+                    continue
+                while column < len(grid[r]) and grid[r][column] is not None:
+                    column += 1
+                for dr in range(max(cell.rowspan or 1, 1)):
+                    while len(grid) <= r + dr:
+                        grid.append([])
+                    line = grid[r + dr]
+                    for dc in range(max(cell.colspan or 1, 1)):
+                        while len(line) <= column + dc:
+                            line.append(None)
+                        line[column + dc] = i
+                column += max(cell.colspan or 1, 1)
+        return grid[: len(self.rows)]
+
+    def cell_at(self, row: int, column: int) -> Optional[GridCell]:
+        """
+        rowspan・colspanを展開した、表示上の行・列にあるセルを取得する
+
+        Parameters
+        ----------
+        row: int
+            行の位置
+        column: int
+            列の位置
+
+        Returns
+        -------
+        Optional[GridCell]
+            セル。存在しない場合はNone
+        """
+
+        if row < 0 or row >= len(self.logical_rows):
+            return None
+        line = self.logical_rows[row]
+        if column < 0 or column >= len(line):
+            return None
+        index = line[column]
+        return self.cells[index] if index is not None else None
+
+
+def _span(value: Any) -> int:
+    # rowspan・colspanの値に数値以外が含まれる場合は、先頭の数字のみを使用する
+    digits = re.match(r"\s*(\d+)", str(value))
+    return int(digits.group(1)) if digits else 1
+
+
+@profiled("find_segment_tables")
+def find_segment_tables(html: "BeautifulSoup") -> list["Tag"]:
     """
     「報告セグメント」のテキストを含むテーブルを検索する
 
@@ -80,11 +733,17 @@ def find_segment_tables(html: BeautifulSoup) -> list[Tag]:
         「報告セグメント」のテキストを含むテーブルのリスト
     """
 
-    tables = html.find_all("table")
+    # テーブルごとに子孫を検索せず、テキストを一度だけ検索してテーブルをさかのぼる。
+    # 文書の順に検索するため、各テーブルで最初に見つかったテキストで判定する
     segment_tables = []
-    for t in tables:
-        text = t.find(text="報告セグメント")
-        if text is not None:
+    checked = set()  # type: set[int]
+    for text in html.find_all(string=SEGMENT_TEXT):
+        tables = [t for t in text.parents if t.name == "table"]
+        # 外側のテーブルから順に追加し、文書の順序を保つ
+        for t in reversed(tables):
+            if id(t) in checked:
+                continue
+            checked.add(id(t))
             td = text.find_previous("td")
             if td is not None and "colspan" in td.attrs:
                 segment_tables.append(t)
@@ -92,9 +751,9 @@ def find_segment_tables(html: BeautifulSoup) -> list[Tag]:
     return segment_tables
 
 
-def read_table_period(table: Tag) -> Period:
+def find_period_paragraphs(table: "Tag") -> list[str]:
     """
-    セグメント報告のテーブル上部にあるテキストから、報告年月日を取得する
+    セグメント報告のテーブルの前にある、期間が記載されうる<p>要素のテキストを取得する
 
     Parameters
     ----------
@@ -103,167 +762,337 @@ def read_table_period(table: Tag) -> Period:
 
     Returns
     -------
-    Period
-        報告年月日
+    list[str]
+        テーブルに近い順に並べた<p>要素のテキスト
     """
 
-    FIND_LIMIT = 3
-    PATTERN = re.compile(r".*(前|当).+(\d{4}年\d+月\d+日).+(\d{4}年\d+月\d+日)")
-    DATE_PATTERN = re.compile(r"\d{4}年\d+月\d+日")
-    period = Period()
-
-    count = 0
-    tag = table
-    while count < FIND_LIMIT:
-        p = tag.find_previous("p")
-        if p is not None:
-            text = p.get_text().strip()
-            if re.search(PATTERN, text):
-                period.description = text
-                if "前" in text:
-                    period.kind = "previous"
-                elif "当" in text:
-                    period.kind = "current"
-
-                dates = DATE_PATTERN.findall(period.description)
-                if len(dates) == 2:
-                    from_date = dates[0].strip()
-                    period.begin = datetime.strptime(from_date, "%Y年%m月%d日")
-                    to_date = dates[1].strip()
-                    period.end = datetime.strptime(to_date, "%Y年%m月%d日")
-                break
-        count += 1
-        tag = p
+    paragraphs = table.find_all_previous("p", limit=PERIOD_FIND_LIMIT)
+    return [p.get_text().strip() for p in paragraphs]
+
+
+class TableIndex:
+    """
+    1つの構文木に含まれるテーブルの索引。
+    テーブルの検索結果と取り出した行・セルを保持し、同じ構文木から複数の情報を読み取る場合に共有する
+    """
+
+    def __init__(self, html: "BeautifulSoup") -> None:
+        self.html = html
+        self._texts = {}  # type: dict[int, str]
+        self._grids = {}  # type: dict[int, TableGrid]
+
+    @functools.cached_property
+    def tables(self) -> list["Tag"]:
+        """文書の順に並べたすべてのテーブル要素"""
+
+        return self.html.find_all("table")
 
-    return period
+    @functools.cached_property
+    def segment_tables(self) -> list["Tag"]:
+        """セグメント報告のテーブル要素 (`find_segment_tables` の結果)"""
 
+        return find_segment_tables(self.html)
 
-def read_table_segments(table: Tag) -> list[Segment]:
+    def find_tables(self, *texts: str) -> list["Tag"]:
+        """
+        いずれかのテキストを含むテーブルを検索する
+
+        Parameters
+        ----------
+        texts: str
+            検索するテキスト。空白・改行を除いたテーブルのテキストと比較する
+
+        Returns
+        -------
+        list[Tag]
+            文書の順に並べたテーブル要素
+        """
+
+        tables = []
+        for table in self.tables:
+            key = id(table)
+            if key not in self._texts:
+                self._texts[key] = NORMALIZER.sub("", table.get_text())
+            if any(text in self._texts[key] for text in texts):
+                tables.append(table)
+        return tables
+
+    def grid(self, table: "Tag") -> TableGrid:
+        """
+        テーブルの行・セルを取得する。一度取り出したテーブルは再利用する
+
+        Parameters
+        ----------
+        table: Tag
+            この構文木のテーブル要素
+
+        Returns
+        -------
+        TableGrid
+            テーブルの行・セル
+        """
+
+        key = id(table)
+        if key not in self._grids:
+            self._grids[key] = TableGrid.from_tag(table)
+        return self._grids[key]
+
+
+@dataclass(frozen=True)
+class ExtractorConfig:
+    """
+    セグメント報告のテーブルを読み取る際の記載の表現。
+    決算短信ごとの記載の揺れには、設定を追加して対応する
     """
-    セグメント報告のテーブルから、セグメントの位置を取得する
 
-    Parameters
-    ----------
-    table: Tag
-        セグメント報告のテーブル要素
+    # 期間の記載。前期・当期の区別と、開始日・終了日を含む
+    period_pattern: str = r".*(前|当).+(\d{4}年\d+月\d+日).+(\d{4}年\d+月\d+日)"
+    # 年・月・日をグループとする日付の記載
+    date_pattern: str = r"(\d{4})年(\d+)月(\d+)日"
+    previous_texts: tuple[str, ...] = ("前",)
+    current_texts: tuple[str, ...] = ("当",)
+    # セグメントとして扱わない列(合計など)
+    segment_excludes: str = r".{0,2}計$"
+    # 売上の合計を表す行
+    sum_pattern: str = r".*計$"
+    unit_text: str = "単位"
+    # 単位の記載と金額の倍率。先に一致したものを使用する
+    units: tuple[tuple[str, int], ...] = (
+        ("千円", 1000),
+        ("十億", 1000000000),
+        ("百万円", 1000000),
+    )
+    default_unit: int = 1000000
 
-    Returns
-    -------
-    list[Segment]
-        セグメントのリスト
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ExtractorConfig":
+        """
+        JSONなどから読み込んだ辞書から設定を作成する。指定しない項目は既定値とする
+
+        Parameters
+        ----------
+        data : dict[str, Any]
+            設定の項目と値
+
+        Returns
+        -------
+        ExtractorConfig
+            設定
+        """
+
+        values = dict(data)
+        for key in ["previous_texts", "current_texts"]:
+            if key in values:
+                values[key] = tuple(values[key])
+        if "units" in values:
+            units = values["units"]
+            items = units.items() if isinstance(units, dict) else units
+            values["units"] = tuple((text, int(unit)) for text, unit in items)
+        return cls(**values)
+
+
+class SegmentExtractor:
     """
+    セグメント報告のテーブルから、期間・セグメント・勘定を読み取る。
+    正規表現は作成時に一度だけコンパイルし、日付の変換結果は記録して再利用する
+    """
+
+    def __init__(self, config: Optional[ExtractorConfig] = None) -> None:
+        self.config = config or ExtractorConfig()
+        self.period_pattern = re.compile(self.config.period_pattern)
+        self.date_pattern = re.compile(self.config.date_pattern)
+        self.segment_excludes = re.compile(self.config.segment_excludes)
+        self.sum_pattern = re.compile(self.config.sum_pattern)
+        self.parse_date = functools.lru_cache(maxsize=4096)(self._parse_date)
+
+    def _parse_date(self, text: str) -> Optional[datetime]:
+        m = self.date_pattern.search(text)
+        if m is None:
+            return None
+        year, month, day = m.groups()
+        return datetime(int(year), int(month), int(day))
+
+    def read_table_period(self, table: "Tag | TableGrid") -> Period:
+        if isinstance(table, TableGrid):
+            paragraphs = table.paragraphs
+        else:
+            paragraphs = find_period_paragraphs(table)
 
-    merged_cells = table.find_all("td", colspan=True)
-    SEGMENT_TEXT = "報告セグメント"
-    EXCLUDES = re.compile(r".{0,2}計$")
-    NORMALIZER = re.compile(r"\s|\r|\n")
-    segments = []  # type: list[Segment]
+        config = self.config
+        for text in paragraphs:
+            if self.period_pattern.search(text):
+                kind = ""
+                if any(t in text for t in config.previous_texts):
+                    kind = "previous"
+                elif any(t in text for t in config.current_texts):
+                    kind = "current"
+
+                begin = end = None
+                dates = [m.group() for m in self.date_pattern.finditer(text)]
+                if len(dates) == 2:
+                    begin = self.parse_date(dates[0])
+                    end = self.parse_date(dates[1])
+                return Period(kind, text, begin, end)
+
+        return Period()
+
+    def read_table_segments(self, table: "Tag | TableGrid") -> list[Segment]:
+        grid = table if isinstance(table, TableGrid) else TableGrid.from_tag(table)
+        segments = []  # type: list[Segment]
+
+        segment_title_cells = [
+            cell for cell in grid.merged_cells() if SEGMENT_TEXT in cell.text
+        ]
+        if len(segment_title_cells) == 0:
+            return segments
+        else:
+            segment_title_cell = segment_title_cells[0]
+            # `merged_cells` はcolspanを指定したセルのみのため、Noneにはならない
+            num_segments = segment_title_cell.colspan or 0
+
+            segment_begin = 0
+            skipped = 0
+            for cell in grid.row_cells(segment_title_cell.row):
+                if cell.text == SEGMENT_TEXT:
+                    break
+                else:
+                    if cell.rowspan is None:
+                        segment_begin += 1
+                    else:
+                        skipped += 1
+
+            order = 0
+            for i, segment_cell in enumerate(
+                grid.row_cells(segment_title_cell.next_row)
+            ):
+                if i < segment_begin:
+                    continue
+                elif i < (segment_begin + num_segments):
+                    segment_text = segment_cell.compact
+                    if segment_text and not self.segment_excludes.match(segment_text):
+                        segments.append(Segment(order, i + skipped, segment_text))
+                        order += 1
 
-    segment_title_cells = [cell for cell in merged_cells if SEGMENT_TEXT in cell.text]
-    if len(segment_title_cells) == 0:
         return segments
-    else:
-        segment_title_cell = segment_title_cells[0]
-        num_segments = int(segment_title_cell.attrs["colspan"])
-
-        segment_begin = 0
-        skipped = 0
-        for cell in segment_title_cell.find_previous("tr").find_all("td"):
-            if cell.text.strip() == SEGMENT_TEXT:
+
+    def read_table_unit(self, grid: "TableGrid") -> int:
+        config = self.config
+        for cell in grid.merged_cells():
+            if config.unit_text in cell.text:
+                for text, unit in config.units:
+                    if text in cell.text:
+                        return unit
                 break
-            else:
-                if "rowspan" not in cell.attrs:
-                    segment_begin += 1
-                else:
-                    skipped += 1
+        return config.default_unit
 
-        segment_row = segment_title_cell.find_next("tr")
-        order = 0
-        for i, segment_cell in enumerate(segment_row.find_all("td")):
-            if i < segment_begin:
+    def read_table_sales_profit(self, table: "Tag | TableGrid") -> list[Account]:
+        grid = table if isinstance(table, TableGrid) else TableGrid.from_tag(table)
+        unit = self.read_table_unit(grid)
+
+        skip_rows = 0
+        sales = None
+        profit = None
+        for i in range(len(grid.rows)):
+            if skip_rows > 0:
+                skip_rows -= 1
+                continue
+
+            account_cell = grid.first_cell(i)
+            if account_cell is None:
                 continue
-            elif i < (segment_begin + num_segments):
-                segment_text = NORMALIZER.sub("", segment_cell.text.strip())
-                if segment_text and not EXCLUDES.match(segment_text):
-                    segments.append(Segment(order, i + skipped, segment_text))
-                    order += 1
+            if account_cell.rowspan is not None:
+                skip_rows = account_cell.rowspan - 1
+
+            account_text = account_cell.compact
+            if account_text:
+                if sales is None:
+                    sales = Account(0, i, "Sales", account_text, unit)
+                    profit = None
+                elif sales and self.sum_pattern.match(account_text):
+                    sales = Account(0, i, "Sales", sales.name, unit)
+                    profit = None
+                elif sales and profit is None:
+                    profit = Account(1, i, "Profit", account_text, unit)
+
+        accounts = []
+        if sales is not None:
+            accounts.append(sales)
+        if profit is not None:
+            accounts.append(profit)
 
-    return segments
+        return accounts
 
 
-def read_table_sales_profit(table: Tag) -> list[Account]:
+DEFAULT_EXTRACTOR = SegmentExtractor()
+
+
+@profiled("read_table_period")
+def read_table_period(table: "Tag | TableGrid") -> Period:
     """
-    セグメント報告のテーブルから、売上・利益の勘定の位置を取得する
+    セグメント報告のテーブル上部にあるテキストから、報告年月日を取得する
 
     Parameters
     ----------
-    table: Tag
+    table: Tag | TableGrid
         セグメント報告のテーブル要素
 
     Returns
     -------
-    list[Account]
-        勘定のリスト
+    Period
+        報告年月日
     """
 
-    SUM = re.compile(r".*計$")
-    NORMALIZER = re.compile(r"\s|\r|\n")
-    UNIT_TEXT = "単位"
-    unit = 1000000
+    return DEFAULT_EXTRACTOR.read_table_period(table)
 
-    merged_cell = table.find_all("td", colspan=True)
-    unit_cells = [cell for cell in merged_cell if UNIT_TEXT in cell.text]
 
-    if len(unit_cells) > 0:
-        cell = unit_cells[0]
-        if "千円" in cell.text:
-            unit = 1000
-        elif "十億" in cell.text:
-            unit = 1000000000
+@profiled("read_table_segments")
+def read_table_segments(table: "Tag | TableGrid") -> list[Segment]:
+    """
+    セグメント報告のテーブルから、セグメントの位置を取得する
 
-    rows = table.find_all("tr")
+    Parameters
+    ----------
+    table: Tag | TableGrid
+        セグメント報告のテーブル要素
 
-    skip_rows = 0
-    sales = None
-    profit = None
-    for i, row in enumerate(rows):
-        if skip_rows > 0:
-            skip_rows -= 1
-            continue
+    Returns
+    -------
+    list[Segment]
+        セグメントのリスト
+    """
 
-        account_cell = row.find_next("td")
-        if "rowspan" in account_cell.attrs:
-            skip_rows = int(account_cell.attrs["rowspan"]) - 1
+    return DEFAULT_EXTRACTOR.read_table_segments(table)
+
+
+@profiled("read_table_sales_profit")
+def read_table_sales_profit(table: "Tag | TableGrid") -> list[Account]:
+    """
+    セグメント報告のテーブルから、売上・利益の勘定の位置を取得する
 
-        account_text = NORMALIZER.sub("", account_cell.text)
-        if account_text:
-            if sales is None:
-                sales = Account(0, i, "Sales", account_text, unit)
-                profit = None
-            elif sales and SUM.match(account_text):
-                sales = Account(0, i, "Sales", sales.name, unit)
-                profit = None
-            elif sales and profit is None:
-                profit = Account(1, i, "Profit", account_text, unit)
+    Parameters
+    ----------
+    table: Tag | TableGrid
+        セグメント報告のテーブル要素
 
-    accounts = []
-    if sales is not None:
-        accounts.append(sales)
-    if profit is not None:
-        accounts.append(profit)
+    Returns
+    -------
+    list[Account]
+        勘定のリスト
+    """
 
-    return accounts
+    return DEFAULT_EXTRACTOR.read_table_sales_profit(table)
 
 
+@profiled("read_segment_sales_profit")
 def read_segment_sales_profit(
-    table: Tag, segment: Segment, account: Account
-) -> pd.Series:
+    table: "Tag | TableGrid", segment: Segment, account: Account
+) -> "pd.Series":
     """
     セグメント報告のテーブルから、セグメント、勘定を指定してデータを取得する
 
     Parameters
     ----------
-    table: Tag
+    table: Tag | TableGrid
         セグメント報告のテーブル要素
     segment: Segment
         セグメントの位置
@@ -276,18 +1105,72 @@ def read_segment_sales_profit(
         指定されたセグメント、勘定のデータ
     """
 
-    cell = table.find_all("tr")[account.position].find_all("td")[segment.position]
-    data = {}
-    data.update(
-        {f"segment_{key}": value for key, value in dataclasses.asdict(segment).items()}
-    )
-    data.update(
-        {f"account_{key}": value for key, value in dataclasses.asdict(account).items()}
-    )
-    value = cell.text.strip().replace("-", "").replace(",", "").replace("△", "-")
-    try:
-        data["value"] = float(value)
-    except ValueError:
-        data["value"] = None
+    grid = table if isinstance(table, TableGrid) else TableGrid.from_tag(table)
+    cell = grid.row_cells(account.position)[segment.position]
+    data = {}  # type: dict[str, Any]
+    data.update({f"segment_{key}": value for key, value in segment.asdict().items()})
+    data.update({f"account_{key}": value for key, value in account.asdict().items()})
+    data["value"] = parse_values([cell.text])[0]
+
+    import pandas as pd
 
     return pd.Series(data)
+
+
+def parse_values(texts: list[str]) -> list[Optional[float]]:
+    """
+    セルのテキストを数値に変換する。△は負の数、-は空欄として扱う
+
+    Parameters
+    ----------
+    texts: list[str]
+        セルのテキストのリスト
+
+    Returns
+    -------
+    list[Optional[float]]
+        数値のリスト。数値に変換できない場合はNone
+    """
+
+    values = []  # type: list[Optional[float]]
+    for text in texts:
+        cleaned = text.replace("-", "").replace(",", "").replace("△", "-")
+        try:
+            values.append(float(cleaned))
+        except ValueError:
+            values.append(None)
+    return values
+
+
+@profiled("read_table_values")
+def read_table_values(
+    table: "Tag | TableGrid", segment: Segment, accounts: list[Account]
+) -> list[Optional[float]]:
+    """
+    セグメント報告のテーブルから、1つのセグメントの勘定のデータを順に取得する
+
+    数値に変換できないセルがあれば、以降の勘定のセルは読まずに打ち切る
+
+    Parameters
+    ----------
+    table: Tag | TableGrid
+        セグメント報告のテーブル要素
+    segment: Segment
+        セグメント
+    accounts: list[Account]
+        勘定のリスト
+
+    Returns
+    -------
+    list[Optional[float]]
+        勘定の順のデータ。数値に変換できなかった場合は、末尾をNoneとして打ち切る
+    """
+
+    grid = table if isinstance(table, TableGrid) else TableGrid.from_tag(table)
+    values = []  # type: list[Optional[float]]
+    for a in accounts:
+        value = parse_values([grid.row_cells(a.position)[segment.position].text])[0]
+        values.append(value)
+        if value is None:
+            break
+    return values
@@ -0,0 +1,196 @@
+import csv
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+from scripts.financial_result_to_dataframe import (
+    ReadLog,
+    ReadResult,
+    iter_financial_result_rows,
+)
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+class SegmentRecord(NamedTuple):
+    source: str
+    period_kind: str
+    period_description: str
+    period_begin: Optional[datetime]
+    period_end: Optional[datetime]
+    segment_order: int
+    segment_position: int
+    segment_name: str
+    account_order: int
+    account_position: int
+    account_kind: str
+    account_name: str
+    account_unit: int
+    value: float
+
+
+RECORD_COLUMNS = list(SegmentRecord._fields)
+
+
+def iter_financial_result_records(
+    paths: Iterable[str | Path],
+    parser: Optional[str] = None,
+    partial: bool = False,
+    logs: Optional[list[ReadLog]] = None,
+) -> Iterator[SegmentRecord]:
+    """
+    決算短信HTMLから読み取ったセグメント情報を、セグメント報告のテーブルごとに順に返す
+
+    Parameters
+    ----------
+    paths : Iterable[str | Path]
+        決算短信のHTMLファイルのパス
+    parser : Optional[str]
+        HTMLのパーサー
+    partial : bool
+        Trueの場合、セグメント報告のテーブル周辺のみを読み込む
+    logs : Optional[list[ReadLog]]
+        指定した場合、ファイルを読み終えるごとに読み取りのログを追加する
+
+    Returns
+    -------
+    Iterator[SegmentRecord]
+        読み取ったセグメント情報
+    """
+
+    for path in paths:
+        source = str(path)
+        log = ReadLog(ReadResult(), [], source=source)
+        for period, segment, account, value in iter_financial_result_rows(
+            path, log, parser, partial
+        ):
+            yield SegmentRecord._make(
+                (source,)
+                + period.astuple()
+                + segment.astuple()
+                + account.astuple()
+                + (value,)
+            )
+        if logs is not None:
+            logs.append(log)
+
+
+class RecordSink(ABC):
+    """
+    セグメント情報を一定の件数ごとにまとめてファイルへ追記する。
+    保持する件数は `chunk_size` までのため、全体の件数によらずメモリの使用量は一定となる。
+    サブクラスで `_write_chunk` を実装する
+    """
+
+    def __init__(self, path: str | Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.path = path if isinstance(path, Path) else Path(path)
+        self.chunk_size = chunk_size
+        self.count = 0
+        self._chunk = []  # type: list[SegmentRecord]
+
+    def write(self, record: SegmentRecord) -> None:
+        self._chunk.append(record)
+        if len(self._chunk) >= self.chunk_size:
+            self.flush()
+
+    def write_all(self, records: Iterable[SegmentRecord]) -> int:
+        """
+        セグメント情報をすべて書き込む
+
+        Parameters
+        ----------
+        records : Iterable[SegmentRecord]
+            書き込むセグメント情報
+
+        Returns
+        -------
+        int
+            書き込んだ件数
+        """
+
+        count = 0
+        for record in records:
+            self.write(record)
+            count += 1
+        return count
+
+    def flush(self) -> None:
+        if self._chunk:
+            self._write_chunk(self._chunk)
+            self.count += len(self._chunk)
+            self._chunk = []
+
+    def close(self) -> None:
+        self.flush()
+
+    @abstractmethod
+    def _write_chunk(self, chunk: list[SegmentRecord]) -> None:
+        pass
+
+    def __enter__(self) -> "RecordSink":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class CsvRecordSink(RecordSink):
+    """
+    セグメント情報をCSVファイルに追記する。ファイルが空の場合はヘッダーを書き込む
+    """
+
+    def _write_chunk(self, chunk: list[SegmentRecord]) -> None:
+        header = not self.path.exists() or self.path.stat().st_size == 0
+        with self.path.open("a", encoding="utf-8", newline="") as w:
+            writer = csv.writer(w)
+            if header:
+                writer.writerow(RECORD_COLUMNS)
+            writer.writerows(chunk)
+
+
+class ParquetRecordSink(RecordSink):
+    """
+    セグメント情報をParquetファイルに書き込む。件数ごとに1つの行グループとなる。
+    pyarrowが必要となる
+    """
+
+    def __init__(self, path: str | Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as ex:
+            raise ImportError("ParquetRecordSink requires pyarrow") from ex
+
+        super().__init__(path, chunk_size)
+        self._pa = pa
+        self.schema = pa.schema(
+            [
+                ("source", pa.string()),
+                ("period_kind", pa.string()),
+                ("period_description", pa.string()),
+                ("period_begin", pa.timestamp("us")),
+                ("period_end", pa.timestamp("us")),
+                ("segment_order", pa.int64()),
+                ("segment_position", pa.int64()),
+                ("segment_name", pa.string()),
+                ("account_order", pa.int64()),
+                ("account_position", pa.int64()),
+                ("account_kind", pa.string()),
+                ("account_name", pa.string()),
+                ("account_unit", pa.int64()),
+                ("value", pa.float64()),
+            ]
+        )
+        self._writer = pq.ParquetWriter(self.path, self.schema)
+
+    def _write_chunk(self, chunk: list[SegmentRecord]) -> None:
+        pa = self._pa
+        columns = [
+            pa.array(values, type=f.type) for values, f in zip(zip(*chunk), self.schema)
+        ]
+        self._writer.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self) -> None:
+        super().close()
+        self._writer.close()
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, TypeVar
+
+from scripts.financial_result_archive import ArchiveMember
+from scripts.financial_result_cache import content_hash
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SHARD_MANIFEST = "shard.json"
+SHARD_PATTERN = re.compile(r"(\d+)/(\d+)")
+
+P = TypeVar("P", bound=Path | ArchiveMember)
+
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """
+    `i/N` の形式の文字列から、シャードの番号と数を取得する
+
+    Parameters
+    ----------
+    text : str
+        0から始まるシャードの番号 `i` と、シャードの数 `N`
+
+    Returns
+    -------
+    tuple[int, int]
+        シャードの番号と数
+    """
+
+    m = SHARD_PATTERN.fullmatch(text.strip())
+    if m is None:
+        raise ValueError(f"Invalid shard: {text} (expected i/N)")
+    index, count = int(m.group(1)), int(m.group(2))
+    if count < 1 or index >= count:
+        raise ValueError(f"Invalid shard: {text} (expected 0 <= i < N)")
+    return index, count
+
+
+@dataclass
+class ShardManifest:
+    """
+    シャードごとの出力に記録する、担当したファイルと入力全体の情報
+    """
+
+    index: int
+    count: int
+    # 入力全体のファイルの内容のハッシュ値から作成した値。シャード間で同じ入力か確認する
+    inputs: str
+    files: list[str] = field(default_factory=list)
+    created: float = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ShardManifest":
+        return cls(**data)
+
+    def write(self, output: str | Path) -> None:
+        Path(output).joinpath(SHARD_MANIFEST).write_text(
+            json.dumps(self.to_dict(), ensure_ascii=False, indent=2), "utf-8"
+        )
+
+    @classmethod
+    def read(cls, directory: str | Path) -> "ShardManifest":
+        path = Path(directory).joinpath(SHARD_MANIFEST)
+        if not path.is_file():
+            raise ValueError(f"Shard manifest not found: {path}")
+        return cls.from_dict(json.loads(path.read_text("utf-8")))
+
+
+def select_shard(
+    paths: Iterable[P], index: int, count: int
+) -> tuple[list[P], ShardManifest]:
+    """
+    ファイルの内容のハッシュ値から、シャードが担当するファイルを選択する。
+    ファイルの列挙順やパスによらず、同じ入力からは常に同じ分割になる。
+    ファイルを追加・削除しても、他のファイルを担当するシャードは変わらない
+
+    Parameters
+    ----------
+    paths : Iterable[Path | ArchiveMember]
+        決算短信のHTMLファイルのパス、またはzipアーカイブ内のファイル
+    index : int
+        0から始まるシャードの番号
+    count : int
+        シャードの数
+
+    Returns
+    -------
+    tuple[list[Path | ArchiveMember], ShardManifest]
+        シャードが担当するファイルと、出力に記録するマニフェスト
+    """
+
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard: {index}/{count}")
+
+    keyed = sorted(
+        ((content_hash(p) or "", str(p)), p) for p in paths
+    )  # type: list[tuple[tuple[str, str], P]]
+    digest = hashlib.sha256()
+    for (key, _), _ in keyed:
+        digest.update(key.encode())
+
+    selected = [p for (key, name), p in keyed if _shard_of(key, name, count) == index]
+    manifest = ShardManifest(
+        index, count, digest.hexdigest(), [str(p) for p in selected], time.time()
+    )
+    return selected, manifest
+
+
+def _shard_of(key: str, name: str, count: int) -> int:
+    # 読み込めないファイルも分割の対象とし、パスのハッシュ値で担当するシャードを決める。
+    # 担当したシャードで、読み取りの失敗として記録する
+    if not key:
+        key = hashlib.sha256(name.encode()).hexdigest()
+    return int(key, 16) % count
+
+
+def merge_shards(
+    directories: Iterable[str | Path], output: str | Path
+) -> "pd.DataFrame":
+    """
+    シャードごとの出力を結合し、分割せずに実行した場合と同じ形式で出力する
+
+    Parameters
+    ----------
+    directories : Iterable[str | Path]
+        シャードごとの出力のディレクトリ
+    output : str | Path
+        `segments.csv` と `read_results.csv` を出力するディレクトリ
+
+    Returns
+    -------
+    pd.DataFrame
+        ファイルごとの読み取り状況(ReadResultの各項目を0/1で表したもの)
+    """
+
+    import pandas as pd
+
+    _directories = [Path(d) for d in directories]
+    manifests = [ShardManifest.read(d) for d in _directories]
+    if not manifests:
+        raise ValueError("No shards to merge")
+
+    counts = {m.count for m in manifests}
+    if len(counts) > 1:
+        raise ValueError(f"Shards were split into different counts: {sorted(counts)}")
+    if len({m.inputs for m in manifests}) > 1:
+        raise ValueError("Shards were run on different input sets")
+
+    indexes = sorted(m.index for m in manifests)
+    duplicated = sorted({i for i in indexes if indexes.count(i) > 1})
+    if duplicated:
+        raise ValueError(f"Duplicated shards: {duplicated}")
+    missing = sorted(set(range(counts.pop())) - set(indexes))
+    if missing:
+        raise ValueError(f"Missing shards: {missing}")
+
+    # 値の書式を変えずに結合するよう、すべての列を文字列として読み込む
+    segments = []
+    read_results = []
+    for directory in _directories:
+        try:
+            segments.append(
+                pd.read_csv(
+                    directory.joinpath("segments.csv"), dtype=str, keep_default_na=False
+                )
+            )
+        except pd.errors.EmptyDataError:
+            # 読み取れた値がないシャードは、列のない空のファイルを出力している
+            pass
+        read_results.append(
+            pd.read_csv(directory.joinpath("read_results.csv"), index_col="path")
+        )
+
+    read_result_df = pd.concat(read_results).sort_index()
+    duplicated_files = read_result_df.index[read_result_df.index.duplicated()]
+    if len(duplicated_files) > 0:
+        raise ValueError(f"Files read by several shards: {list(duplicated_files)}")
+
+    data = pd.concat(segments, ignore_index=True) if segments else pd.DataFrame()
+    if len(data) > 0:
+        data = data.sort_values("path", kind="stable", ignore_index=True)
+
+    _output = Path(output)
+    _output.mkdir(parents=True, exist_ok=True)
+    data.to_csv(_output.joinpath("segments.csv"), index=False)
+    read_result_df.to_csv(_output.joinpath("read_results.csv"))
+    return read_result_df
@@ -0,0 +1,276 @@
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from scripts.financial_result_archive import ArchiveMember
+from scripts.financial_result_to_dataframe import (
+    DATAFRAME_COLUMNS,
+    ReadLog,
+    financial_result_to_dataframe,
+)
+
+# 時系列の1つの値を特定する列。提出日時が新しい決算短信の値で上書きする
+KEY_COLUMNS = ["security_code", "period_end", "segment_name", "account_kind"]
+INDEX_COLUMNS = KEY_COLUMNS[1:]
+STORE_COLUMNS = ["security_code"] + DATAFRAME_COLUMNS + ["source"]
+CATALOG_COLUMNS = ["security_code", "rows", "period_end_min", "period_end_max"]
+CATALOG_FILE = "catalog.parquet"
+
+
+def parse_security_code(path: str | Path | ArchiveMember) -> Optional[str]:
+    """
+    `<提出日時>_<証券コード>_<...>.htm` の形式のファイル名から、証券コードを取得する
+
+    Parameters
+    ----------
+    path : str | Path | ArchiveMember
+        決算短信のHTMLファイルのパス、またはzipアーカイブ内のファイル
+
+    Returns
+    -------
+    Optional[str]
+        証券コード。ファイル名が形式に沿っていない場合はNone
+    """
+
+    # アーカイブ内のファイルも、アーカイブ内のディレクトリを除いたファイル名から取得する
+    name = path.name if isinstance(path, (Path, ArchiveMember)) else Path(path).name
+    parts = name.split("_")
+    if len(parts) < 3 or not parts[1]:
+        return None
+    return parts[1]
+
+
+def parse_filing_time(path: str | Path | ArchiveMember) -> str:
+    """
+    `<提出日時>_<証券コード>_<...>.htm` の形式のファイル名から、提出日時を取得する
+
+    Parameters
+    ----------
+    path : str | Path | ArchiveMember
+        決算短信のHTMLファイルのパス、またはzipアーカイブ内のファイル
+
+    Returns
+    -------
+    str
+        提出日時の数字の列。ファイル名が形式に沿っていない場合は空文字列
+    """
+
+    name = path.name if isinstance(path, (Path, ArchiveMember)) else Path(path).name
+    parts = name.split("_")
+    if len(parts) < 3 or not parts[0].isdigit():
+        return ""
+    return parts[0]
+
+
+class SegmentStore:
+    """
+    決算短信から読み取ったセグメント情報を、証券コードごとの時系列として保存する。
+    証券コードごとにParquetファイルを分け、登録した証券コードのファイルのみを書き換える
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = directory if isinstance(directory, Path) else Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._partitions = {}  # type: dict[str, pd.DataFrame]
+
+        catalog = self.directory.joinpath(CATALOG_FILE)
+        if catalog.exists():
+            self.catalog = pd.read_parquet(catalog).set_index("security_code")
+        else:
+            self.catalog = pd.DataFrame(
+                columns=CATALOG_COLUMNS[1:], index=pd.Index([], name="security_code")
+            )
+
+    def security_codes(self) -> list[str]:
+        return sorted(self.catalog.index)
+
+    def _partition_path(self, security_code: str) -> Path:
+        return self.directory.joinpath(f"security_code={security_code}", "data.parquet")
+
+    def partition(self, security_code: str) -> pd.DataFrame:
+        """
+        証券コードの時系列を取得する
+
+        Parameters
+        ----------
+        security_code : str
+            証券コード
+
+        Returns
+        -------
+        pd.DataFrame
+            (period_end, segment_name, account_kind) の順に並べた時系列
+        """
+
+        if security_code not in self._partitions:
+            path = self._partition_path(security_code)
+            if path.exists():
+                df = pd.read_parquet(path)
+            else:
+                df = pd.DataFrame(columns=STORE_COLUMNS)
+            self._partitions[security_code] = df.set_index(INDEX_COLUMNS).sort_index()
+        return self._partitions[security_code]
+
+    def upsert(
+        self, df: pd.DataFrame, security_code: str, source: Optional[str] = None
+    ) -> int:
+        """
+        1つの決算短信から読み取ったセグメント情報を登録する。
+        同じ期間・セグメント・勘定の値が登録済みの場合は、提出日時が新しい決算短信の値を残す。
+        提出日時が同じ場合は後から登録した値で上書きし、ファイル名から提出日時を取得できない値は
+        最も古いものとして扱う
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            `financial_result_to_dataframe` で読み取ったセグメント情報
+        security_code : str
+            証券コード
+        source : Optional[str]
+            読み取った決算短信のファイルのパス
+
+        Returns
+        -------
+        int
+            登録後の証券コードの時系列の行数
+        """
+
+        # 期間の終了日がない値は、時系列に並べられないため登録しない
+        new = df[df["period_end"].notna()].assign(
+            security_code=security_code, source=source
+        )
+        # 決算短信ごとにカテゴリが異なるため、文字列に戻して結合する
+        new = new.astype({"segment_name": str, "account_name": str})[STORE_COLUMNS]
+        current = self.partition(security_code).reset_index()[STORE_COLUMNS]
+        merged = pd.concat([current, new], ignore_index=True) if len(current) else new
+        # 古い決算短信を後から登録しても、修正後の新しい値を上書きしないよう提出日時の順に並べる
+        filing_time = merged["source"].map(
+            lambda source: parse_filing_time(source) if isinstance(source, str) else ""
+        )
+        order = filing_time.sort_values(kind="stable").index
+        merged = merged.loc[order].drop_duplicates(KEY_COLUMNS, keep="last")
+
+        path = self._partition_path(security_code)
+        path.parent.mkdir(exist_ok=True)
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        merged.to_parquet(temporary, index=False)
+        os.replace(temporary, path)
+
+        partition = merged.set_index(INDEX_COLUMNS).sort_index()
+        self._partitions[security_code] = partition
+        period_end = partition.index.get_level_values("period_end")
+        self.catalog.loc[security_code] = [
+            len(partition),
+            period_end.min(),
+            period_end.max(),
+        ]
+        self._write_catalog()
+        return len(partition)
+
+    def _write_catalog(self) -> None:
+        catalog = self.catalog.reset_index().astype(
+            {
+                "rows": "int64",
+                "period_end_min": "datetime64[ns]",
+                "period_end_max": "datetime64[ns]",
+            }
+        )
+        path = self.directory.joinpath(CATALOG_FILE)
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        catalog.to_parquet(temporary, index=False)
+        os.replace(temporary, path)
+
+    def ingest(
+        self,
+        paths: Iterable[str | Path | ArchiveMember],
+        parser: Optional[str] = None,
+        partial: bool = False,
+    ) -> list[ReadLog]:
+        """
+        決算短信HTMLを読み取り、ファイル名の証券コードの時系列に登録する
+
+        Parameters
+        ----------
+        paths : Iterable[str | Path | ArchiveMember]
+            決算短信のHTMLファイルのパス、またはzipアーカイブ内のファイル。
+            登録済みの期間を含む場合は上書きする
+        parser : Optional[str]
+            HTMLのパーサー
+        partial : bool
+            Trueの場合、セグメント報告のテーブル周辺のみを読み込む
+
+        Returns
+        -------
+        list[ReadLog]
+            ファイルごとの読み取りのログ。証券コードを取得できないファイルは含まない
+        """
+
+        logs = []
+        for path in paths:
+            security_code = parse_security_code(path)
+            if security_code is None:
+                continue
+            df, log = financial_result_to_dataframe(path, parser, partial, compact=True)
+            if df is not None and len(df) > 0:
+                self.upsert(df, security_code, str(path))
+            logs.append(log)
+        return logs
+
+    def query(
+        self,
+        security_codes: Optional[Iterable[str]] = None,
+        start: Optional[datetime | str] = None,
+        end: Optional[datetime | str] = None,
+        segment_name: Optional[str] = None,
+        account_kind: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        期間の終了日が範囲内のセグメント情報を取得する
+
+        Parameters
+        ----------
+        security_codes : Optional[Iterable[str]]
+            証券コード。Noneの場合はすべての証券コード
+        start : Optional[datetime | str]
+            期間の終了日の下限(この日を含む)
+        end : Optional[datetime | str]
+            期間の終了日の上限(この日を含む)
+        segment_name : Optional[str]
+            セグメント名
+        account_kind : Optional[str]
+            勘定の種類 (`Sales`, `Profit`)
+
+        Returns
+        -------
+        pd.DataFrame
+            証券コード・期間の終了日・セグメント・勘定の順に並べたセグメント情報
+        """
+
+        _start = pd.Timestamp(start) if start is not None else None
+        _end = pd.Timestamp(end) if end is not None else None
+        catalog = self.catalog
+        if security_codes is not None:
+            catalog = catalog[catalog.index.isin(list(security_codes))]
+        # 範囲と重ならない証券コードのファイルは読み込まない
+        if _start is not None:
+            catalog = catalog[catalog["period_end_max"] >= _start]
+        if _end is not None:
+            catalog = catalog[catalog["period_end_min"] <= _end]
+
+        dfs = []
+        for security_code in sorted(catalog.index):
+            partition = self.partition(security_code)
+            # 期間の終了日の順に並んでいるため、範囲は二分探索で取り出す
+            df = partition.loc[_start:_end]
+            if segment_name is not None:
+                df = df[df.index.get_level_values("segment_name") == segment_name]
+            if account_kind is not None:
+                df = df[df.index.get_level_values("account_kind") == account_kind]
+            dfs.append(df)
+
+        if not dfs:
+            return pd.DataFrame(columns=STORE_COLUMNS)
+        return pd.concat(dfs).reset_index()[STORE_COLUMNS]
@@ -1,15 +1,47 @@
 import dataclasses
+import enum
+import html as _html
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
-
-import pandas as pd
-from bs4.element import Tag
+from typing import TYPE_CHECKING, Any, BinaryIO, Iterable, Iterator, Optional
 
 import scripts.financial_result_reader as frr
+from scripts.financial_result_archive import ArchiveMember
+from scripts.financial_result_cache import content_hash
+from scripts.financial_result_events import read_segment_grids
+from scripts.financial_result_profile import (
+    Profile,
+    active_profile,
+    file_size,
+    profiled,
+    profiling,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from bs4 import BeautifulSoup
+    from bs4.element import Tag
+
+    from scripts.financial_result_cache import ResultCache
+
+
+class ReadFlag(enum.IntFlag):
+    """
+    ReadResultの各項目を1ビットで表したもの。ビットの順序はReadResultの項目の順序と同じ
+    """
 
+    READ_HTML_FAILED = 1 << 0
+    SEGMENT_TABLE_NOT_EXIST = 1 << 1
+    TOO_LITTLE_SEGMENT_TABLE = 1 << 2
+    TOO_MUCH_SEGMENT_TABLES = 1 << 3
+    PERIOD_NOT_FOUND = 1 << 4
+    SEGMENT_NOT_FOUND = 1 << 5
+    ACCOUNT_NOT_FOUND = 1 << 6
+    VALUE_READ_FAILED = 1 << 7
+    COMPLETED = 1 << 8
 
-@dataclass
+
+@dataclass(slots=True)
 class ReadResult:
     read_html_failed: bool = False
     segment_table_not_exist: bool = False
@@ -21,81 +53,482 @@ class ReadResult:
     value_read_failed: bool = False
     completed: bool = False
 
+    @property
+    def flags(self) -> ReadFlag:
+        flags = 0
+        for name, flag in READ_FLAGS.items():
+            if getattr(self, name):
+                flags |= flag
+        return ReadFlag(flags)
+
+    @classmethod
+    def from_flags(cls, flags: int) -> "ReadResult":
+        return cls(*(bool(flags & flag) for flag in READ_FLAGS.values()))
+
+
+READ_FLAGS = {f.name: ReadFlag[f.name.upper()] for f in dataclasses.fields(ReadResult)}
+
+
+def read_flags_to_dataframe(
+    flags: Iterable[int], index: Optional[Iterable[Any]] = None
+) -> "pd.DataFrame":
+    """
+    ファイルごとの読み取り結果のビットを、項目ごとに0/1で表した表に変換する
+
+    Parameters
+    ----------
+    flags : Iterable[int]
+        ファイルごとの読み取り結果 (`ReadResult.flags`)
+    index : Optional[Iterable[Any]]
+        表のインデックス
+
+    Returns
+    -------
+    pd.DataFrame
+        ReadResultの項目を列とする表。`sum()` で項目ごとのファイル数を集計できる
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    values = np.fromiter(flags, dtype=np.uint16)
+    bits = np.array(list(READ_FLAGS.values()), dtype=np.uint16)
+    matrix = ((values[:, np.newaxis] & bits) != 0).astype(np.int64)
+    return pd.DataFrame(
+        matrix,
+        columns=list(READ_FLAGS),
+        index=None if index is None else list(index),
+    )
+
+
+RECORD_FIELDS = {
+    prefix: [f.name for f in dataclasses.fields(record)]
+    for prefix, record in [
+        ("period", frr.Period),
+        ("segment", frr.Segment),
+        ("account", frr.Account),
+    ]
+}
+DATAFRAME_COLUMNS = [
+    f"{prefix}_{name}" for prefix, names in RECORD_FIELDS.items() for name in names
+] + ["value"]
+# セグメント報告のテーブルから読み取った1つの値
+SegmentRow = tuple[frr.Period, frr.Segment, frr.Account, float]
+# 同じ名称が繰り返し現れる列は、カテゴリ型で保持する
+CATEGORY_COLUMNS = ["segment_name", "account_name"]
+# 失敗の記録に残すテーブル要素のHTMLの最大の文字数
+SNIPPET_LENGTH = 2000
+# セグメント報告のテーブルを読み取る方式。
+# `bs4` はBeautiful Soupの構文木から、`events` は構文木を作らずにhtml.parserのイベントから読み取る
+ENGINES = ("bs4", "events")
+
 
 class ReadException(Exception):
-    def __init__(self, index: int, read_result: str, html: Tag) -> None:
+    def __init__(
+        self,
+        index: int,
+        read_result: str,
+        html: Optional["Tag"],
+        source: Optional[str] = None,
+        snippet: Optional[str] = None,
+        position: Optional[tuple[int, int]] = None,
+        message: Optional[str] = None,
+    ) -> None:
         super().__init__(read_result)
         self.index = index
         self.read_result = read_result
         self.html = html
+        # 読み込んだファイルのパス
+        self.source = source
+        # `compact` で記録する、テーブル要素の先頭部分と、正規化したテキスト中の位置(行, 列)
+        self.snippet = snippet
+        self.position = position
+        # 想定外のエラーで失敗した場合の、エラーの内容
+        self.message = message
+
+    def compact(self) -> None:
+        """
+        テーブル要素から調査に必要な情報のみを記録し、テーブル要素への参照を解放する。
+        テーブル要素は親の要素を参照しているため、保持すると文書全体が解放されない
+        """
+
+        self.snippet, self.position = self._compacted()
+        self.html = None
+
+    def _compacted(self) -> tuple[Optional[str], Optional[tuple[int, int]]]:
+        # テーブル要素の先頭部分と位置。テーブル要素がない場合は記録済みの値
+        snippet, position = self.snippet, self.position
+        if self.html is None:
+            return snippet, position
+        if snippet is None:
+            snippet = str(self.html)[:SNIPPET_LENGTH]
+        if position is None and self.html.sourceline is not None:
+            position = (self.html.sourceline, self.html.sourcepos or 0)
+        return snippet, position
+
+    def table(self, parser: Optional[str] = None) -> Optional["Tag"]:
+        """
+        失敗したテーブル要素を取得する。解放済みの場合は、読み込んだファイルから読み込み直す
+
+        Parameters
+        ----------
+        parser : Optional[str]
+            読み込み直す場合のHTMLのパーサー
+
+        Returns
+        -------
+        Optional[Tag]
+            テーブル要素。ファイルを読み込めない場合や、テーブルに関する失敗でない場合はNone
+        """
+
+        if self.html is not None:
+            return self.html
+        if self.source is None or self.index < 0:
+            return None
+
+        html = frr.read_financial_result_html(self.source, parser)
+        if html is None:
+            return None
+        segment_tables = frr.find_segment_tables(html)
+        if self.index >= len(segment_tables):
+            return None
+        return segment_tables[self.index]
+
+    def __reduce__(self) -> tuple[type, tuple[Any, ...]]:
+        # プロセス間で受け渡す際に構文木全体を複製しないよう、テーブル要素は送らない。
+        # 受け渡し元の記録はテーブル要素を保持したままにする
+        snippet, position = self._compacted()
+        return (
+            self.__class__,
+            (
+                self.index,
+                self.read_result,
+                None,
+                self.source,
+                snippet,
+                position,
+                self.message,
+            ),
+        )
 
 
 class ReadLog:
-    def __init__(self, status: ReadResult, logs: list[ReadException]) -> None:
+    def __init__(
+        self,
+        status: ReadResult,
+        logs: list[ReadException],
+        profile: Optional[Profile] = None,
+        source: Optional[str] = None,
+        encoding: Optional[str] = None,
+    ) -> None:
         self.status = status
         self.logs = logs
+        # `profiling` で計測した場合の、このファイルの読み取りの計測結果
+        self.profile = profile
+        # 読み込んだファイルのパス
+        self.source = source
+        # 読み込んだファイルの文字コード
+        self.encoding = encoding
+
+    def compact(self) -> None:
+        """
+        失敗の記録からテーブル要素への参照を解放し、構文木を保持しないようにする
+        """
+
+        for ex in self.logs:
+            ex.source = self.source
+            ex.compact()
+
+
+def read_html_failed_log(message: Optional[str] = None) -> ReadLog:
+    """
+    ファイルを読み込めなかった場合や、想定外のエラーで読み取りが中断した場合のログを作成する
+
+    Parameters
+    ----------
+    message : Optional[str]
+        エラーの内容
+
+    Returns
+    -------
+    ReadLog
+        `read_html_failed` の読み取りのログ
+    """
+
+    return ReadLog(
+        ReadResult(read_html_failed=True),
+        [ReadException(-1, "read_html_failed", None, message=message)],
+    )
 
 
 def financial_result_to_dataframe(
-    path: str | Path,
-) -> tuple[Optional[pd.DataFrame], ReadLog]:
-    result = ReadResult()
-    logs = []
-
-    html = frr.read_financial_result_html(path)
-    if html is None:
-        result.read_html_failed = True
-        logs.append(ReadException(-1, "read_html_failed", None))
-        return None, ReadLog(result, logs)
-
-    segment_tables = frr.find_segment_tables(html)
-    if len(segment_tables) == 0:
+    path: str | Path | ArchiveMember | BinaryIO,
+    parser: Optional[str] = None,
+    partial: bool = False,
+    cache: Optional["ResultCache"] = None,
+    compact: bool = False,
+    engine: str = "bs4",
+    digest: Optional[str] = None,
+) -> tuple[Optional["pd.DataFrame"], ReadLog]:
+    if engine not in ENGINES:
+        raise ValueError(f"Unsupported engine: {engine}")
+
+    if active_profile() is None:
+        df, log = _financial_result_to_dataframe(
+            path, parser, partial, cache, engine, digest
+        )
+    else:
+        # 計測中の場合は、ファイルごとの計測結果を読み取りのログに記録する
+        with profiling() as profile:
+            with profile.stage("financial_result_to_dataframe", file_size(path)):
+                df, log = _financial_result_to_dataframe(
+                    path, parser, partial, cache, engine, digest
+                )
+        log.profile = profile
+
+    if isinstance(path, (str, Path, ArchiveMember)):
+        log.source = str(path)
+        for ex in log.logs:
+            ex.source = log.source
+    if compact:
+        log.compact()
+    return df, log
+
+
+def _financial_result_to_dataframe(
+    path: str | Path | ArchiveMember | BinaryIO,
+    parser: Optional[str],
+    partial: bool,
+    cache: Optional["ResultCache"],
+    engine: str = "bs4",
+    digest: Optional[str] = None,
+) -> tuple[Optional["pd.DataFrame"], ReadLog]:
+    # キャッシュはファイルの内容をキーにするため、パスを指定した場合のみ使用する
+    if cache is not None and isinstance(path, (str, Path, ArchiveMember)):
+        # キャッシュがない場合に、取得と保存でファイルを2回ハッシュしないようにする。
+        # 呼び出し元で計算済みのハッシュ値があれば、それを使用する
+        if digest is None:
+            digest = content_hash(path)
+        cached = cache.get(path, digest)
+        if cached is not None:
+            return cached
+
+        df, log = _financial_result_to_dataframe(path, parser, partial, None, engine)
+        if not log.status.read_html_failed:
+            cache.put(path, df, log, digest)
+        return df, log
+
+    log = ReadLog(ReadResult(), [])
+    data = {column: [] for column in DATAFRAME_COLUMNS}  # type: dict[str, list[Any]]
+    for period, segment, account, value in iter_financial_result_rows(
+        path, log, parser, partial, engine
+    ):
+        _append_row(data, period, segment, account, value)
+
+    if log.status.read_html_failed or log.status.segment_table_not_exist:
+        return None, log
+    return _columns_to_dataframe(data), log
+
+
+def iter_financial_result_rows(
+    path: str | Path | ArchiveMember | BinaryIO,
+    log: ReadLog,
+    parser: Optional[str] = None,
+    partial: bool = False,
+    engine: str = "bs4",
+) -> Iterator[SegmentRow]:
+    if engine == "events":
+        # 構文木を作らないため、パーサーはhtml.parserに固定され、文書全体を一度だけ走査する
+        read = read_segment_grids(path)
+        if read is None:
+            _set_read_html_failed(log)
+            return
+        grids, log.encoding = read
+        yield from iter_grid_rows(grids, log)
+        return
+
+    if not partial:
+        html = frr.read_financial_result_html(path, parser)
+        if html is None:
+            _set_read_html_failed(log)
+            return
+        log.encoding = html.original_encoding
+        yield from iter_segment_rows(html, log)
+        return
+
+    loaded = frr.read_financial_result_text(path)
+    if loaded is None:
+        _set_read_html_failed(log)
+        return
+    text, log.encoding = loaded
+
+    # セグメント報告のテーブル周辺のみを読み込み、読み取れなかった場合は文書全体を読み込み直す
+    fragment = frr.extract_segment_fragments(text)
+    if not fragment:
+        # `find_segment_tables` は「報告セグメント」と一致するテキストのみを検索するため、
+        # タグをまたいで記載されたものは、どちらの方法でも見つからない。
+        # 文字参照で記載されたものは検索範囲に含まれないため、文書全体を読み込んで確認する
+        referenced = _html.unescape(text).count(frr.SEGMENT_TEXT)
+        if referenced <= text.count(frr.SEGMENT_TEXT):
+            log.status.segment_table_not_exist = True
+            log.logs.append(ReadException(-1, "segment_table_not_exist", None))
+            return
+        yield from iter_segment_rows(frr.parse_financial_result_html(text, parser), log)
+        return
+
+    # 読み込み直す場合に備え、断片から読み取った行はファイル単位で保持する
+    fragment_log = ReadLog(ReadResult(), [])
+    rows = list(
+        iter_segment_rows(
+            frr.parse_financial_result_html(fragment, parser), fragment_log
+        )
+    )
+    if fragment_log.status.completed:
+        log.status, log.logs = fragment_log.status, fragment_log.logs
+        yield from rows
+        return
+
+    yield from iter_segment_rows(frr.parse_financial_result_html(text, parser), log)
+
+
+def _set_read_html_failed(log: ReadLog) -> None:
+    log.status.read_html_failed = True
+    log.logs.append(ReadException(-1, "read_html_failed", None))
+
+
+@profiled("html_to_dataframe")
+def html_to_dataframe(
+    html: "BeautifulSoup | frr.TableIndex",
+) -> tuple[Optional["pd.DataFrame"], ReadLog]:
+    log = ReadLog(ReadResult(), [])
+    data = {column: [] for column in DATAFRAME_COLUMNS}  # type: dict[str, list[Any]]
+    for period, segment, account, value in iter_segment_rows(html, log):
+        _append_row(data, period, segment, account, value)
+
+    if log.status.segment_table_not_exist:
+        return None, log
+    return _columns_to_dataframe(data), log
+
+
+@profiled("grids_to_dataframe")
+def grids_to_dataframe(
+    grids: list[frr.TableGrid],
+) -> tuple[Optional["pd.DataFrame"], ReadLog]:
+    """
+    セグメント報告のテーブルの行・セルから、HTMLを読み込まずにセグメント情報を読み取る
+
+    Parameters
+    ----------
+    grids : list[TableGrid]
+        `find_segment_tables` と同じ順に並べたテーブルの行・セル
+
+    Returns
+    -------
+    tuple[Optional[pd.DataFrame], ReadLog]
+        読み取ったデータと読み取りのログ
+    """
+
+    log = ReadLog(ReadResult(), [])
+    data = {column: [] for column in DATAFRAME_COLUMNS}  # type: dict[str, list[Any]]
+    for period, segment, account, value in iter_grid_rows(grids, log):
+        _append_row(data, period, segment, account, value)
+
+    if log.status.segment_table_not_exist:
+        return None, log
+    return _columns_to_dataframe(data), log
+
+
+def iter_segment_rows(
+    html: "BeautifulSoup | frr.TableIndex", log: ReadLog
+) -> Iterator[SegmentRow]:
+    # 同じ構文木から他の情報も読み取る場合は、テーブルの索引を共有する
+    index = html if isinstance(html, frr.TableIndex) else frr.TableIndex(html)
+    segment_tables = index.segment_tables
+    yield from _iter_table_rows(
+        len(segment_tables), ((t, index.grid(t)) for t in segment_tables), log
+    )
+
+
+def iter_grid_rows(grids: list[frr.TableGrid], log: ReadLog) -> Iterator[SegmentRow]:
+    """
+    構文木を作らずに取り出したセグメント報告のテーブルの行・セルから、値を読み取る
+
+    Parameters
+    ----------
+    grids : list[TableGrid]
+        `find_segment_tables` と同じ順に並べたテーブルの行・セル
+    log : ReadLog
+        読み取りのログ。失敗の記録はテーブル要素を持たず、テーブルの位置のみを記録する
+
+    Returns
+    -------
+    Iterator[SegmentRow]
+        期間・セグメント・勘定ごとの値
+    """
+
+    yield from _iter_table_rows(len(grids), ((None, g) for g in grids), log)
+
+
+def _iter_table_rows(
+    count: int,
+    tables: Iterable[tuple[Optional["Tag"], frr.TableGrid]],
+    log: ReadLog,
+) -> Iterator[SegmentRow]:
+    result = log.status
+    logs = log.logs
+
+    if count == 0:
         result.segment_table_not_exist = True
         logs.append(ReadException(-1, "segment_table_not_exist", None))
-        return None, ReadLog(result, logs)
-    elif len(segment_tables) < 2:
+        return
+    elif count < 2:
         result.too_little_segment_table = True
-    elif len(segment_tables) > 2:
+    elif count > 2:
         result.too_much_segment_tables = True
 
-    data = []
     number_of_completed_table = 0
     read_current = False
     read_previous = False
-    for i, table in enumerate(segment_tables):
-        period = frr.read_table_period(table)
+    # テーブルの行・セルと前方の<p>要素は一度だけ取り出し、以降の読み取りで共有する
+    for i, (table, grid) in enumerate(tables):
+        period = frr.read_table_period(grid)
         if not period.kind:
             result.period_not_found = True
-            logs.append(ReadException(i, "period_not_found", table))
+            logs.append(
+                ReadException(i, "period_not_found", table, position=grid.position)
+            )
 
-        segments = frr.read_table_segments(table)
+        segments = frr.read_table_segments(grid)
         if len(segments) == 0:
             result.segment_not_found = True
-            logs.append(ReadException(i, "segment_not_found", table))
+            logs.append(
+                ReadException(i, "segment_not_found", table, position=grid.position)
+            )
 
-        accounts = frr.read_table_sales_profit(table)
+        accounts = frr.read_table_sales_profit(grid)
         if len(accounts) != 2:
             result.account_not_found = True
-            logs.append(ReadException(i, "account_not_found", table))
+            logs.append(
+                ReadException(i, "account_not_found", table, position=grid.position)
+            )
 
         if (
             not result.period_not_found
             and not result.segment_not_found
             and not result.account_not_found
         ):
-            period_dict = {
-                f"period_{key}": value
-                for key, value in dataclasses.asdict(period).items()
-            }
-            _period = pd.Series(period_dict)
             for s in segments:
-                for a in accounts:
-                    _data = frr.read_segment_sales_profit(table, s, a)
-                    if _data.value is not None:
-                        data.append(pd.concat([_period, _data]))
+                values = frr.read_table_values(grid, s, accounts)
+                for a, value in zip(accounts, values):
+                    if value is not None:
+                        yield period, s, a, value
                     else:
                         result.value_read_failed = True
-                        logs.append(ReadException(i, "value_read_failed", table))
+                        logs.append(
+                            ReadException(
+                                i, "value_read_failed", table, position=grid.position
+                            )
+                        )
                         break
 
             if not result.value_read_failed:
@@ -107,6 +540,29 @@ def financial_result_to_dataframe(
 
     if number_of_completed_table == 2 and read_previous and read_current:
         result.completed = True
-        return pd.DataFrame(data), ReadLog(result, logs)
-    else:
-        return pd.DataFrame(data), ReadLog(result, logs)
+
+
+def _append_row(
+    data: dict[str, list[Any]],
+    period: frr.Period,
+    segment: frr.Segment,
+    account: frr.Account,
+    value: float,
+) -> None:
+    # 列はDATAFRAME_COLUMNSの順に並んでいる
+    row = period.astuple() + segment.astuple() + account.astuple() + (value,)
+    for column, v in zip(data.values(), row):
+        column.append(v)
+
+
+@profiled("assemble_dataframe")
+def _columns_to_dataframe(data: dict[str, list[Any]]) -> "pd.DataFrame":
+    import pandas as pd
+
+    df = pd.DataFrame(data)
+    for column in ["period_begin", "period_end"]:
+        df[column] = pd.to_datetime(df[column])
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].astype("category")
+    df["value"] = df["value"].astype(float)
+    return df
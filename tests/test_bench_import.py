@@ -0,0 +1,24 @@
+from benchmarks.bench_import import ENTRY_POINTS, measure_import, parse_importtime
+
+
+class TestBenchImport:
+    def test_parse_importtime(self) -> None:
+        stderr = "\n".join(
+            [
+                "import time: self [us] | cumulative | imported package",
+                "import time:       270 |        270 |   _io",
+                "import time:      1532 |       1802 | scripts.financial_result_reader",
+                "warning",
+            ]
+        )
+        assert parse_importtime(stderr) == {
+            "_io": 270,
+            "scripts.financial_result_reader": 1532,
+        }
+
+    def test_entry_points_are_lazy(self) -> None:
+        # エントリーポイントの読み込みだけでは、pandasやBeautiful Soupを読み込まない
+        for module in ENTRY_POINTS:
+            result = measure_import(module, repeat=1)
+            assert result["heavy_packages"] == [], module
+            assert result["modules"] > 0
@@ -0,0 +1,46 @@
+import os
+from pathlib import Path
+
+import scripts.financial_result_reader as frr
+from benchmarks.bench_pipeline import compare_with_baseline, synthesize_document
+
+DATA_DIR = Path(os.path.dirname(__file__)).joinpath("data/raw")
+
+
+class TestBenchPipeline:
+    def test_synthesize_document(self) -> None:
+        text = frr.load_financial_result_text(DATA_DIR.joinpath("sample1.htm"))
+        assert text is not None
+        html = frr.parse_financial_result_html(text)
+        tables = frr.find_segment_tables(html)
+        grid = frr.TableGrid.from_tag(tables[0])
+
+        scaled = frr.parse_financial_result_html(synthesize_document(text, 2, 2, 2))
+        scaled_tables = frr.find_segment_tables(scaled)
+        assert len(scaled_tables) == len(tables) * 2
+        scaled_grid = frr.TableGrid.from_tag(scaled_tables[0])
+        assert len(scaled_grid.rows) == len(grid.rows) * 2 - 1
+        assert len(scaled_grid.cells) > len(grid.cells) * 2
+
+    def test_compare_with_baseline(self) -> None:
+        baseline = {
+            "samples": {
+                "seconds_per_file": 0.1,
+                "peak_rss_mb": 100.0,
+                "files": {"a.htm": {"seconds": 0.1}, "b.htm": {"seconds": 0.1}},
+            }
+        }
+        results = {
+            "samples": {
+                "seconds_per_file": 0.11,
+                "peak_rss_mb": 150.0,
+                "files": {"a.htm": {"seconds": 0.2}, "b.htm": {"seconds": 0.101}},
+            },
+            "synthetic_x2": {"seconds_per_file": 1.0, "peak_rss_mb": 1.0, "files": {}},
+        }
+        regressions = compare_with_baseline(results, baseline, 0.2)
+        assert [r.split(":")[0] for r in regressions] == [
+            "samples/peak_rss_mb",
+            "samples/a.htm",
+        ]
+        assert compare_with_baseline(results, baseline, 1.0) == []
@@ -0,0 +1,124 @@
+import os
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+
+from scripts.financial_result_archive import (
+    ArchiveMember,
+    iter_bytes_members,
+    list_archive_members,
+    open_archive,
+)
+from scripts.financial_result_batch import (
+    list_financial_result_files,
+    read_financial_results,
+)
+from scripts.financial_result_cache import content_hash
+from scripts.financial_result_store import parse_security_code
+from scripts.financial_result_to_dataframe import financial_result_to_dataframe
+
+DATA_DIR = Path(os.path.dirname(__file__)).joinpath("data/raw")
+
+# TDnetから取得したファイルと同じ形式の名前
+MEMBERS = {
+    "20220712_3382_a.htm": "sample1.htm",
+    "20220714_9983_a.htm": "sample2.htm",
+    "2022/20220128_4684_a.htm": "sample3.htm",
+    "2022/20220128_7203_a.htm": "exceptions/period_not_exist.htm",
+}
+
+
+def make_archive(path: Path) -> Path:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("2022/", "")
+        archive.writestr("readme.txt", "x")
+        for name, sample in MEMBERS.items():
+            archive.write(DATA_DIR.joinpath(sample), name)
+    return path
+
+
+class TestArchiveMember:
+    def test_list_archive_members(self, tmp_path: Path) -> None:
+        path = make_archive(tmp_path.joinpath("tdnet.zip"))
+        members = list_archive_members(path)
+        assert [m.member for m in members] == sorted(MEMBERS)
+        assert members[0].name == "20220128_4684_a.htm"
+        assert str(members[0]) == f"{path}/2022/20220128_4684_a.htm"
+        assert ArchiveMember.from_path(str(members[0])) == members[0]
+        assert ArchiveMember.from_path(DATA_DIR.joinpath("sample1.htm")) is None
+        assert not ArchiveMember(path, "2022/xxxxx.htm").exists()
+
+    def test_read_member(self, tmp_path: Path) -> None:
+        path = make_archive(tmp_path.joinpath("tdnet.zip"))
+        for member in list_archive_members(path):
+            sample = DATA_DIR.joinpath(MEMBERS[member.member])
+            assert member.size == sample.stat().st_size
+            assert content_hash(member) == content_hash(sample)
+
+            df, log = financial_result_to_dataframe(member)
+            expected, expected_log = financial_result_to_dataframe(sample)
+            assert log.status == expected_log.status
+            assert log.source == str(member)
+            if expected is None:
+                assert df is None
+            else:
+                pd.testing.assert_frame_equal(df, expected)
+
+        # 読み取りに失敗したテーブルは、アーカイブ内のファイルから読み込み直せる
+        member = ArchiveMember(path, "2022/20220128_7203_a.htm")
+        _, log = financial_result_to_dataframe(member, compact=True)
+        assert log.status.period_not_found
+        assert log.logs[0].table() is not None
+
+    def test_shared_archive_handle(self, tmp_path: Path) -> None:
+        path = make_archive(tmp_path.joinpath("tdnet.zip"))
+        archive = open_archive(path)
+        for member in list_archive_members(path):
+            financial_result_to_dataframe(member, engine="events")
+        # 同じプロセスでは、アーカイブを開き直さない
+        assert open_archive(str(path)) is archive
+        assert archive.fp is not None
+
+    def test_bytes_members(self) -> None:
+        data = DATA_DIR.joinpath("sample1.htm").read_bytes()
+        member = next(iter_bytes_members([("20220712_3382_a.htm", data)]))
+        assert member.exists()
+        assert member.read_bytes() == data
+        assert parse_security_code(member) == "3382"
+
+        df, log = financial_result_to_dataframe(member)
+        assert log.status.completed
+        assert log.source == "20220712_3382_a.htm"
+        expected, _ = financial_result_to_dataframe(DATA_DIR.joinpath("sample1.htm"))
+        pd.testing.assert_frame_equal(df, expected)
+
+
+class TestArchiveBatch:
+    def test_list_financial_result_files(self, tmp_path: Path) -> None:
+        path = make_archive(tmp_path.joinpath("tdnet.zip"))
+        paths = list_financial_result_files([path, tmp_path])
+        assert len(paths) == len(MEMBERS) * 2
+        assert all(isinstance(p, ArchiveMember) for p in paths)
+        assert [parse_security_code(p) for p in paths[: len(MEMBERS)]] == [
+            "4684",
+            "7203",
+            "3382",
+            "9983",
+        ]
+
+    def test_read_financial_results(self, tmp_path: Path) -> None:
+        path = make_archive(tmp_path.joinpath("tdnet.zip"))
+        members = list_archive_members(path)
+        data, read_result_df = read_financial_results(members, 2)
+        samples = {str(DATA_DIR.joinpath(MEMBERS[m.member])): str(m) for m in members}
+        expected, expected_read_result_df = read_financial_results(samples, 2)
+        assert list(read_result_df.index) == sorted(samples.values())
+        assert read_result_df.sum().equals(expected_read_result_df.sum())
+        assert len(data) == len(expected)
+        assert set(data["path"]) == {samples[p] for p in expected["path"]}
+
+        # `(ファイル名, バイト列)` の組もワーカーで読み取れる
+        pairs = [(m.name, m.read_bytes()) for m in members]
+        _, read_result_df = read_financial_results(pairs, 2)
+        assert list(read_result_df.index) == sorted(m.name for m in members)
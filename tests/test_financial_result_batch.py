@@ -0,0 +1,189 @@
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import scripts.financial_result_batch as frb
+import scripts.financial_result_to_dataframe as frtd
+from scripts.financial_result_batch import (
+    iter_financial_results,
+    list_financial_result_files,
+    main,
+    read_financial_results,
+    run_journaled_batch,
+)
+from scripts.financial_result_journal import BatchJournal
+
+DATA_DIR = Path(os.path.dirname(__file__)).joinpath("data/raw")
+
+
+class TestFinancialResultBatch:
+    def test_list_financial_result_files(self) -> None:
+        paths = list_financial_result_files([DATA_DIR])
+        assert [p.name for p in paths] == [f"sample{i}.htm" for i in range(1, 8)]
+
+        paths = list_financial_result_files(
+            [DATA_DIR.joinpath("sample1.htm"), DATA_DIR]
+        )
+        assert len(paths) == 8
+
+    def test_iter_financial_results(self) -> None:
+        paths = list_financial_result_files([DATA_DIR])
+        results = {p.name: log for p, _, log in iter_financial_results(paths, 2)}
+        assert len(results) == len(paths)
+        assert results["sample1.htm"].status.completed
+        assert results["sample3.htm"].status.segment_table_not_exist
+
+    def test_iter_financial_results_sequential(self) -> None:
+        paths = [DATA_DIR.joinpath("exceptions/period_not_exist.htm")]
+        results = list(iter_financial_results(paths, 1))
+        assert len(results) == 1
+        _, _, log = results[0]
+        assert log.status.period_not_found
+        for ex in log.logs:
+            assert ex.html is not None
+
+    def test_iter_financial_results_error(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        original = frb.financial_result_to_dataframe
+
+        def financial_result_to_dataframe(path, *args, **kwargs):  # type: ignore
+            if path.name == "sample2.htm":
+                raise RuntimeError("unexpected")
+            return original(path, *args, **kwargs)
+
+        monkeypatch.setattr(
+            frb, "financial_result_to_dataframe", financial_result_to_dataframe
+        )
+        paths = [DATA_DIR.joinpath(f"sample{i}.htm") for i in range(1, 4)]
+        # 想定外のエラーが発生したファイルも、読み取りの失敗として結果に含める
+        results = {p.name: (df, log) for p, df, log in iter_financial_results(paths, 1)}
+        assert len(results) == len(paths)
+        df, log = results["sample2.htm"]
+        assert df is None
+        assert log.status.read_html_failed
+        assert log.logs[0].message == "RuntimeError: unexpected"
+
+        _, read_result_df = read_financial_results(paths, 1)
+        assert len(read_result_df) == len(paths)
+        assert read_result_df.loc[str(paths[1]), "read_html_failed"] == 1
+
+    def test_logs_are_picklable(self) -> None:
+        paths = [DATA_DIR.joinpath("exceptions/period_not_exist.htm")]
+        _, _, log = next(iter_financial_results(paths, 2))
+        assert log.status.period_not_found
+        assert len(log.logs) > 0
+        for ex in log.logs:
+            assert ex.read_result == "period_not_found"
+            assert ex.html is None
+
+    def test_read_financial_results(self) -> None:
+        paths = [DATA_DIR.joinpath(f"sample{i}.htm") for i in [1, 3, 7]]
+        data, read_result_df = read_financial_results(paths, 2)
+        assert len(read_result_df) == 3
+        assert read_result_df.loc[str(paths[0]), "completed"] == 1
+        assert read_result_df.loc[str(paths[1]), "segment_table_not_exist"] == 1
+        assert set(data["path"]) == {str(paths[0]), str(paths[2])}
+        assert data["value"].notna().all()
+
+    def test_main(self, tmp_path: Path) -> None:
+        main(
+            [
+                "run",
+                str(DATA_DIR.joinpath("sample1.htm")),
+                "-o",
+                str(tmp_path),
+                "-j",
+                "1",
+            ]
+        )
+        assert tmp_path.joinpath("segments.csv").exists()
+        assert tmp_path.joinpath("read_results.csv").exists()
+
+    def test_main_with_profile(self, tmp_path: Path) -> None:
+        main(
+            [
+                "run",
+                str(DATA_DIR.joinpath("sample1.htm")),
+                str(DATA_DIR.joinpath("sample2.htm")),
+                "-o",
+                str(tmp_path),
+                "-j",
+                "2",
+                "--profile",
+            ]
+        )
+        profile = json.loads(tmp_path.joinpath("profile.json").read_text())
+        assert profile["financial_result_to_dataframe"]["calls"] == 2
+        assert profile["read_table_period"]["calls"] == 4
+
+    def test_read_financial_results_with_cache(self, tmp_path: Path) -> None:
+        paths = [DATA_DIR.joinpath("sample1.htm"), DATA_DIR.joinpath("sample3.htm")]
+        data, read_result_df = read_financial_results(paths, 2, cache_dir=tmp_path)
+        cached_data, cached_read_result_df = read_financial_results(
+            paths, 2, cache_dir=tmp_path
+        )
+        pd.testing.assert_frame_equal(cached_data, data)
+        pd.testing.assert_frame_equal(cached_read_result_df, read_result_df)
+        assert len(list(tmp_path.joinpath("entries").glob("*/*.pkl"))) == 2
+
+    def test_journal_hash_once(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        def unexpected_content_hash(path: Path) -> None:
+            raise AssertionError("content_hash was called twice")
+
+        # ジャーナルに記録するハッシュ値をキャッシュでも使用し、ファイルを1回だけハッシュする
+        monkeypatch.setattr(frtd, "content_hash", unexpected_content_hash)
+        with BatchJournal(tmp_path.joinpath("journal.sqlite3")) as journal:
+            progress = run_journaled_batch(
+                [DATA_DIR.joinpath("sample1.htm")],
+                journal,
+                tmp_path.joinpath("output"),
+                1,
+                cache_dir=tmp_path.joinpath("cache"),
+            )
+            assert progress.failed == 0
+            entry = journal.latest()[str(DATA_DIR.joinpath("sample1.htm"))]
+            assert entry.read_result.completed
+            assert entry.signature is not None
+
+    def test_main_with_journal(self, tmp_path: Path) -> None:
+        paths = [str(DATA_DIR.joinpath(f"sample{i}.htm")) for i in range(1, 8)]
+        journal = str(tmp_path.joinpath("journal.sqlite3"))
+        main(["run", *paths[:3], "-o", str(tmp_path.joinpath("a")), "-j", "2"])
+        main(["run", *paths[:3], "-o", str(tmp_path), "-j", "2", "--journal", journal])
+        for name in ["segments.csv", "read_results.csv"]:
+            assert (
+                tmp_path.joinpath(name).read_text()
+                == tmp_path.joinpath("a", name).read_text()
+            )
+
+        # 記録済みのファイルは読み取らず、結果は記録済みの分と合わせて出力する
+        main(["run", *paths, "-o", str(tmp_path), "-j", "2", "--journal", journal])
+        main(["run", *paths, "-o", str(tmp_path.joinpath("b")), "-j", "2"])
+        with BatchJournal(journal) as j:
+            (count,) = j.connection.execute("SELECT COUNT(*) FROM journal").fetchone()
+            assert count == 7
+            counts = j.counts()
+        read_result_df = pd.read_csv(tmp_path.joinpath("read_results.csv"))
+        assert counts["completed"] == read_result_df["completed"].sum()
+        retried = read_result_df["segment_table_not_exist"].sum()
+        assert counts["segment_table_not_exist"] == retried > 0
+        for name in ["segments.csv", "read_results.csv"]:
+            assert (
+                tmp_path.joinpath(name).read_text()
+                == tmp_path.joinpath("b", name).read_text()
+            )
+
+        # 失敗理由を指定して読み取り直す
+        main(
+            ["run", *paths, "-o", str(tmp_path), "-j", "1", "--journal", journal]
+            + ["--retry", "segment_table_not_exist"]
+        )
+        with BatchJournal(journal) as j:
+            (count,) = j.connection.execute("SELECT COUNT(*) FROM journal").fetchone()
+            assert count == 7 + retried
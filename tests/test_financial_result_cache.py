@@ -0,0 +1,132 @@
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pytest
+
+import scripts.financial_result_cache as frc
+import scripts.financial_result_reader as frr
+import scripts.financial_result_to_dataframe as frtd
+from scripts.financial_result_cache import ResultCache, content_hash
+from scripts.financial_result_to_dataframe import financial_result_to_dataframe
+
+DATA_DIR = Path(os.path.dirname(__file__)).joinpath("data/raw")
+
+
+class TestResultCache:
+    def test_hash_once(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        hashed = []
+
+        def counting_content_hash(path: Path) -> Optional[str]:
+            hashed.append(path)
+            return content_hash(path)
+
+        def unexpected_content_hash(path: Path) -> Optional[str]:
+            raise AssertionError("content_hash was called by the cache")
+
+        monkeypatch.setattr(frtd, "content_hash", counting_content_hash)
+        monkeypatch.setattr(frc, "content_hash", unexpected_content_hash)
+        path = DATA_DIR.joinpath("sample1.htm")
+        cache = ResultCache(tmp_path.joinpath("cache"))
+        # キャッシュがない場合も、ファイルのハッシュ値の計算は1回のみ
+        financial_result_to_dataframe(path, cache=cache)
+        assert hashed == [path]
+        assert len(cache) == 1
+        assert financial_result_to_dataframe(path, cache=cache)[1].status.completed
+        assert hashed == [path, path]
+
+    def test_get_and_put(self, tmp_path: Path) -> None:
+        path = DATA_DIR.joinpath("exceptions/value_read_failed.htm")
+        cache = ResultCache(tmp_path.joinpath("cache"))
+        assert cache.get(path) is None
+
+        df, log = financial_result_to_dataframe(path)
+        cache.put(path, df, log)
+        assert len(cache) == 1
+
+        cached = cache.get(path)
+        assert cached is not None
+        cached_df, cached_log = cached
+        assert cached_df is not None and df is not None
+        pd.testing.assert_frame_equal(cached_df, df)
+        assert cached_log.status == log.status
+        assert [ex.read_result for ex in cached_log.logs] == [
+            ex.read_result for ex in log.logs
+        ]
+
+    def test_fingerprint(self, tmp_path: Path) -> None:
+        path = DATA_DIR.joinpath("exceptions/value_read_failed.htm")
+        df, log = financial_result_to_dataframe(path)
+        ResultCache(tmp_path, fingerprint="old").put(path, df, log)
+
+        cache = ResultCache(tmp_path)
+        assert cache.get(path) is None
+        assert cache.invalidate() == 1
+        assert len(cache) == 0
+
+    def test_invalidate(self, tmp_path: Path) -> None:
+        cache = ResultCache(tmp_path.joinpath("cache"))
+        for name in ["value_read_failed.htm", "period_not_exist.htm"]:
+            path = DATA_DIR.joinpath("exceptions", name)
+            cache.put(path, *financial_result_to_dataframe(path))
+        assert len(cache) == 2
+
+        assert (
+            cache.invalidate(DATA_DIR.joinpath("exceptions/period_not_exist.htm")) == 1
+        )
+        assert cache.get(DATA_DIR.joinpath("exceptions/period_not_exist.htm")) is None
+        assert (
+            cache.get(DATA_DIR.joinpath("exceptions/value_read_failed.htm")) is not None
+        )
+
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_evict(self, tmp_path: Path) -> None:
+        paths = [
+            DATA_DIR.joinpath("exceptions", name)
+            for name in ["value_read_failed.htm", "period_not_exist.htm"]
+        ]
+        cache = ResultCache(tmp_path.joinpath("cache"))
+        cache.put(paths[0], *financial_result_to_dataframe(paths[0]))
+        size = sum(
+            p.stat().st_size for p in tmp_path.joinpath("cache/entries").glob("*/*.pkl")
+        )
+
+        # 1件分の容量しかない場合、古い結果は削除される
+        cache.max_bytes = size
+        cache.put(paths[1], *financial_result_to_dataframe(paths[1]))
+        assert len(cache) == 1
+        assert cache.get(paths[0]) is None
+        assert cache.get(paths[1]) is not None
+
+    def test_financial_result_to_dataframe_with_cache(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        path = tmp_path.joinpath("sample.htm")
+        shutil.copy(DATA_DIR.joinpath("exceptions/account_not_found.htm"), path)
+        cache = ResultCache(tmp_path.joinpath("cache"))
+        _, log = financial_result_to_dataframe(path, cache=cache)
+        assert log.status.account_not_found
+        assert content_hash(path) is not None
+
+        def fail(*args: object, **kwargs: object) -> None:
+            raise AssertionError("should not be parsed")
+
+        # 内容が変わっていなければ、HTMLを読み込まずにキャッシュを使用する
+        monkeypatch.setattr(frr, "read_financial_result_html", fail)
+        _, cached_log = financial_result_to_dataframe(path, cache=cache)
+        assert cached_log.status == log.status
+
+        # 内容が変われば読み込み直す
+        path.write_bytes(path.read_bytes() + b"\n")
+        with pytest.raises(AssertionError):
+            financial_result_to_dataframe(path, cache=cache)
+
+    def test_read_html_failed_is_not_cached(self, tmp_path: Path) -> None:
+        cache = ResultCache(tmp_path)
+        _, log = financial_result_to_dataframe("xxxxx", cache=cache)
+        assert log.status.read_html_failed
+        assert len(cache) == 0
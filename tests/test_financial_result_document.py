@@ -0,0 +1,94 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from scripts.financial_result_document import (
+    EXTRACTORS,
+    FinancialResultDocument,
+    extract_financial_result,
+    register_extractor,
+)
+from scripts.financial_result_profile import profiling
+from scripts.financial_result_to_dataframe import financial_result_to_dataframe
+
+DATA_DIR = Path(os.path.dirname(__file__)).joinpath("data/raw")
+
+
+class TestFinancialResultDocument:
+    def test_read_html_failed(self) -> None:
+        assert FinancialResultDocument.read("xxxxx") is None
+        assert extract_financial_result("xxxxx") is None
+
+    def test_segments(self) -> None:
+        # セグメント情報の抽出器は、financial_result_to_dataframeと同じ結果を返す
+        for name in ["sample1.htm", "sample3.htm", "sample7.htm"]:
+            path = DATA_DIR.joinpath(name)
+            result = extract_financial_result(path, ["segments"])
+            assert result is not None
+            df, log = result["segments"]
+            expected, expected_log = financial_result_to_dataframe(path)
+            assert log.status == expected_log.status
+            assert log.source == str(path)
+            if expected is None:
+                assert df is None
+            else:
+                pd.testing.assert_frame_equal(df, expected)
+
+    def test_income_statement(self) -> None:
+        result = extract_financial_result(
+            DATA_DIR.joinpath("sample1.htm"), ["income_statement"]
+        )
+        assert result is not None
+        df = result["income_statement"].set_index(["account_kind", "period_kind"])
+        assert df.loc[("Sales", "current"), "account_name"] == "営業収益"
+        assert df.loc[("Sales", "previous"), "value"] == 1555371
+        assert df.loc[("OperatingProfit", "previous"), "value"] == 77512
+        assert df.loc[("OperatingProfit", "current"), "value"] == 102367
+        assert df.loc[("OrdinaryProfit", "current"), "value"] == 95519
+        assert df.loc[("NetProfit", "current"), "value"] == 65039
+        assert (df["account_unit"] == 1000000).all()
+
+        # 列の見出しに空のセルが並ぶテーブル
+        result = extract_financial_result(DATA_DIR.joinpath("sample7.htm"))
+        assert result is not None
+        df = result["income_statement"].set_index(["account_kind", "period_kind"])
+        assert df.loc[("Sales", "previous"), "value"] == 422151
+        name = df.loc[("NetProfit", "current"), "account_name"]
+        assert name == "親会社株主に帰属する当期純利益"
+        assert df.loc[("NetProfit", "current"), "value"] == 9206
+
+    def test_extractors_share_parse(self) -> None:
+        with profiling() as profile:
+            document = FinancialResultDocument.read(DATA_DIR.joinpath("sample1.htm"))
+            assert document is not None
+            result = document.extract()
+        assert set(result) == set(EXTRACTORS)
+        # 抽出器の数によらず、構文解析とセグメント報告のテーブルの検索は一度のみ
+        assert profile.stages["parse_financial_result_html"].calls == 1
+        assert profile.stages["find_segment_tables"].calls == 1
+
+        # 抽出器を再度実行しても、テーブルの行・セルは取り出し直さない
+        grids = profile.stages["build_table_grid"].calls
+        with profiling() as profile:
+            document.extract()
+        assert "build_table_grid" not in profile.stages
+        assert grids == len(document.index._grids)
+
+    def test_register_extractor(self) -> None:
+        @register_extractor("table_count")
+        def count_tables(document: FinancialResultDocument) -> int:
+            return len(document.index.tables)
+
+        try:
+            document = FinancialResultDocument.read(DATA_DIR.joinpath("sample1.htm"))
+            assert document is not None
+            result = document.extract(["table_count"])
+            assert result["table_count"] == len(document.html.find_all("table"))
+            with pytest.raises(ValueError):
+                register_extractor("table_count")(count_tables)
+            with pytest.raises(ValueError):
+                document.extract(["unknown"])
+        finally:
+            del EXTRACTORS["table_count"]
@@ -0,0 +1,104 @@
+import os
+import tracemalloc
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+import pytest
+
+import scripts.financial_result_reader as frr
+from scripts.financial_result_events import collect_segment_grids, read_segment_grids
+from scripts.financial_result_to_dataframe import financial_result_to_dataframe
+
+DATA_DIR = Path(os.path.dirname(__file__)).joinpath("data/raw")
+
+SEGMENT_TABLE = (
+    "<table><tr><td colspan='2'>報告セグメント</td></tr>"
+    "<tr><td>売上高</td><td>1,000</td></tr></table>"
+)
+
+
+def _expected_grids(text: str) -> list[frr.TableGrid]:
+    html = frr.parse_financial_result_html(text, "html.parser")
+    return [frr.TableGrid.from_tag(t) for t in frr.find_segment_tables(html)]
+
+
+class TestSegmentTableParser:
+    def test_same_grids_as_bs4(self) -> None:
+        for path in sorted(DATA_DIR.glob("**/*.htm")):
+            text = frr.load_financial_result_text(path)
+            assert text is not None
+            # テキストを分割して渡しても、Beautiful Soupの構文木から取り出した行・セルと一致する
+            chunks = [text[i : i + 5000] for i in range(0, len(text), 5000)]
+            assert collect_segment_grids(chunks) == _expected_grids(text), path
+
+    def test_malformed_markup(self) -> None:
+        texts = [
+            # 閉じられていない<td>・<p>要素や、開いていない要素の終了タグ
+            "<p>前期<p>(自 2021年3月1日 至 2021年5月31日)</span>"
+            "<table><tr><td colspan=2>報告セグメント<td>A</tr><tr><td>1</td></table></p>",
+            # 入れ子のテーブルと、コメント・<script>要素内のテキスト
+            "<table><tr><td><table><tr><td colspan='1'><!--報告セグメント--></td></tr>"
+            "</table></td><td><script>x</script>報告<br>セグメント</td></tr></table>",
+            # 文字参照と空白のみのテキスト
+            "<table><tr><td colspan>報告セグメント</td><td>A&amp;B &#150; &nbsp;\n"
+            "<span> </span>C&foo</td><td rowspan='2x'></td></tr></table>",
+            "<p>報告セグメント</p>" + SEGMENT_TABLE,
+        ]
+        for text in texts:
+            assert collect_segment_grids([text]) == _expected_grids(text), text
+
+    def test_memory_independent_of_document_size(self) -> None:
+        def document(filler: int) -> Iterator[str]:
+            yield "<html><body>"
+            for i in range(filler):
+                yield f"<p>段落{i}</p><table><tr><td>{i}</td></tr></table>\n"
+            yield SEGMENT_TABLE + "</body></html>"
+
+        peaks = []
+        for filler in [1000, 10000]:
+            tracemalloc.start()
+            grids = collect_segment_grids(document(filler))
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            assert len(grids) == 1
+            assert grids[0].paragraphs[0] == f"段落{filler - 1}"
+        # 文書が10倍になっても、保持するのは直近の<p>要素とセグメント報告のテーブルのみ
+        assert peaks[1] < peaks[0] * 2
+
+
+class TestEventsEngine:
+    def test_same_result_as_bs4(self) -> None:
+        for path in sorted(DATA_DIR.glob("**/*.htm")):
+            df, log = financial_result_to_dataframe(path, "html.parser")
+            events_df, events_log = financial_result_to_dataframe(path, engine="events")
+            assert events_log.status == log.status, path
+            assert events_log.encoding == log.encoding
+            assert [(e.index, e.read_result) for e in events_log.logs] == [
+                (e.index, e.read_result) for e in log.logs
+            ]
+            if df is None:
+                assert events_df is None
+            else:
+                pd.testing.assert_frame_equal(events_df, df)
+
+    def test_read_exception(self) -> None:
+        path = DATA_DIR.joinpath("exceptions/period_not_exist.htm")
+        _, log = financial_result_to_dataframe(path, engine="events")
+        assert log.status.period_not_found
+        ex = log.logs[0]
+        # 構文木がないため、テーブルの位置のみを記録し、テーブル要素は読み込み直して取得する
+        assert ex.html is None
+        table = ex.table()
+        assert table is not None
+        assert ex.position == (table.sourceline, table.sourcepos)
+
+    def test_read_html_failed(self) -> None:
+        assert read_segment_grids("xxxxx") is None
+        df, log = financial_result_to_dataframe("xxxxx", engine="events")
+        assert df is None
+        assert log.status.read_html_failed
+
+    def test_unsupported_engine(self) -> None:
+        with pytest.raises(ValueError):
+            financial_result_to_dataframe(DATA_DIR.joinpath("sample1.htm"), engine="x")
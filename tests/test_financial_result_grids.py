@@ -0,0 +1,117 @@
+import gzip
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from scripts.financial_result_batch import main, rerun_financial_results
+from scripts.financial_result_grids import (
+    GRID_SUFFIX,
+    extract_segment_grids,
+    load_segment_grids,
+    segment_grids_to_dataframe,
+    write_segment_grids,
+)
+from scripts.financial_result_profile import profiling
+from scripts.financial_result_to_dataframe import financial_result_to_dataframe
+
+DATA_DIR = Path(os.path.dirname(__file__)).joinpath("data/raw")
+
+
+class TestSegmentGrids:
+    def test_round_trip(self, tmp_path: Path) -> None:
+        for path in sorted(DATA_DIR.glob("**/*.htm")):
+            grids = extract_segment_grids(path)
+            assert grids is not None
+            assert grids.source == str(path)
+            output = tmp_path.joinpath(path.stem + GRID_SUFFIX)
+            write_segment_grids(grids, output)
+            # HTMLの全体ではなく、セグメント報告のテーブルのみを保存する
+            assert output.stat().st_size < 4096
+            assert load_segment_grids(output) == grids
+
+            # Beautiful Soupの構文木から取り出しても同じ行・セルになる
+            assert extract_segment_grids(path, "bs4", "html.parser") == grids
+
+    def test_same_result_as_html(self, tmp_path: Path) -> None:
+        for path in sorted(DATA_DIR.glob("**/*.htm")):
+            grids = extract_segment_grids(path)
+            assert grids is not None
+            output = tmp_path.joinpath(path.stem + GRID_SUFFIX)
+            write_segment_grids(grids, output)
+
+            with profiling() as profile:
+                df, log = segment_grids_to_dataframe(output)
+            # HTMLの読み込みと構文解析を行わない
+            assert "parse_financial_result_html" not in profile.stages
+            assert "read_segment_grids" not in profile.stages
+
+            expected, expected_log = financial_result_to_dataframe(path)
+            assert log.status == expected_log.status, path
+            assert log.encoding == expected_log.encoding
+            assert log.source == str(path)
+            assert [(e.index, e.read_result) for e in log.logs] == [
+                (e.index, e.read_result) for e in expected_log.logs
+            ]
+            if expected is None:
+                assert df is None
+            else:
+                pd.testing.assert_frame_equal(df, expected)
+
+        # 失敗したテーブルは、取り出し元のHTMLから読み込み直せる
+        output = tmp_path.joinpath("period_not_exist" + GRID_SUFFIX)
+        _, log = segment_grids_to_dataframe(output)
+        assert log.status.period_not_found
+        assert log.logs[0].table() is not None
+
+    def test_load_failed(self, tmp_path: Path) -> None:
+        assert load_segment_grids(tmp_path.joinpath("xxxxx" + GRID_SUFFIX)) is None
+        df, log = segment_grids_to_dataframe(tmp_path.joinpath("xxxxx" + GRID_SUFFIX))
+        assert df is None
+        assert log.status.read_html_failed
+
+        output = tmp_path.joinpath("old" + GRID_SUFFIX)
+        with gzip.open(output, "wt", encoding="utf-8") as w:
+            json.dump({"version": 0, "tables": []}, w)
+        with pytest.raises(ValueError):
+            load_segment_grids(output)
+
+    def test_unsupported_engine(self) -> None:
+        with pytest.raises(ValueError):
+            extract_segment_grids(DATA_DIR.joinpath("sample1.htm"), "x")
+
+
+class TestGridsBatch:
+    def test_dump_and_rerun(self, tmp_path: Path) -> None:
+        paths = [str(DATA_DIR.joinpath(f"sample{i}.htm")) for i in range(1, 8)]
+        main(["run", *paths, "-o", str(tmp_path.joinpath("run")), "-j", "2"])
+        dump = tmp_path.joinpath("grids")
+        main(["dump", *paths, "-o", str(dump), "-j", "2"])
+        assert len(list(dump.glob(f"*{GRID_SUFFIX}"))) == len(paths)
+
+        # 保存した行・セルから読み取り直した結果は、HTMLを読み取った結果と一致する
+        main(["rerun", str(dump), "-o", str(tmp_path.joinpath("rerun"))])
+        for name in ["segments.csv", "read_results.csv"]:
+            assert (
+                tmp_path.joinpath("rerun", name).read_text()
+                == tmp_path.joinpath("run", name).read_text()
+            )
+
+    def test_rerun_invalid_dumps(self, tmp_path: Path) -> None:
+        dump = tmp_path.joinpath("grids")
+        main(["dump", str(DATA_DIR.joinpath("sample1.htm")), "-o", str(dump)])
+        old = dump.joinpath("old" + GRID_SUFFIX)
+        with gzip.open(old, "wt", encoding="utf-8") as w:
+            json.dump({"version": 0, "tables": []}, w)
+        broken = dump.joinpath("broken" + GRID_SUFFIX)
+        broken.write_bytes(b"xxxxx")
+
+        # 読み込めないファイルがあっても中断せず、失敗として記録する
+        data, read_result_df = rerun_financial_results([dump])
+        assert len(data) > 0
+        assert len(read_result_df) == 3
+        assert read_result_df.loc[str(old), "read_html_failed"] == 1
+        assert read_result_df.loc[str(broken), "read_html_failed"] == 1
+        assert read_result_df.loc[str(DATA_DIR.joinpath("sample1.htm")), "completed"]
@@ -0,0 +1,125 @@
+import os
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import scripts.financial_result_journal as frj
+from scripts.financial_result_cache import content_hash
+from scripts.financial_result_journal import (
+    BatchJournal,
+    JournalEntry,
+    Progress,
+    file_signature,
+)
+from scripts.financial_result_to_dataframe import ReadFlag
+
+
+class TestBatchJournal:
+    def test_record_and_latest(self, tmp_path: Path) -> None:
+        with BatchJournal(tmp_path.joinpath("journal.sqlite3")) as journal:
+            journal.record(JournalEntry("a.htm", "x", int(ReadFlag.ACCOUNT_NOT_FOUND)))
+            journal.record(JournalEntry("a.htm", "x", int(ReadFlag.COMPLETED)))
+            journal.record(JournalEntry("b.htm", "y", 0, error="ValueError: b"))
+            assert len(journal) == 2
+
+        # 閉じた後も記録は残り、ファイルごとに最後の記録を結果とする
+        with BatchJournal(tmp_path.joinpath("journal.sqlite3")) as journal:
+            latest = journal.latest()
+            assert latest["a.htm"].read_result.completed
+            assert latest["a.htm"].reasons() == []
+            assert latest["b.htm"].reasons() == ["error"]
+            assert latest["b.htm"].recorded > 0
+            counts = journal.counts()
+            assert counts["completed"] == 1
+            assert counts["error"] == 1
+            assert counts["account_not_found"] == 0
+
+    def test_pending(self, tmp_path: Path) -> None:
+        paths = []
+        for name in ["a.htm", "b.htm", "c.htm"]:
+            path = tmp_path.joinpath(name)
+            path.write_text(name)
+            paths.append(path)
+        output = tmp_path.joinpath("a.csv")
+        output.write_text("")
+
+        journal = BatchJournal(tmp_path.joinpath("journal.sqlite3"))
+        for path, flags in zip(paths, [ReadFlag.COMPLETED, ReadFlag.ACCOUNT_NOT_FOUND]):
+            journal.record(
+                JournalEntry(str(path), content_hash(path), int(flags), str(output))
+            )
+        assert journal.pending(paths) == [paths[2]]
+        assert journal.pending(paths, ["account_not_found"]) == paths[1:]
+        assert journal.pending(paths, ["period_not_found"]) == [paths[2]]
+
+        # 内容が変わったファイルや、書き出した結果がないファイルは読み取り直す
+        paths[0].write_text("changed")
+        assert journal.pending(paths) == [paths[0], paths[2]]
+        output.unlink()
+        assert journal.pending(paths[1:]) == paths[1:]
+
+        with pytest.raises(ValueError):
+            journal.pending(paths, ["unknown"])
+        journal.close()
+
+    def test_pending_signature(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        path = tmp_path.joinpath("a.htm")
+        path.write_text("a")
+        journal = BatchJournal(tmp_path.joinpath("journal.sqlite3"))
+        journal.record(
+            JournalEntry(
+                str(path), content_hash(path), 0, signature=file_signature(path)
+            )
+        )
+
+        # サイズと更新日時が同じファイルは、内容をハッシュしない
+        def unexpected_content_hash(path: Path) -> None:
+            raise AssertionError("content_hash was called")
+
+        with monkeypatch.context() as m:
+            m.setattr(frj, "content_hash", unexpected_content_hash)
+            assert journal.pending([path]) == []
+
+        # 更新日時のみが変わったファイルは、ハッシュ値を比較して読み取り直さない
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert journal.pending([path]) == []
+        path.write_text("b")
+        assert journal.pending([path]) == [path]
+        journal.close()
+
+    def test_migrate(self, tmp_path: Path) -> None:
+        # ファイルの情報の列がない、以前のジャーナル
+        with sqlite3.connect(tmp_path.joinpath("journal.sqlite3")) as connection:
+            connection.execute(
+                "CREATE TABLE journal (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "path TEXT NOT NULL, content_hash TEXT, flags INTEGER NOT NULL, "
+                "output TEXT, rows INTEGER NOT NULL, error TEXT, "
+                "seconds REAL NOT NULL, recorded REAL NOT NULL)"
+            )
+            connection.execute(
+                "INSERT INTO journal (path, content_hash, flags, rows, seconds, "
+                "recorded) VALUES ('a.htm', 'x', 1, 0, 0.0, 0.0)"
+            )
+        connection.close()
+
+        with BatchJournal(tmp_path.joinpath("journal.sqlite3")) as journal:
+            assert journal.latest()["a.htm"].signature is None
+            journal.record(JournalEntry("b.htm", "y", 1, signature="file:1:2"))
+            assert journal.latest()["b.htm"].signature == "file:1:2"
+
+
+class TestProgress:
+    def test_format(self) -> None:
+        progress = Progress(4, skipped=2)
+        assert progress.remaining_seconds is None
+        progress.update(JournalEntry("a.htm", None, int(ReadFlag.COMPLETED)))
+        progress.update(JournalEntry("b.htm", None, int(ReadFlag.PERIOD_NOT_FOUND)))
+        assert progress.done == 2
+        assert progress.failed == 1
+        assert progress.files_per_second > 0
+        assert progress.format().startswith("2/4 files (50.0%), ")
+        assert progress.format().endswith("1 failed, 2 skipped")
@@ -0,0 +1,72 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Optional
+
+import pandas as pd
+import pytest
+
+import scripts.financial_result_pipeline as frp
+from scripts.financial_result_pipeline import iter_financial_results_async
+from scripts.financial_result_to_dataframe import ReadLog, financial_result_to_dataframe
+
+DATA_DIR = Path(os.path.dirname(__file__)).joinpath("data/raw")
+
+
+async def collect(paths: list[Path], **kwargs: Any) -> list[ReadLog]:
+    return [log async for log in iter_financial_results_async(paths, **kwargs)]
+
+
+class TestFinancialResultPipeline:
+    def test_iter_financial_results_async(self) -> None:
+        paths = [
+            DATA_DIR.joinpath("sample1.htm"),
+            DATA_DIR.joinpath("sample3.htm"),
+            DATA_DIR.joinpath("not_exist.htm"),
+        ]
+        written = {}
+
+        def sink(path: Path, df: Optional[pd.DataFrame], log: ReadLog) -> None:
+            written[path] = df
+
+        logs = asyncio.run(collect(paths, sink=sink, max_workers=2, queue_size=1))
+        sources = []
+        for log in logs:
+            assert log.source is not None
+            sources.append(log.source)
+        assert sorted(sources) == sorted(str(p) for p in paths)
+        assert set(written) == set(paths)
+
+        statuses = {Path(s).name: log.status for s, log in zip(sources, logs)}
+        assert statuses["sample1.htm"].completed
+        assert statuses["sample3.htm"].segment_table_not_exist
+        assert statuses["not_exist.htm"].read_html_failed
+
+        df, _ = financial_result_to_dataframe(paths[0])
+        pd.testing.assert_frame_equal(written[paths[0]], df)
+
+    def test_iter_financial_results_async_sink_error(self) -> None:
+        def sink(path: Path, df: Optional[pd.DataFrame], log: ReadLog) -> None:
+            raise OSError("disk full")
+
+        paths = [DATA_DIR.joinpath("sample1.htm")] * 3
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with pytest.raises(OSError, match="disk full"):
+                asyncio.run(collect(paths, sink=sink, executor=executor))
+
+    def test_iter_financial_results_async_extract_error(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        def extract(content: bytes, parser: Optional[str], partial: bool) -> Any:
+            raise RuntimeError("unexpected")
+
+        monkeypatch.setattr(frp, "_extract", extract)
+        paths = [DATA_DIR.joinpath("sample1.htm"), DATA_DIR.joinpath("sample2.htm")]
+        # 想定外のエラーが発生したファイルも、読み取りの失敗としてログを返す
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            logs = asyncio.run(collect(paths, executor=executor))
+        assert sorted(str(log.source) for log in logs) == sorted(map(str, paths))
+        for log in logs:
+            assert log.status.read_html_failed
+            assert log.logs[0].message == "RuntimeError: unexpected"
@@ -0,0 +1,68 @@
+import os
+from pathlib import Path
+
+from scripts.financial_result_profile import (
+    Profile,
+    active_profile,
+    profiled,
+    profiling,
+)
+from scripts.financial_result_to_dataframe import financial_result_to_dataframe
+
+DATA_DIR = Path(os.path.dirname(__file__)).joinpath("data/raw")
+
+
+@profiled("double", lambda x: x)
+def double(x: int) -> int:
+    return x * 2
+
+
+class TestFinancialResultProfile:
+    def test_profiled_when_disabled(self) -> None:
+        assert active_profile() is None
+        assert double(2) == 4
+        assert active_profile() is None
+
+    def test_profiled(self) -> None:
+        with profiling() as profile:
+            assert active_profile() is profile
+            double(2)
+            double(3)
+        assert active_profile() is None
+        assert profile.stages["double"].calls == 2
+        assert profile.stages["double"].bytes == 5
+        assert profile.stages["double"].seconds >= 0
+
+    def test_profiling_nested(self) -> None:
+        with profiling() as outer:
+            double(1)
+            with profiling() as inner:
+                double(1)
+        assert inner.stages["double"].calls == 1
+        assert outer.stages["double"].calls == 2
+
+    def test_to_json(self) -> None:
+        profile = Profile()
+        profile.add("read", 0.5, 100)
+        profile.add("read", 0.25, 50)
+        other = Profile.from_dict(profile.to_dict())
+        other.merge(profile)
+        assert other.stages["read"].calls == 4
+        assert other.stages["read"].bytes == 300
+        assert Profile().to_json() == "{}"
+        assert "read" in profile.report()
+
+    def test_financial_result_to_dataframe(self) -> None:
+        path = DATA_DIR.joinpath("sample1.htm")
+        _, log = financial_result_to_dataframe(path)
+        assert log.profile is None
+
+        with profiling() as profile:
+            _, log = financial_result_to_dataframe(path)
+        assert log.profile is not None
+        stages = log.profile.stages
+        assert stages["financial_result_to_dataframe"].bytes == os.path.getsize(path)
+        assert stages["iter_normalized_text"].bytes == os.path.getsize(path)
+        assert stages["find_segment_tables"].calls == 1
+        assert stages["read_table_period"].calls == 2
+        assert profile.to_dict() == log.profile.to_dict()
@@ -1,5 +1,11 @@
+import codecs
+import dataclasses
+import io
 import os
+import unicodedata
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Optional
 
 import numpy as np
 import pytest
@@ -19,6 +25,21 @@ def htmls() -> dict[str, BeautifulSoup]:
     return htmls
 
 
+def read_all(html: BeautifulSoup) -> list[Any]:
+    results = []  # type: list[Any]
+    for table in frr.find_segment_tables(html):
+        period = frr.read_table_period(table)
+        segments = frr.read_table_segments(table)
+        accounts = frr.read_table_sales_profit(table)
+        values = [
+            frr.read_segment_sales_profit(table, s, a).value
+            for s in segments
+            for a in accounts
+        ]
+        results.append((period, segments, accounts, values))
+    return results
+
+
 class TestFinancialResultReader:
     def test_read_financial_result_html_from_str(self) -> None:
         path = os.path.join(os.path.dirname(__file__), "data/raw/sample1.htm")
@@ -30,11 +51,253 @@ class TestFinancialResultReader:
         html = frr.read_financial_result_html(path)
         assert html is not None
 
+    def test_read_financial_result_html_from_stream(self) -> None:
+        path = os.path.join(os.path.dirname(__file__), "data/raw/sample1.htm")
+        with open(path, "rb") as r:
+            html = frr.read_financial_result_html(io.BytesIO(r.read()))
+        assert html == frr.read_financial_result_html(path)
+
     def test_read_financial_result_html_when_none(self) -> None:
         path = Path(os.path.dirname(__file__)).joinpath("xxxxx")
         html = frr.read_financial_result_html(path)
         assert html is None
 
+    def test_read_financial_result_html_parser_from_env(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        path = os.path.join(os.path.dirname(__file__), "data/raw/sample1.htm")
+        monkeypatch.setenv(frr.HTML_PARSER_ENV, "xxxxx")
+        with pytest.raises(ValueError):
+            frr.read_financial_result_html(path)
+        with pytest.raises(ValueError):
+            frr.read_financial_result_html(path, "xxxxx")
+
+    @pytest.mark.parametrize("parser", ["lxml", "html5lib"])
+    def test_read_financial_result_html_parsers(self, parser: str) -> None:
+        data_dir = os.path.join(os.path.dirname(__file__), "data/raw")
+        for path in Path(data_dir).glob("**/*.htm"):
+            expected = frr.read_financial_result_html(path, "html.parser")
+            html = frr.read_financial_result_html(path, parser)
+            assert expected is not None and html is not None
+            assert read_all(html) == read_all(expected), path.name
+
+    def test_iter_normalized_text(self) -> None:
+        text = "ＡＢＣ\r\n報告セグメント\r１２,３４５\n(単位:百万円)"
+        data = io.BytesIO(text.encode("utf-8"))
+        chunks = list(frr.iter_normalized_text(data, chunk_size=5))
+        assert len(chunks) > 1
+        assert "".join(chunks) == "ABC\n報告セグメント\n12,345\n(単位:百万円)"
+
+    @pytest.mark.parametrize(
+        "head, expected",
+        [
+            (codecs.BOM_UTF8 + b'<meta charset="Shift_JIS">', "utf-8-sig"),
+            (codecs.BOM_UTF16_LE + "<html>".encode("utf-16-le"), "utf-16"),
+            (b'<meta charset="Shift_JIS">', "cp932"),
+            (
+                b"<META HTTP-EQUIV='Content-Type' CONTENT='text/html; charset=x-sjis'>",
+                "cp932",
+            ),
+            (b'<meta content="text/html; charset=EUC-JP" />', "euc_jis_2004"),
+            (b'<?xml version="1.0" encoding="euc-jp"?><html>', "euc_jis_2004"),
+            (b'<?xml encoding="utf-8"?><meta charset="windows-31j">', "cp932"),
+            (b'<meta charset="utf-16">', "utf-8"),
+            (b'<meta charset="unknown">' + "報告".encode("cp932"), "cp932"),
+            (b"<html>" + "報告".encode("utf-8")[:-1], "utf-8"),
+            (b"<html>", "utf-8"),
+        ],
+    )
+    def test_detect_encoding(self, head: bytes, expected: str) -> None:
+        assert frr.detect_encoding(head) == expected
+
+    def test_read_financial_result_text_encodings(self) -> None:
+        data_dir = Path(os.path.dirname(__file__)).joinpath("data/raw/encodings")
+        expected = frr.load_financial_result_text(data_dir.joinpath("sample1_utf8.htm"))
+        assert expected is not None and not expected.startswith("\ufeff")
+        for name, encoding in [
+            ("sample1_shift_jis.htm", "cp932"),
+            ("sample1_euc_jp.htm", "euc_jis_2004"),
+            ("sample1_cp932_no_meta.htm", "cp932"),
+        ]:
+            loaded = frr.read_financial_result_text(data_dir.joinpath(name))
+            assert loaded is not None
+            text, detected = loaded
+            assert detected == encoding, name
+            # 文字コードの宣言以外は、UTF-8のファイルと同じテキストになる
+            assert frr.extract_segment_fragments(text) == frr.extract_segment_fragments(
+                expected
+            ), name
+
+            html = frr.read_financial_result_html(data_dir.joinpath(name))
+            assert html is not None
+            assert html.original_encoding == encoding
+
+    def test_decode_normalized_text_reads_once(self) -> None:
+        class CountingStream(io.BytesIO):
+            count = 0
+
+            def read(self, size: Optional[int] = -1) -> bytes:
+                data = super().read(size)
+                self.count += len(data)
+                return data
+
+        # 宣言がなく、先頭がASCIIのみの場合も、読み込んだバイト列を再利用する
+        content = b"<html>" + b" " * 10000 + "報告セグメント".encode("cp932")
+        stream = CountingStream(content)
+        encoding, chunks = frr.decode_normalized_text(stream, chunk_size=1000)
+        assert encoding == "cp932"
+        assert "".join(chunks).endswith("報告セグメント")
+        assert stream.count == len(content)
+
+    def test_iter_normalized_text_without_newlines(self) -> None:
+        # 改行のないファイルも、正規化したテキストを1回で返す
+        text = "<p>ＡＢＣ１２３</p>" * 2000
+        stream = io.BytesIO(text.encode("utf-8"))
+        chunks = list(frr.iter_normalized_text(stream, "utf-8", chunk_size=100))
+        assert chunks == [unicodedata.normalize("NFKC", text)]
+
+        # 行の区切りまでを返し、残りは次のチャンクに含める
+        stream = io.BytesIO(("ａ" * 50 + "\r\n" + "ｂ" * 50).encode("utf-8"))
+        chunks = list(frr.iter_normalized_text(stream, "utf-8", chunk_size=16))
+        assert chunks == ["a" * 50 + "\n", "b" * 50]
+
+    @pytest.mark.parametrize("parser", ["html.parser", "lxml"])
+    def test_read_financial_result_html_streaming(self, parser: str) -> None:
+        data_dir = os.path.join(os.path.dirname(__file__), "data/raw")
+        for path in Path(data_dir).glob("*.htm"):
+            text = frr.load_financial_result_text(path)
+            assert text is not None
+            expected = frr.parse_financial_result_html(text, parser)
+            with path.open("rb") as r:
+                _, chunks = frr.decode_normalized_text(r, chunk_size=4096)
+                html = frr.parse_financial_result_html(chunks, parser)
+            assert str(html) == str(expected), path.name
+
+    def test_find_segment_fragments(self) -> None:
+        text = (
+            "<html><body><p>a</p><p>b</p><p>c</p><p>d</p>"
+            "<table><tr><td>x</td></tr></table>"
+            "<table><tr><td><table><tr><td>y</td></tr></table></td></tr>"
+            "<tr><td colspan='2'>報告セグメント</td></tr></table>"
+            "<p>e</p></body></html>"
+        )
+        fragments = frr.find_segment_fragments(text)
+        assert len(fragments) == 1
+        begin, end = fragments[0]
+        assert text[begin:end].startswith("<p>b</p>")
+        assert text[begin:end].endswith("報告セグメント</td></tr></table>")
+        assert frr.find_segment_fragments("<table></table>") == []
+
+    def test_read_financial_result_html_partial(self) -> None:
+        data_dir = os.path.join(os.path.dirname(__file__), "data/raw")
+        for path in Path(data_dir).glob("**/*.htm"):
+            expected = frr.read_financial_result_html(path)
+            html = frr.read_financial_result_html(path, partial=True)
+            assert expected is not None and html is not None
+            assert read_all(html) == read_all(expected), path.name
+
+    def test_table_grid(self) -> None:
+        html = BeautifulSoup(
+            "<table>"
+            "<tr><td rowspan='2'> A </td><td colspan='2'>報告セグメント</td><td>C</td></tr>"
+            "<tr><td>x 1</td><td>y</td><td>z</td></tr>"
+            "<tr><th>t</th></tr>"
+            "<tr><td>1,234</td></tr>"
+            "</table>",
+            features="html.parser",
+        )
+        table = html.find("table")
+        assert isinstance(table, Tag)
+        grid = frr.TableGrid.from_tag(table)
+
+        assert len(grid.rows) == 4
+        assert [c.text for c in grid.row_cells(1)] == ["x 1", "y", "z"]
+        assert [c.compact for c in grid.row_cells(1)] == ["x1", "y", "z"]
+        assert [c.text for c in grid.merged_cells()] == ["報告セグメント"]
+        assert grid.merged_cells()[0].row == 0
+        assert grid.merged_cells()[0].next_row == 1
+        # 行にセルがない場合、後続の行の最初のセルを返す
+        first_cell = grid.first_cell(2)
+        assert first_cell is not None and first_cell.text == "1,234"
+
+        assert [grid.cell_at(0, c).text for c in range(4)] == [  # type: ignore
+            "A",
+            "報告セグメント",
+            "報告セグメント",
+            "C",
+        ]
+        assert [grid.cell_at(1, c).text for c in range(4)] == [  # type: ignore
+            "A",
+            "x 1",
+            "y",
+            "z",
+        ]
+        assert grid.cell_at(5, 0) is None
+
+    def test_records(self) -> None:
+        account = frr.Account(1, 7, "Profit", "セグメント利益", 1000)
+        assert account.astuple() == (1, 7, "Profit", "セグメント利益", 1000)
+        assert account.asdict() == dataclasses.asdict(account)
+        assert not hasattr(account, "__dict__")
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            account.unit = 1  # type: ignore[misc]
+
+    def test_segment_extractor(self) -> None:
+        html = frr.parse_financial_result_html(
+            "<p>Ⅰ 前中間連結会計期間(自 2021年4月1日 至 2021年9月30日)</p>"
+            "<table><tr><td colspan='3'>(単位:円)</td></tr>"
+            "<tr><td></td><td colspan='2'>報告セグメント</td></tr>"
+            "<tr><td></td><td>A事業</td><td>B事業</td></tr>"
+            "<tr><td>売上高</td><td>1</td><td>2</td></tr>"
+            "<tr><td>セグメント利益</td><td>3</td><td>4</td></tr></table>"
+        )
+        table = html.find("table")
+        assert isinstance(table, Tag)
+        grid = frr.TableGrid.from_tag(table)
+        assert frr.read_table_period(grid).kind == "previous"
+        assert frr.read_table_sales_profit(grid)[0].unit == 1000000
+
+        extractor = frr.SegmentExtractor(
+            frr.ExtractorConfig.from_dict(
+                {"previous_texts": ["前中間"], "units": {"円": 1}}
+            )
+        )
+        period = extractor.read_table_period(grid)
+        assert period.kind == "previous"
+        assert period.begin == datetime(2021, 4, 1)
+        assert period.end == datetime(2021, 9, 30)
+        assert extractor.read_table_sales_profit(grid)[0].unit == 1
+        assert [s.name for s in extractor.read_table_segments(grid)] == [
+            "A事業",
+            "B事業",
+        ]
+
+        extractor.read_table_period(grid)
+        assert extractor.parse_date.cache_info().hits == 2
+
+    def test_read_table_values(self) -> None:
+        html = BeautifulSoup(
+            "<table>"
+            "<tr><td>売上高</td><td>1,234</td><td>△5</td></tr>"
+            "<tr><td>営業利益</td><td>※1</td></tr>"
+            "<tr><td>経常利益</td></tr>"
+            "</table>",
+            features="html.parser",
+        )
+        table = html.find("table")
+        assert isinstance(table, Tag)
+        accounts = [frr.Account(order=i, position=i) for i in range(3)]
+
+        first = frr.read_table_values(table, frr.Segment(position=1), accounts)
+        # 読み取れないセルで打ち切り、セルのない以降の行は読まない
+        assert first == [1234.0, None]
+        with pytest.raises(IndexError):
+            frr.read_table_values(table, frr.Segment(position=2), accounts)
+
+    def test_parse_values(self) -> None:
+        values = frr.parse_values(["1,234", "△56", "-", "", "12.5", "※1", "1_000"])
+        assert values == [1234.0, -56.0, None, None, 12.5, None, 1000.0]
+
     def test_find_segment_tables(self, htmls: dict[str, BeautifulSoup]) -> None:
         for name in htmls:
             segment_tables = frr.find_segment_tables(htmls[name])
@@ -49,12 +312,34 @@ class TestFinancialResultReader:
             else:
                 assert len(segment_tables) > 0
 
+    def test_find_segment_tables_nested(self) -> None:
+        html = frr.parse_financial_result_html(
+            "<table><tr><td colspan='2'>報告セグメント</td></tr>"
+            "<tr><td><table><tr><td colspan='2'>報告セグメント</td></tr></table></td></tr>"
+            "</table><table><tr><td>報告セグメント</td></tr></table>"
+            "<table><tr><td colspan='2'>報告セグメント</td></tr></table>"
+        )
+        tables = html.find_all("table")
+        segment_tables = frr.find_segment_tables(html)
+        assert segment_tables == [tables[0], tables[1], tables[3]]
+        assert segment_tables[0] is tables[0]
+
+    def test_find_period_paragraphs(self) -> None:
+        html = frr.parse_financial_result_html(
+            "<p>1</p><p>2</p><p> 3 </p><p>4</p><table><tr><td>a</td></tr></table>"
+        )
+        table = html.find("table")
+        assert isinstance(table, Tag)
+        assert frr.find_period_paragraphs(table) == ["4", "3", "2"]
+        assert frr.TableGrid.from_tag(table).paragraphs == ["4", "3", "2"]
+
     def test_read_table_period(self, htmls: dict[str, BeautifulSoup]) -> None:
         for name in htmls:
             segment_tables = frr.find_segment_tables(htmls[name])
             for i, t in enumerate(segment_tables):
                 period = frr.read_table_period(t)
                 assert period.kind is not None
+                assert frr.read_table_period(frr.TableGrid.from_tag(t)) == period
 
                 if name == "sample1.htm":
                     if i == 0:
@@ -172,3 +457,12 @@ class TestFinancialResultReader:
                 assert data.segment_name == "eコマース事業"
                 assert data.account_name == "売上高"
                 assert data.value == 418698.0
+
+            values = frr.read_table_values(tables[name], segments[0], accounts)
+            assert len(values) == len(accounts)
+            assert (
+                values[0]
+                == frr.read_segment_sales_profit(
+                    tables[name], segments[0], accounts[0]
+                ).value
+            )
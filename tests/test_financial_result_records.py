@@ -0,0 +1,82 @@
+import csv
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from scripts.financial_result_records import (
+    RECORD_COLUMNS,
+    CsvRecordSink,
+    ParquetRecordSink,
+    RecordSink,
+    iter_financial_result_records,
+)
+from scripts.financial_result_to_dataframe import (
+    DATAFRAME_COLUMNS,
+    ReadLog,
+    financial_result_to_dataframe,
+)
+
+DATA_DIR = Path(os.path.dirname(__file__)).joinpath("data/raw")
+PATHS = [DATA_DIR.joinpath(f"sample{i}.htm") for i in range(1, 8)]
+
+
+class TestFinancialResultRecords:
+    @pytest.mark.parametrize("partial", [False, True])
+    def test_iter_financial_result_records(self, partial: bool) -> None:
+        logs: list[ReadLog] = []
+        records = list(iter_financial_result_records(PATHS, partial=partial, logs=logs))
+        assert [log.source for log in logs] == [str(p) for p in PATHS]
+        for path, log in zip(PATHS, logs):
+            df, expected = financial_result_to_dataframe(path, partial=partial)
+            assert log.status == expected.status
+            values = [r[1:] for r in records if r.source == str(path)]
+            if df is None:
+                assert values == []
+                continue
+            df = df.astype({"segment_name": str, "account_name": str})
+            rows = [
+                tuple(None if pd.isna(v) else v for v in row)
+                for row in df[DATAFRAME_COLUMNS].itertuples(index=False)
+            ]
+            assert values == rows
+
+    def test_iter_financial_result_records_is_lazy(self) -> None:
+        logs: list[ReadLog] = []
+        records = iter_financial_result_records(PATHS, logs=logs)
+        next(records)
+        assert logs == []
+
+    def test_record_sink_is_abstract(self, tmp_path: Path) -> None:
+        class IncompleteSink(RecordSink):
+            pass
+
+        # `_write_chunk` を実装していないシンクは、書き込む前に作成できない
+        with pytest.raises(TypeError):
+            IncompleteSink(tmp_path.joinpath("segments.txt"))  # type: ignore[abstract]
+
+    def test_csv_record_sink(self, tmp_path: Path) -> None:
+        output = tmp_path.joinpath("segments.csv")
+        records = list(iter_financial_result_records(PATHS[:2]))
+        with CsvRecordSink(output, chunk_size=7) as sink:
+            assert sink.write_all(records) == len(records)
+            assert sink.count == len(records) - len(records) % 7
+        assert sink.count == len(records)
+
+        with output.open(encoding="utf-8") as r:
+            rows = list(csv.reader(r))
+        assert rows[0] == RECORD_COLUMNS
+        assert len(rows) == len(records) + 1
+        assert rows[1][-1] == str(records[0].value)
+
+    def test_parquet_record_sink(self, tmp_path: Path) -> None:
+        output = tmp_path.joinpath("segments.parquet")
+        records = list(iter_financial_result_records(PATHS[:2]))
+        with ParquetRecordSink(output, chunk_size=7) as sink:
+            sink.write_all(records)
+
+        df = pd.read_parquet(output)
+        assert list(df.columns) == RECORD_COLUMNS
+        assert len(df) == len(records)
+        assert df["value"].tolist() == [r.value for r in records]
@@ -0,0 +1,115 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from scripts.financial_result_batch import list_financial_result_files, main
+from scripts.financial_result_shard import merge_shards, parse_shard, select_shard
+
+DATA_DIR = Path(os.path.dirname(__file__)).joinpath("data/raw")
+ROOT_DIR = Path(os.path.dirname(__file__)).parent
+
+
+def run_batch(*args: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, "-m", "scripts.financial_result_batch", *args],
+        cwd=ROOT_DIR,
+        env=dict(os.environ, PYTHONPATH=str(ROOT_DIR)),
+        capture_output=True,
+        text=True,
+    )
+
+
+class TestShard:
+    def test_parse_shard(self) -> None:
+        assert parse_shard("0/4") == (0, 4)
+        assert parse_shard(" 3/4") == (3, 4)
+        for text in ["4/4", "1/0", "-1/4", "1", "a/b"]:
+            with pytest.raises(ValueError):
+                parse_shard(text)
+
+    def test_select_shard(self) -> None:
+        paths = list_financial_result_files([DATA_DIR, DATA_DIR.joinpath("exceptions")])
+        shards = [select_shard(paths, i, 3) for i in range(3)]
+        selected = [p for files, _ in shards for p in files]
+        # すべてのファイルがいずれか1つのシャードに含まれる
+        assert sorted(map(str, selected)) == sorted(map(str, paths))
+        assert len({manifest.inputs for _, manifest in shards}) == 1
+
+        # 入力の順序によらず、同じ分割になる
+        reversed_shards = [select_shard(reversed(paths), i, 3) for i in range(3)]
+        assert [files for files, _ in reversed_shards] == [files for files, _ in shards]
+
+        with pytest.raises(ValueError):
+            select_shard(paths, 3, 3)
+
+    def test_select_shard_stable(self, tmp_path: Path) -> None:
+        paths = list_financial_result_files([DATA_DIR])
+        added = tmp_path.joinpath("added.htm")
+        added.write_text("<html></html>", encoding="utf-8")
+        # ファイルを追加しても、他のファイルを担当するシャードは変わらない
+        for i in range(3):
+            files, manifest = select_shard(paths, i, 3)
+            added_files, added_manifest = select_shard(paths + [added], i, 3)
+            assert [p for p in added_files if p != added] == files
+            assert added_manifest.inputs != manifest.inputs
+
+    def test_shards_in_processes(self, tmp_path: Path) -> None:
+        inputs = [str(DATA_DIR), str(DATA_DIR.joinpath("exceptions"))]
+        main(["run", *inputs, "-o", str(tmp_path.joinpath("all")), "-j", "2"])
+
+        # 別々のマシンと同様に、シャードごとに別のプロセスで実行する
+        shards = [str(tmp_path.joinpath(f"shard{i}")) for i in range(3)]
+        processes = [
+            subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "scripts.financial_result_batch",
+                    "run",
+                    *inputs,
+                    "-o",
+                    shard,
+                    "-j",
+                    "1",
+                    "--shard",
+                    f"{i}/3",
+                ],
+                cwd=ROOT_DIR,
+                env=dict(os.environ, PYTHONPATH=str(ROOT_DIR)),
+            )
+            for i, shard in enumerate(shards)
+        ]
+        assert [p.wait() for p in processes] == [0, 0, 0]
+
+        completed = run_batch("merge", *shards, "-o", str(tmp_path.joinpath("merged")))
+        assert completed.returncode == 0, completed.stderr
+        for name in ["segments.csv", "read_results.csv"]:
+            assert (
+                tmp_path.joinpath("merged", name).read_text()
+                == tmp_path.joinpath("all", name).read_text()
+            )
+
+        # シャードの欠落・重複は結合時にエラーとする
+        completed = run_batch("merge", *shards[:2], "-o", str(tmp_path.joinpath("x")))
+        assert completed.returncode != 0
+        assert "Missing shards: [2]" in completed.stderr
+        completed = run_batch(
+            "merge", *shards, shards[0], "-o", str(tmp_path.joinpath("x"))
+        )
+        assert completed.returncode != 0
+        assert "Duplicated shards: [0]" in completed.stderr
+
+    def test_merge_different_inputs(self, tmp_path: Path) -> None:
+        shards = []
+        for i, name in enumerate(["sample1.htm", "sample2.htm"]):
+            shard = tmp_path.joinpath(f"shard{i}")
+            path = str(DATA_DIR.joinpath(name))
+            main(["run", path, "-o", str(shard), "-j", "1", "--shard", f"{i}/2"])
+            shards.append(shard)
+        with pytest.raises(ValueError, match="different input sets"):
+            merge_shards(shards, tmp_path.joinpath("merged"))
+        with pytest.raises(ValueError, match="not found"):
+            merge_shards([tmp_path], tmp_path.joinpath("merged"))
@@ -0,0 +1,93 @@
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from scripts.financial_result_store import (
+    KEY_COLUMNS,
+    STORE_COLUMNS,
+    SegmentStore,
+    parse_filing_time,
+    parse_security_code,
+)
+from scripts.financial_result_to_dataframe import financial_result_to_dataframe
+
+DATA_DIR = Path(os.path.dirname(__file__)).joinpath("data/raw")
+
+
+def copy_sample(name: str, output: Path) -> Path:
+    output.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy(DATA_DIR.joinpath(name), output)
+    return output
+
+
+class TestFinancialResultStore:
+    def test_parse_security_code(self) -> None:
+        assert parse_security_code("data/20220712_3382_決算短信.htm") == "3382"
+        assert parse_security_code(Path("20220712_130A_x.htm")) == "130A"
+        assert parse_security_code("sample1.htm") is None
+
+    def test_parse_filing_time(self) -> None:
+        assert parse_filing_time("data/202207121500_3382_a.htm") == "202207121500"
+        assert parse_filing_time(Path("sample1.htm")) == ""
+
+    def test_ingest_and_query(self, tmp_path: Path) -> None:
+        paths = [
+            copy_sample("sample1.htm", tmp_path.joinpath("html/20220712_3382_a.htm")),
+            copy_sample("sample2.htm", tmp_path.joinpath("html/20220714_9983_a.htm")),
+            copy_sample("sample3.htm", tmp_path.joinpath("html/20220128_4684_a.htm")),
+            copy_sample("sample4.htm", tmp_path.joinpath("html/sample4.htm")),
+        ]
+        store = SegmentStore(tmp_path.joinpath("store"))
+        logs = store.ingest(paths)
+        assert len(logs) == 3
+        assert store.security_codes() == ["3382", "9983"]
+        assert store.catalog.loc["3382", "rows"] == 24
+
+        df = store.query(["3382"], start="2022-01-01")
+        assert list(df.columns) == STORE_COLUMNS
+        assert len(df) == 12
+        assert (df["period_end"] >= pd.Timestamp("2022-01-01")).all()
+        assert (df["source"] == str(paths[0])).all()
+
+        sales = store.query(account_kind="Sales", end="2021-12-31")
+        assert set(sales["security_code"]) == {"3382", "9983"}
+        assert (sales["account_kind"] == "Sales").all()
+        assert (sales["period_end"] <= pd.Timestamp("2021-12-31")).all()
+        assert len(store.query(start="2030-01-01")) == 0
+
+        # 開き直しても、読み取り直さずに同じ結果を取得できる
+        reopened = SegmentStore(tmp_path.joinpath("store"))
+        pd.testing.assert_frame_equal(reopened.query(["3382"], start="2022-01-01"), df)
+
+    def test_upsert(self, tmp_path: Path) -> None:
+        first = copy_sample("sample1.htm", tmp_path.joinpath("20220712_3382_a.htm"))
+        second = copy_sample("sample1.htm", tmp_path.joinpath("20221012_3382_b.htm"))
+        store = SegmentStore(tmp_path.joinpath("store"))
+        store.ingest([first])
+        store.ingest([second])
+
+        df = store.query(["3382"])
+        assert len(df) == 24
+        assert not df.duplicated(KEY_COLUMNS).any()
+        assert (df["source"] == str(second)).all()
+        assert len(list(tmp_path.joinpath("store").glob("security_code=*"))) == 1
+
+    def test_upsert_older_filing(self, tmp_path: Path) -> None:
+        newer = copy_sample("sample1.htm", tmp_path.joinpath("20221012_3382_b.htm"))
+        older = copy_sample("sample1.htm", tmp_path.joinpath("20220712_3382_a.htm"))
+        store = SegmentStore(tmp_path.joinpath("store"))
+        store.ingest([newer])
+        expected = store.query(["3382"])
+        df, _ = financial_result_to_dataframe(newer)
+        assert df is not None
+        # 後から登録した古い決算短信の値は、新しい決算短信の値を上書きしない
+        store.upsert(df.assign(value=df["value"] + 1), "3382", str(older))
+        pd.testing.assert_frame_equal(store.query(["3382"]), expected)
+
+        # 新しい決算短信の値は、先に登録した古い決算短信の値を上書きする
+        store = SegmentStore(tmp_path.joinpath("store2"))
+        store.upsert(df.assign(value=df["value"] + 1), "3382", str(older))
+        store.ingest([newer])
+        pd.testing.assert_frame_equal(store.query(["3382"]), expected)
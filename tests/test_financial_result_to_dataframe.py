@@ -1,7 +1,17 @@
 import os
+import pickle
 from pathlib import Path
 
-from scripts.financial_result_to_dataframe import financial_result_to_dataframe
+import pandas as pd
+
+from scripts.financial_result_to_dataframe import (
+    DATAFRAME_COLUMNS,
+    SNIPPET_LENGTH,
+    ReadFlag,
+    ReadResult,
+    financial_result_to_dataframe,
+    read_flags_to_dataframe,
+)
 
 
 class TestFinancialResultToDataFrame:
@@ -73,3 +83,124 @@ class TestFinancialResultToDataFrame:
         assert not log.status.account_not_found
         assert not log.status.value_read_failed
         assert log.status.completed
+
+    def test_read_exception_pickle(self) -> None:
+        path = Path(os.path.dirname(__file__)).joinpath(
+            "data/raw/exceptions/period_not_exist.htm"
+        )
+        _, log = financial_result_to_dataframe(path)
+        restored = pickle.loads(pickle.dumps(log))
+        assert restored.status == log.status
+        assert [ex.read_result for ex in restored.logs] == [
+            ex.read_result for ex in log.logs
+        ]
+        assert all(ex.html is None for ex in restored.logs)
+        assert all(ex.source == str(path) for ex in restored.logs)
+
+        # 受け渡し元の記録は、テーブル要素を保持したままにする
+        tables = [ex.html for ex in log.logs]
+        assert any(table is not None for table in tables)
+        for ex, table in zip(restored.logs, tables):
+            if table is not None:
+                assert ex.snippet == str(table)[:SNIPPET_LENGTH]
+        assert [ex.html for ex in log.logs] == tables
+        assert all(ex.snippet is None for ex in log.logs)
+
+    def test_read_exception_compact(self) -> None:
+        path = Path(os.path.dirname(__file__)).joinpath(
+            "data/raw/exceptions/account_not_found.htm"
+        )
+        _, full_log = financial_result_to_dataframe(path)
+        _, log = financial_result_to_dataframe(path, compact=True)
+        assert [ex.read_result for ex in log.logs] == [
+            ex.read_result for ex in full_log.logs
+        ]
+        for ex, full in zip(log.logs, full_log.logs):
+            assert ex.html is None
+            assert full.html is not None
+            assert ex.source == str(path)
+            assert ex.snippet is not None
+            assert len(ex.snippet) <= SNIPPET_LENGTH
+            assert str(full.html).startswith(ex.snippet)
+            assert ex.position is not None and ex.position[0] > 0
+            assert ex.table() == full.html
+            assert full.table() is full.html
+
+    def test_financial_result_to_dataframe_partial(self) -> None:
+        data_dir = Path(os.path.dirname(__file__)).joinpath("data/raw")
+        for path in data_dir.glob("**/*.htm"):
+            expected_df, expected_log = financial_result_to_dataframe(path)
+            df, log = financial_result_to_dataframe(path, partial=True)
+            assert log.status == expected_log.status, path.name
+            if expected_df is None:
+                assert df is None
+            else:
+                assert df is not None
+                pd.testing.assert_frame_equal(df, expected_df)
+
+    def test_financial_result_to_dataframe_partial_reference(
+        self, tmp_path: Path
+    ) -> None:
+        data_dir = Path(os.path.dirname(__file__)).joinpath("data/raw")
+        # 「報告セグメント」を文字参照で記載した決算短信
+        content = data_dir.joinpath("sample1.htm").read_bytes()
+        path = tmp_path.joinpath("sample1.htm")
+        path.write_bytes(content.replace("報告セグメント".encode(), "&#x5831;告セグメント".encode()))
+        expected_df, expected_log = financial_result_to_dataframe(path)
+        assert expected_log.status.completed
+        df, log = financial_result_to_dataframe(path, partial=True)
+        assert log.status == expected_log.status
+        assert df is not None
+        pd.testing.assert_frame_equal(df, expected_df)
+
+    def test_dataframe_columns(self) -> None:
+        path = Path(os.path.dirname(__file__)).joinpath("data/raw/sample1.htm")
+        df, _ = financial_result_to_dataframe(path)
+        assert df is not None
+        assert list(df.columns) == DATAFRAME_COLUMNS
+        assert isinstance(df["segment_name"].dtype, pd.CategoricalDtype)
+        assert isinstance(df["account_name"].dtype, pd.CategoricalDtype)
+        assert pd.api.types.is_datetime64_any_dtype(df["period_begin"])
+        assert df["value"].dtype == float
+        assert len(df) == 24
+
+        # 前期・当期のテーブルごとに、セグメント×勘定のデータが並ぶ
+        current = df[df.period_kind == "current"]
+        assert current.iloc[0].segment_name == "国内コンビニエンスストア事業"
+        assert current.iloc[0].account_name == "営業収益"
+        assert current.iloc[0].value == 215243.0
+
+    def test_read_flags(self) -> None:
+        result = ReadResult(too_much_segment_tables=True, completed=True)
+        assert result.flags == ReadFlag.TOO_MUCH_SEGMENT_TABLES | ReadFlag.COMPLETED
+        assert ReadResult.from_flags(result.flags) == result
+        assert ReadResult().flags == 0
+
+        df = read_flags_to_dataframe(
+            [result.flags, ReadFlag.COMPLETED, ReadFlag.READ_HTML_FAILED],
+            ["a", "b", "c"],
+        )
+        assert list(df.columns) == [f.lower() for f in ReadFlag.__members__]
+        assert list(df.index) == ["a", "b", "c"]
+        assert df["completed"].tolist() == [1, 1, 0]
+        assert df.sum()["too_much_segment_tables"] == 1
+        assert len(read_flags_to_dataframe([])) == 0
+
+    def test_financial_result_to_dataframe_encodings(self) -> None:
+        data_dir = Path(os.path.dirname(__file__)).joinpath("data/raw")
+        expected, _ = financial_result_to_dataframe(data_dir.joinpath("sample1.htm"))
+        assert expected is not None
+        for name, encoding in [
+            ("sample1_utf8.htm", "utf-8-sig"),
+            ("sample1_shift_jis.htm", "cp932"),
+            ("sample1_euc_jp.htm", "euc_jis_2004"),
+            ("sample1_cp932_no_meta.htm", "cp932"),
+        ]:
+            for partial in [False, True]:
+                df, log = financial_result_to_dataframe(
+                    data_dir.joinpath("encodings", name), partial=partial
+                )
+                assert log.encoding == encoding, name
+                assert log.status.completed, name
+                assert df is not None
+                pd.testing.assert_frame_equal(df, expected)